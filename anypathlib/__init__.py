@@ -1,4 +1,7 @@
 __version__ = "0.2.0"
 
 from anypathlib.anypath import AnyPath
-from anypathlib.path_handlers.path_types import PathType
+from anypathlib.async_anypath import AsyncAnyPath
+from anypathlib.path_handlers.path_types import PathType, PathKind, PathStat
+from anypathlib.path_handlers.transfer_options import TransferOptions
+from anypathlib.sync import SyncResult
@@ -1,38 +1,169 @@
+import dataclasses
+import hashlib
+import importlib
+import io
 import shutil
 import tempfile
-from pathlib import Path, PurePath
-from typing import Union, Optional, List, Dict, NewType
+from pathlib import Path, PurePath, PurePosixPath
+from typing import Union, Optional, List, Dict, NewType, Tuple, ClassVar, Iterator, BinaryIO, Type, Iterable
 from urllib.parse import urlparse
 
-from anypathlib.path_handlers.azure_handler import AzureHandler
+from anypathlib.listing_index import ListingIndex
+from anypathlib.local_cache import LocalCache
+from anypathlib.metadata_cache import MetadataCache
 from anypathlib.path_handlers.base_path_handler import BasePathHandler
-from anypathlib.path_handlers.local_handler import LocalPathHandler
-from anypathlib.path_handlers.path_types import PathType
-from anypathlib.path_handlers.s3_handler import S3Handler
+from anypathlib.path_handlers.parallel import run_in_parallel, TransferError
+from anypathlib.path_handlers.path_types import PathType, PathStat, PathKind
+from anypathlib.path_handlers.transfer_options import TransferOptions, MB
+from anypathlib.ranged_reader import RangedReader, read_ranges
+from anypathlib.sync import SyncResult, SYNC_COMPARE_MODES, needs_transfer, local_md5
 
 AnyPathLikeType = NewType('AnyPathLikeType', Union[str, Path, 'AnyPath'])
 
+HANDLER_CLASSES: Dict[PathType, Tuple[str, str]] = {
+    PathType.local: ('anypathlib.path_handlers.local_handler', 'LocalPathHandler'),
+    PathType.s3: ('anypathlib.path_handlers.s3_handler', 'S3Handler'),
+    PathType.azure: ('anypathlib.path_handlers.azure_handler', 'AzureHandler')}
+
+
+class PathHandlers(dict):
+    """
+    Handler class per PathType. The module of a handler, and the SDK it uses, is imported the first time its path type
+    is looked up, so that local paths never load boto3 or the azure packages
+    """
+
+    def __missing__(self, path_type: PathType) -> Type[BasePathHandler]:
+        module_name, class_name = HANDLER_CLASSES[path_type]
+        handler = getattr(importlib.import_module(module_name), class_name)
+        self[path_type] = handler
+        return handler
+
 
 class AnyPath:
-    PATH_HANDLERS: Dict[PathType, BasePathHandler] = {PathType.local: LocalPathHandler,
-                                                      PathType.s3: S3Handler,
-                                                      PathType.azure: AzureHandler}
+    PATH_HANDLERS: ClassVar[Dict[PathType, Type[BasePathHandler]]] = PathHandlers()
     LOCAL_CACHE_PATH = Path(tempfile.gettempdir()) / 'AnyPath'
+    LOCAL_CACHE: ClassVar[LocalCache] = LocalCache(root=LOCAL_CACHE_PATH)
+    METADATA_CACHE: ClassVar[Optional[MetadataCache]] = None
+    LISTING_INDEX_PATH = LOCAL_CACHE_PATH / 'listing_index'
+    LISTING_INDEXES: ClassVar[Dict[str, ListingIndex]] = {}
+
+    __slots__ = ('_base_path', 'path_type', '_bucket_and_key')
 
     def __init__(self, base_path: AnyPathLikeType):
+        if type(base_path) is AnyPath:
+            self._base_path = base_path._base_path
+            self.path_type = base_path.path_type
+            self._bucket_and_key = base_path._bucket_and_key
+            return
         if type(base_path) is str:
-            self._base_path = base_path
+            path = base_path
         elif issubclass(type(base_path), PurePath):
-            self._base_path = base_path.absolute().as_posix()
-        elif type(base_path) is AnyPath:
-            self._base_path = base_path.base_path
+            path = base_path.absolute().as_posix()
         else:
             raise ValueError(f'base_path must be of type str, Path or AnyPath, got {type(base_path)}')
-        self.path_type = self.get_path_type(self._base_path)
-        self.path_handler = self.PATH_HANDLERS[self.path_type]
+        self.path_type = self.get_path_type(path)
+        self._base_path = self.normalize(path, self.path_type)
+        self._bucket_and_key = None
+
+    @classmethod
+    def _create(cls, base_path: str, path_type: PathType) -> 'AnyPath':
+        path = cls.__new__(cls)
+        path.path_type = path_type
+        path._base_path = cls.normalize(base_path, path_type)
+        path._bucket_and_key = None
+        return path
+
+    @classmethod
+    def from_urls(cls, urls: Iterable[str], path_type: PathType) -> List['AnyPath']:
+        """
+        AnyPath of each of urls, all of path_type, as listed by a handler. Skips the detection of the path type
+        """
+        return [cls._create(url, path_type) for url in urls]
+
+    @staticmethod
+    def normalize(path: str, path_type: PathType) -> str:
+        if path_type == PathType.s3:
+            path = path.replace('//', '/')
+            if path.startswith('s3:/') and not path.startswith('s3://'):
+                path = path.replace('s3:/', 's3://')
+            if path[-1] == '/':
+                path = path[:-1]
+        elif path_type == PathType.local:
+            path = Path(path).as_posix()
+        return path
+
+    @property
+    def path_handler(self) -> Type[BasePathHandler]:
+        return self.PATH_HANDLERS[self.path_type]
+
+    @classmethod
+    def enable_metadata_cache(cls, max_size: int = 100_000, ttl_seconds: float = 60,
+                              negative_ttl_seconds: Optional[float] = None) -> MetadataCache:
+        """
+        Caches the results of exists, is_dir, is_file and stat of cloud paths, and fills the cache from listings.
+        Paths modified through AnyPath (remove, copy) are invalidated, changes made by others are seen after the TTL
+        """
+        cls.METADATA_CACHE = MetadataCache(max_size=max_size, ttl_seconds=ttl_seconds,
+                                           negative_ttl_seconds=negative_ttl_seconds)
+        return cls.METADATA_CACHE
+
+    @classmethod
+    def disable_metadata_cache(cls):
+        cls.METADATA_CACHE = None
+
+    @property
+    def _metadata_cache(self) -> Optional[MetadataCache]:
+        # Local metadata is as cheap as the cache itself, and can be changed by anyone
+        return None if self.is_local else self.METADATA_CACHE
+
+    def _invalidate_caches(self):
+        metadata_cache = self._metadata_cache
+        if metadata_cache is not None:
+            metadata_cache.invalidate(self.base_path)
+        for listing_index in list(self.LISTING_INDEXES.values()):
+            listing_index.invalidate(self.base_path)
+
+    def index(self, max_age_seconds: Optional[float] = 3600, refresh_mode: str = 'full',
+              db_path: Optional[Path] = None) -> ListingIndex:
+        """
+        Indexes the recursive listing of this cloud directory in a local SQLite file, kept across processes.
+        stat, exists, is_dir, is_file, iterdir, glob and rglob of the paths under the directory are then answered from
+        the index, which is refreshed once older than max_age_seconds (see ListingIndex for refresh_mode)
+        """
+        if self.is_local:
+            raise ValueError(f'Only cloud directories can be indexed, got {self.base_path}')
+        root_url = self.base_path.rstrip('/')
+        if db_path is None:
+            db_path = self.LISTING_INDEX_PATH / f'{hashlib.sha256(root_url.encode()).hexdigest()[:32]}.sqlite'
+        self.remove_index()
+        listing_index = ListingIndex(root_url, path_handler=self.path_handler, db_path=db_path,
+                                     max_age_seconds=max_age_seconds, refresh_mode=refresh_mode)
+        self.LISTING_INDEXES[root_url] = listing_index
+        return listing_index
+
+    def remove_index(self):
+        """
+        Stops answering from the index of this directory. Its SQLite file is kept for the next index()
+        """
+        listing_index = self.LISTING_INDEXES.pop(self.base_path.rstrip('/'), None)
+        if listing_index is not None:
+            listing_index.close()
+
+    def _listing_index(self) -> Optional[ListingIndex]:
+        if not self.LISTING_INDEXES or self.is_local:
+            return None
+        # the innermost indexed directory containing this path
+        covering_indexes = [listing_index for listing_index in self.LISTING_INDEXES.values() if
+                            listing_index.covers(self.base_path)]
+        return max(covering_indexes, key=lambda listing_index: len(listing_index.root_url), default=None)
 
     @staticmethod
     def get_path_type(url: str) -> PathType:
+        # Shortcuts for the common cases, urlparse dominates the construction of an AnyPath
+        if url.startswith('s3://'):
+            return PathType.s3
+        if url.startswith('/'):
+            return PathType.local
         parsed_url = urlparse(url)
         if parsed_url.scheme in ['http', 'https']:
             if 'blob.core.windows.net' in parsed_url.netloc:
@@ -70,82 +201,249 @@ class AnyPath:
             valid_other = other[1:] if other.startswith('/') else other
             valid_base = self.base_path if self.base_path.endswith('/') else self.base_path + '/'
 
-            return AnyPath(f'{valid_base}{valid_other}')
+            return AnyPath._create(f'{valid_base}{valid_other}', self.path_type)
 
     @property
     def base_path(self) -> str:
-        if self.path_type == PathType.s3:
-            base_path = self._base_path
-            base_path = base_path.replace('//', '/')
-            if base_path.startswith('s3:/') and not base_path.startswith('s3://'):
-                base_path = base_path.replace('s3:/', 's3://')
-            if base_path[-1] == '/':
-                base_path = base_path[:-1]
-        elif self.path_type == PathType.local:
-            base_path = Path(self._base_path).as_posix()
-        else:
-            base_path = self._base_path
-        return base_path
+        return self._base_path
+
+    def _split(self) -> Tuple[Optional[str], str]:
+        if self._bucket_and_key is None:
+            if self.path_type == PathType.s3:
+                self._bucket_and_key = self.path_handler.get_bucket_and_key_from_uri(self._base_path)
+            elif self.path_type == PathType.azure:
+                storage_path = self.path_handler.http_to_storage_params(self._base_path)
+                self._bucket_and_key = (storage_path.container_name, storage_path.blob_name)
+            else:
+                self._bucket_and_key = (None, self._base_path)
+        return self._bucket_and_key
+
+    @property
+    def bucket(self) -> Optional[str]:
+        """
+        S3 bucket or Azure container of the path, None for local paths
+        """
+        return self._split()[0]
+
+    @property
+    def key(self) -> str:
+        """
+        S3 key or Azure blob name of the path, the path itself for local paths
+        """
+        return self._split()[1]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, AnyPath):
+            return NotImplemented
+        return self.path_type == other.path_type and self._base_path == other._base_path
+
+    def __hash__(self) -> int:
+        return hash((self.path_type, self._base_path))
+
+    def _stat(self) -> Optional[PathStat]:
+        listing_index = self._listing_index()
+        if listing_index is not None:
+            return listing_index.stat(self.base_path)
+        metadata_cache = self._metadata_cache
+        if metadata_cache is None:
+            return self.path_handler.stat(self.base_path)
+        hit, path_stat = metadata_cache.get(self.base_path)
+        if not hit:
+            path_stat = self.path_handler.stat(self.base_path)
+            metadata_cache.put(self.base_path, path_stat)
+        return path_stat
+
+    def stat(self) -> PathStat:
+        path_stat = self._stat()
+        if path_stat is None:
+            raise FileNotFoundError(f'{self.base_path} does not exist')
+        return path_stat
 
     def is_dir(self) -> bool:
-        return self.path_handler.is_dir(self.base_path)
+        path_stat = self._stat()
+        return path_stat is not None and path_stat.is_dir
 
     def is_file(self) -> bool:
-        return self.path_handler.is_file(self.base_path)
+        path_stat = self._stat()
+        return path_stat is not None and path_stat.is_file
 
     def exists(self) -> bool:
-        return self.path_handler.exists(self.base_path)
+        return self._stat() is not None
 
     def remove(self):
         self.path_handler.remove(self.base_path)
+        self._invalidate_caches()
+
+    def read_bytes(self) -> bytes:
+        with self.path_handler.open_read_stream(self.base_path) as stream:
+            return stream.read()
+
+    def write_bytes(self, data: bytes):
+        self.path_handler.upload_stream(io.BytesIO(data), target_url=self.base_path, size=len(data))
+        self._invalidate_caches()
+
+    def open(self, mode: str = 'rb', block_size: int = 4 * MB, max_blocks: int = 16, read_ahead: int = 2,
+             transfer_options: Optional[TransferOptions] = None) -> BinaryIO:
+        """
+        Opens the file for reading without downloading it. Remote files are read with ranged requests of block_size
+        bytes, keeping the max_blocks most recent blocks in memory and fetching read_ahead blocks in the background
+        on sequential reads. Local paths are opened with the builtin open, in any mode
+        """
+        if self.is_local:
+            return open(self.base_path, mode)
+        if mode != 'rb':
+            raise ValueError(f'{self.path_type.value} paths can only be opened in rb mode, got {mode}')
+        path_stat = self.stat()
+        if not path_stat.is_file:
+            raise IsADirectoryError(f'{self.base_path} is a directory')
+        reader = RangedReader(self.base_path, size=path_stat.size, path_handler=self.path_handler,
+                              block_size=block_size, max_blocks=max_blocks, read_ahead=read_ahead,
+                              transfer_options=transfer_options)
+        return io.BufferedReader(reader, buffer_size=min(block_size, io.DEFAULT_BUFFER_SIZE))
+
+    def read_ranges(self, ranges: List[Tuple[int, int]], max_gap: int = 1 * MB, max_request_size: int = 32 * MB,
+                    transfer_options: Optional[TransferOptions] = None) -> List[memoryview]:
+        """
+        Reads the (offset, length) ranges of the file, merging ranges at most max_gap bytes apart into requests of up
+        to max_request_size bytes, sent max_workers of transfer_options at a time. Returns memoryviews over a single
+        buffer, in the order of ranges, shorter than requested (or empty) past the end of the file
+        """
+        transfer_options = TransferOptions.resolve(transfer_options)
+        if self.is_local:
+            # A single descriptor shared by the positional reads of all the ranges
+            with self.path_handler.open_for_ranges(self.base_path) as fd:
+
+                def pread_range_into(offset: int, buffer: memoryview) -> int:
+                    return self.path_handler.read_range_into(self.base_path, offset=offset, buffer=buffer, fd=fd)
+
+                return read_ranges(pread_range_into, ranges, max_gap=max_gap, max_request_size=max_request_size,
+                                   max_workers=transfer_options.max_workers, retry_policy=transfer_options.retry_policy)
+
+        def read_range_into(offset: int, buffer: memoryview) -> int:
+            return self.path_handler.read_range_into(self.base_path, offset=offset, buffer=buffer,
+                                                     transfer_options=transfer_options)
+
+        return read_ranges(read_range_into, ranges, max_gap=max_gap, max_request_size=max_request_size,
+                           max_workers=transfer_options.max_workers, retry_policy=transfer_options.retry_policy,
+                           size=self.stat().size)
+
+    def read_into(self, buffer, offset: int = 0, transfer_options: Optional[TransferOptions] = None) -> int:
+        """
+        Reads the file starting at offset into the writable buffer (bytearray, memoryview, NumPy array...), until it
+        is full or the file ends. Remote files are read with parallel ranged requests of part_size bytes, each
+        writing straight into its slice of buffer. Returns the number of bytes read
+        """
+        view = memoryview(buffer).cast('B')
+        if view.readonly:
+            raise TypeError('buffer must be writable')
+        if self.is_local:
+            return self.path_handler.read_range_into(self.base_path, offset=offset, buffer=view)
+        transfer_options = TransferOptions.resolve(transfer_options)
+        n_bytes = max(min(len(view), self.stat().size - offset), 0)
+        part_offsets = list(range(0, n_bytes, transfer_options.part_size))
+
+        def read_part(part_offset: int) -> int:
+            part_end = min(part_offset + transfer_options.part_size, n_bytes)
+            return self.path_handler.read_range_into(self.base_path, offset=offset + part_offset,
+                                                     buffer=view[part_offset:part_end],
+                                                     transfer_options=transfer_options)
+
+        n_read, failures = run_in_parallel(read_part, part_offsets, max_workers=transfer_options.max_concurrency,
+                                           retry_policy=transfer_options.retry_policy)
+        if failures:
+            raise TransferError(f'Failed reading {self.base_path}', failures)
+        return sum(n_read)
 
     @property
     def parent(self) -> 'AnyPath':
-        return AnyPath(self.path_handler.parent(self.base_path))
+        return AnyPath._create(self.path_handler.parent(self.base_path), self.path_type)
 
     @property
     def stem(self) -> str:
-        return self.path_handler.stem(self.base_path)
+        if self.is_local:
+            return self.path_handler.stem(self.base_path)
+        return PurePosixPath(self.key).stem
 
     @property
     def name(self) -> str:
-        return self.path_handler.name(self.base_path)
+        if self.is_local:
+            return self.path_handler.name(self.base_path)
+        return PurePosixPath(self.key).name
+
+    def _iter_listing(self, listing: Iterator[Tuple[str, Optional[PathStat]]]) -> Iterator['AnyPath']:
+        metadata_cache = self._metadata_cache
+        is_empty = True
+        for p, path_stat in listing:
+            path = AnyPath._create(p, self.path_type)
+            if metadata_cache is not None:
+                if is_empty:
+                    metadata_cache.put(self.base_path, PathStat(kind=PathKind.directory))
+                if path_stat is not None:
+                    metadata_cache.put(path.base_path, path_stat)
+            is_empty = False
+            yield path
+
+    def iter_dir(self) -> Iterator['AnyPath']:
+        """
+        Lazy version of iterdir, yielding paths page by page as the backend lists them
+        """
+        listing_index = self._listing_index()
+        if listing_index is not None:
+            return self._iter_listing(listing_index.glob_stats(self.base_path, '*'))
+        return self._iter_listing(self.path_handler.iterdir_stats(self.base_path))
+
+    def iter_glob(self, pattern: str) -> Iterator['AnyPath']:
+        """
+        Lazy version of glob, yielding paths page by page as the backend lists them
+        """
+        listing_index = self._listing_index()
+        listing_source = self.path_handler if listing_index is None else listing_index
+        return self._iter_listing(listing_source.glob_stats(self.base_path, pattern))
+
+    def iter_rglob(self, pattern: str) -> Iterator['AnyPath']:
+        """
+        Lazy version of rglob, yielding paths page by page as the backend lists them
+        """
+        listing_index = self._listing_index()
+        listing_source = self.path_handler if listing_index is None else listing_index
+        return self._iter_listing(listing_source.rglob_stats(self.base_path, pattern))
 
     def iterdir(self) -> List['AnyPath']:
-        return [AnyPath(p) for p in self.path_handler.iterdir(self.base_path)]
+        return list(self.iter_dir())
 
     def glob(self, pattern: str) -> List['AnyPath']:
-        return [AnyPath(p) for p in self.path_handler.glob(self.base_path, pattern)]
+        return list(self.iter_glob(pattern))
 
     def rglob(self, pattern: str) -> List['AnyPath']:
-        return [AnyPath(p) for p in self.path_handler.rglob(self.base_path, pattern)]
+        return list(self.iter_rglob(pattern))
 
-    def __get_local_path(self, target_path: Optional[Path] = None, force_overwrite: bool = False,
-                         verbose: bool = False) -> Optional[Path]:
+    def __get_local_path(self, source_stat: PathStat, target_path: Optional[Path] = None,
+                         force_overwrite: bool = False, verbose: bool = False,
+                         transfer_options: Optional[TransferOptions] = None) -> Optional[Path]:
         if target_path is None:
-            if self.is_dir():
+            if source_stat.is_dir:
                 valid_target_path = Path(tempfile.mkdtemp())
             else:
                 valid_target_path = Path(tempfile.mktemp())
         else:
             if target_path.exists():
-                assert target_path.is_dir() == self.is_dir()
-                assert target_path.is_file() == self.is_file()
+                assert target_path.is_dir() == source_stat.is_dir
+                assert target_path.is_file() == source_stat.is_file
             valid_target_path = target_path
         if self.path_type == PathType.local:
             if not target_path.exists() or force_overwrite:
-                if self.is_dir():
+                if source_stat.is_dir:
                     shutil.copytree(self.base_path, valid_target_path, dirs_exist_ok=True)
                 else:
                     Path(valid_target_path).parent.mkdir(exist_ok=True, parents=True)
                     shutil.copy(self.base_path, valid_target_path)
             return valid_target_path
         else:
-            if self.is_dir():
+            if source_stat.is_dir:
                 result = self.path_handler.download_directory(url=self.base_path,
                                                               force_overwrite=force_overwrite,
                                                               target_dir=valid_target_path,
-                                                              verbose=verbose)
+                                                              verbose=verbose, transfer_options=transfer_options)
                 if result is not None:
                     local_path, _ = result
                 else:
@@ -153,51 +451,218 @@ class AnyPath:
 
             else:
                 local_path = self.path_handler.download_file(url=self.base_path, force_overwrite=force_overwrite,
-                                                             target_path=valid_target_path)
+                                                             target_path=valid_target_path,
+                                                             transfer_options=transfer_options)
 
         assert local_path == valid_target_path, \
             f'local_path {local_path} is not equal to valid_target_path {valid_target_path}'
         return Path(local_path)
 
-    def __get_local_cache_path(self) -> 'AnyPath':
+    @classmethod
+    def configure_local_cache(cls, root: Optional[Path] = None, max_bytes: Optional[int] = None) -> LocalCache:
+        """
+        Sets the directory and the byte budget of the cache used by copy() without a target
+        """
+        cls.LOCAL_CACHE_PATH = cls.LOCAL_CACHE_PATH if root is None else Path(root)
+        cls.LOCAL_CACHE = LocalCache(root=cls.LOCAL_CACHE_PATH, max_bytes=max_bytes)
+        return cls.LOCAL_CACHE
+
+    def __copy_to_local_cache(self, source_stat: PathStat, force_overwrite: bool, verbose: bool,
+                              transfer_options: TransferOptions) -> 'AnyPath':
         handler_prefix = 's3' if self.is_s3 else 'azure' if self.is_azure else 'local'
-        local_cache_path = self.LOCAL_CACHE_PATH / handler_prefix / self.path_handler.relative_path(self.base_path)
-        if self.is_dir():
-            local_cache_path.mkdir(exist_ok=True, parents=True)
-        elif self.is_file():
-            local_cache_path.parent.mkdir(exist_ok=True, parents=True)
-        return AnyPath(local_cache_path)
+        cache_key = f'{handler_prefix}/{self.path_handler.relative_path(self.base_path).strip("/")}'
+        if source_stat.is_dir:
+            local_path = self.LOCAL_CACHE.get_directory(
+                key=cache_key, files=self._list_files(),
+                fetch=lambda relative_path, temp_path: (self / relative_path)._copy_file_to(
+                    AnyPath(temp_path), transfer_options=transfer_options),
+                revalidate=force_overwrite, max_workers=transfer_options.max_workers, verbose=verbose)
+        else:
+            local_path = self.LOCAL_CACHE.get_file(
+                key=cache_key, path_stat=source_stat,
+                fetch=lambda temp_path: self._copy_file_to(AnyPath(temp_path), transfer_options=transfer_options),
+                revalidate=force_overwrite)
+        return AnyPath(local_path)
 
     def copy(self, target: Optional[AnyPathLikeType] = None, force_overwrite: bool = True,
-             verbose: bool = False) -> 'AnyPath':
-        assert self.exists(), f'source path: {self.base_path} does not exist'
+             verbose: bool = False, max_workers: Optional[int] = None,
+             transfer_options: Optional[TransferOptions] = None) -> 'AnyPath':
+        """
+        transfer_options default to TransferOptions.get_default(), max_workers overrides transfer_options.max_workers.
+        Without a target, the source is copied into the local cache (see configure_local_cache) and the cached copy is
+        returned. Cached files are re-downloaded only if they changed, or with force_overwrite=False never
+        """
+        transfer_options = TransferOptions.resolve(transfer_options)
+        if max_workers is not None:
+            transfer_options = dataclasses.replace(transfer_options, max_workers=max_workers)
+        source_stat = self._stat()
+        assert source_stat is not None, f'source path: {self.base_path} does not exist'
         if target is None:
-            valid_target = self.__get_local_cache_path()
+            return self.__copy_to_local_cache(source_stat=source_stat, force_overwrite=force_overwrite,
+                                              verbose=verbose, transfer_options=transfer_options)
+        input_target = AnyPath(target)
+        # if source is a file and target is either an existing dir copy the file to the target dir
+        if source_stat.is_file and input_target.is_dir():
+            valid_target = input_target / self.name
         else:
-            input_target = AnyPath(target)
-            # if source is a file and target is either an existing dir copy the file to the target dir
-            if self.is_file() and input_target.is_dir():
-                valid_target = input_target / self.name
-            else:
-                valid_target = input_target
+            valid_target = input_target
         if valid_target.is_local:
-            self.__get_local_path(target_path=Path(valid_target.base_path), force_overwrite=force_overwrite,
-                                  verbose=verbose)
+            self.__get_local_path(source_stat=source_stat, target_path=Path(valid_target.base_path),
+                                  force_overwrite=force_overwrite, verbose=verbose, transfer_options=transfer_options)
         else:
-            if valid_target.is_s3 and self.is_s3:
-                S3Handler.copy(source_url=self.base_path, target_url=valid_target.base_path)
-            elif valid_target.is_azure and self.is_azure:
-                AzureHandler.copy(source_url=self.base_path, target_url=valid_target.base_path)
+            if valid_target.path_type == self.path_type:
+                self.path_handler.copy(source_url=self.base_path, target_url=valid_target.base_path,
+                                       transfer_options=transfer_options)
+            elif not self.is_local and not transfer_options.stage_on_disk:
+                self.__stream_copy(source_stat=source_stat, target=valid_target, verbose=verbose,
+                                   transfer_options=transfer_options)
             else:
                 # valid_target and source are different,
                 # so we need to download the source and upload it to the valid_target
 
                 local_path = Path(self.base_path) if self.is_local else self.__get_local_path(
-                    force_overwrite=force_overwrite, verbose=verbose)
+                    source_stat=source_stat, force_overwrite=force_overwrite, verbose=verbose,
+                    transfer_options=transfer_options)
                 target_path_handler = valid_target.path_handler
-                if self.is_dir():
+                if source_stat.is_dir:
                     target_path_handler.upload_directory(local_dir=local_path, target_url=valid_target.base_path,
-                                                         verbose=verbose)
+                                                         verbose=verbose, transfer_options=transfer_options)
                 else:
-                    target_path_handler.upload_file(local_path=str(local_path), target_url=valid_target.base_path)
+                    target_path_handler.upload_file(local_path=str(local_path), target_url=valid_target.base_path,
+                                                    transfer_options=transfer_options)
+        valid_target._invalidate_caches()
         return valid_target
+
+    def __stream_copy(self, source_stat: PathStat, target: 'AnyPath', verbose: bool,
+                      transfer_options: TransferOptions):
+        """
+        Streams the source from one cloud to the other, with transfer_options.max_workers files in flight
+        """
+        if source_stat.is_file:
+            self._copy_file_to(target, transfer_options=transfer_options, size=source_stat.size)
+            return
+        source_files = self._list_files()
+
+        def copy_file(relative_path: str):
+            (self / relative_path)._copy_file_to(target / relative_path, transfer_options=transfer_options,
+                                                 size=source_files[relative_path].size)
+
+        _, failures = run_in_parallel(copy_file, sorted(source_files), max_workers=transfer_options.max_workers,
+                                      verbose=verbose, desc='Copying files',
+                                      retry_policy=transfer_options.retry_policy)
+        if failures:
+            raise TransferError(f'Failed copying {self.base_path} to {target.base_path}', failures)
+
+    def _copy_file_to(self, target: 'AnyPath', transfer_options: TransferOptions, size: Optional[int] = None):
+        """
+        Copies this file to the exact target path, without any request on top of the transfer itself.
+        Files are streamed between S3 and Azure, unless transfer_options.stage_on_disk
+        """
+        if self.path_type == target.path_type:
+            self.path_handler.copy_file(source_url=self.base_path, target_url=target.base_path,
+                                        transfer_options=transfer_options)
+        elif target.is_local:
+            Path(target.base_path).parent.mkdir(exist_ok=True, parents=True)
+            self.path_handler.download_file(url=self.base_path, target_path=Path(target.base_path),
+                                            force_overwrite=True, transfer_options=transfer_options)
+        elif self.is_local:
+            target.path_handler.upload_file(local_path=self.base_path, target_url=target.base_path,
+                                            transfer_options=transfer_options)
+        elif not transfer_options.stage_on_disk:
+            with self.path_handler.open_read_stream(self.base_path, transfer_options=transfer_options) as stream:
+                target.path_handler.upload_stream(stream, target_url=target.base_path, size=size,
+                                                  transfer_options=transfer_options)
+        else:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                local_path = Path(temp_dir) / self.name
+                self.path_handler.download_file(url=self.base_path, target_path=local_path, force_overwrite=True,
+                                                transfer_options=transfer_options)
+                target.path_handler.upload_file(local_path=str(local_path), target_url=target.base_path,
+                                                transfer_options=transfer_options)
+
+    def _list_files(self) -> Dict[str, PathStat]:
+        """
+        Maps the path of every file under this directory, relative to it, to its PathStat, with a single listing
+        """
+        base_path = self.base_path.rstrip('/')
+        files = {}
+        for p, path_stat in self.path_handler.rglob_stats(self.base_path, '*'):
+            if path_stat is None:
+                # Only local listings come without stats, and a local stat is a syscall
+                path_stat = self.path_handler.stat(p)
+            child_path = AnyPath(p).base_path
+            # Prefix listings can also return siblings sharing the directory name, e.g. "dir2/a" for "dir"
+            if path_stat is not None and path_stat.is_file and child_path.startswith(base_path + '/'):
+                files[child_path[len(base_path) + 1:]] = path_stat
+        return files
+
+    def _content_md5(self, path_stat: PathStat) -> Optional[str]:
+        return local_md5(self.base_path) if self.is_local else path_stat.content_md5
+
+    def _sync_file_to(self, target: 'AnyPath', path_stat: PathStat, target_stat: Optional[PathStat], compare: str,
+                      transfer_options: TransferOptions) -> bool:
+        """
+        Copies this file to target if needs_transfer tells so, returning whether it was copied
+        """
+        md5, target_md5 = None, None
+        if compare == 'checksum' and target_stat is not None and path_stat.size == target_stat.size:
+            md5 = self._content_md5(path_stat)
+            target_md5 = target._content_md5(target_stat)
+        if not needs_transfer(path_stat, target_stat, compare, md5, target_md5):
+            return False
+        self._copy_file_to(target, transfer_options=transfer_options, size=path_stat.size)
+        return True
+
+    def sync(self, target: AnyPathLikeType, compare: str = 'size', delete: bool = False, verbose: bool = False,
+             transfer_options: Optional[TransferOptions] = None) -> SyncResult:
+        """
+        Transfers only the files of this directory that are missing from target or differ from their target copy, and
+        with delete=True removes the target files that are not in this directory. Each side is listed once.
+        compare is one of:
+         - 'size': the sizes differ
+         - 'etag': the sizes or etags differ, only between S3 paths
+         - 'mtime': the sizes differ or the source was modified after the target
+         - 'checksum': the sizes or MD5s differ, files without a known MD5 (e.g. S3 multipart uploads) are transferred
+        Raises a TransferError once done if some of the transfers or removals failed
+        """
+        if compare not in SYNC_COMPARE_MODES:
+            raise ValueError(f'compare must be one of {SYNC_COMPARE_MODES}, got {compare}')
+        valid_target = AnyPath(target)
+        if compare == 'etag' and not (self.is_s3 and valid_target.is_s3):
+            raise ValueError('etag comparison is only supported between S3 paths, use checksum instead')
+        transfer_options = TransferOptions.resolve(transfer_options)
+        source_stat = self._stat()
+        assert source_stat is not None and source_stat.is_dir, f'source path: {self.base_path} is not a directory'
+        source_files = self._list_files()
+        target_files = valid_target._list_files() if valid_target.exists() else {}
+
+        def sync_file(relative_path: str) -> Tuple[str, bool]:
+            return relative_path, (self / relative_path)._sync_file_to(
+                valid_target / relative_path, source_files[relative_path], target_files.get(relative_path), compare,
+                transfer_options)
+
+        sync_result = SyncResult()
+        results, failures = run_in_parallel(sync_file, sorted(source_files), max_workers=transfer_options.max_workers,
+                                            verbose=verbose, desc='Syncing files',
+                                            retry_policy=transfer_options.retry_policy)
+        for relative_path, transferred in results:
+            if transferred:
+                sync_result.copied.append(relative_path)
+                sync_result.bytes_copied += source_files[relative_path].size
+            else:
+                sync_result.skipped.append(relative_path)
+        if delete:
+            def delete_file(relative_path: str) -> str:
+                valid_target.path_handler.remove((valid_target / relative_path).base_path)
+                return relative_path
+
+            extra_files = sorted(set(target_files) - set(source_files))
+            sync_result.deleted, delete_failures = run_in_parallel(delete_file, extra_files,
+                                                                   max_workers=transfer_options.max_workers,
+                                                                   verbose=verbose, desc='Deleting files',
+                                                                   retry_policy=transfer_options.retry_policy)
+            failures += delete_failures
+        valid_target._invalidate_caches()
+        if failures:
+            raise TransferError(f'Failed to sync {self.base_path} to {valid_target.base_path}', failures)
+        return sync_result
@@ -0,0 +1,230 @@
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple, AsyncIterator
+
+from loguru import logger
+
+from anypathlib.anypath import AnyPath, AnyPathLikeType
+from anypathlib.path_handlers.glob_pattern import compile_glob, compile_rglob
+from anypathlib.path_handlers.parallel import run_concurrently, TransferError
+from anypathlib.path_handlers.path_types import PathType, PathStat
+from anypathlib.path_handlers.transfer_options import TransferOptions
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_handler(path_type: PathType):
+    """
+    Returns the async-native handler of path_type, or None if its optional dependencies are not installed
+    (pip install anypathlib[async]) or if it has none, in which case the sync AnyPath runs on a thread pool
+    """
+    try:
+        if path_type == PathType.s3:
+            from anypathlib.path_handlers.async_s3_handler import AsyncS3Handler
+            return AsyncS3Handler
+        if path_type == PathType.azure:
+            from anypathlib.path_handlers.async_azure_handler import AsyncAzureHandler
+            return AsyncAzureHandler
+    except ImportError as e:
+        logger.warning(f'{e.name} is not installed, {path_type.value} paths will run AnyPath on a thread pool')
+    return None
+
+
+async def run_in_thread(func, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+class AsyncAnyPath:
+    """
+    asyncio version of AnyPath, backed by aiobotocore for S3 and azure.storage.blob.aio for Azure.
+    Directory operations run at most max_concurrency requests at a time
+    """
+
+    def __init__(self, base_path: AnyPathLikeType, max_concurrency: int = 32):
+        self.path = base_path.path if isinstance(base_path, AsyncAnyPath) else AnyPath(base_path)
+        self.max_concurrency = max_concurrency
+        self.async_handler = get_async_handler(self.path.path_type)
+
+    def __repr__(self):
+        return self.base_path
+
+    @property
+    def base_path(self) -> str:
+        return self.path.base_path
+
+    @property
+    def path_type(self) -> PathType:
+        return self.path.path_type
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    def __truediv__(self, other: str) -> 'AsyncAnyPath':
+        return AsyncAnyPath(self.path / other, max_concurrency=self.max_concurrency)
+
+    @asynccontextmanager
+    async def _client(self, transfer_options: Optional[TransferOptions] = None):
+        if self.async_handler is None:
+            yield None
+        else:
+            async with self.async_handler.client(self.base_path, transfer_options) as client:
+                yield client
+
+    @staticmethod
+    async def close_clients():
+        """
+        Closes the S3 and Azure clients kept open in the running event loop. Call it before the loop ends, e.g. at the
+        end of the coroutine given to asyncio.run
+        """
+        for path_type in (PathType.s3, PathType.azure):
+            async_handler = get_async_handler(path_type)
+            if async_handler is not None:
+                await async_handler.close_clients()
+
+    async def _stat(self) -> Optional[PathStat]:
+        if self.async_handler is None:
+            return await run_in_thread(self.path._stat)
+        async with self._client() as client:
+            return await self.async_handler.stat(client, self.base_path)
+
+    async def stat(self) -> PathStat:
+        path_stat = await self._stat()
+        if path_stat is None:
+            raise FileNotFoundError(f'{self.base_path} does not exist')
+        return path_stat
+
+    async def exists(self) -> bool:
+        return await self._stat() is not None
+
+    async def is_dir(self) -> bool:
+        path_stat = await self._stat()
+        return path_stat is not None and path_stat.is_dir
+
+    async def is_file(self) -> bool:
+        path_stat = await self._stat()
+        return path_stat is not None and path_stat.is_file
+
+    def _relative_path(self, url: str) -> str:
+        return AnyPath(url).base_path[len(self.base_path.rstrip('/')) + 1:]
+
+    async def _iter_stats(self, recursive: bool) -> AsyncIterator[Tuple[str, PathStat]]:
+        async with self._client() as client:
+            async for url, path_stat in self.async_handler.iter_stats(client, self.base_path, recursive=recursive):
+                yield url, path_stat
+
+    async def iterdir(self) -> List['AsyncAnyPath']:
+        if self.async_handler is None:
+            return [AsyncAnyPath(p, self.max_concurrency) for p in await run_in_thread(self.path.iterdir)]
+        return [AsyncAnyPath(url, self.max_concurrency) async for url, _ in self._iter_stats(recursive=False)]
+
+    async def glob(self, pattern: str) -> List['AsyncAnyPath']:
+        """
+        Matches the pattern against the paths relative to this directory, as AnyPath.glob does
+        """
+        if self.async_handler is None:
+            return [AsyncAnyPath(p, self.max_concurrency) for p in await run_in_thread(self.path.glob, pattern)]
+        glob_pattern = compile_glob(pattern)
+        return [AsyncAnyPath(url, self.max_concurrency) async for url, _ in
+                self._iter_stats(recursive=glob_pattern.is_recursive) if
+                glob_pattern.match(self._relative_path(url).rstrip('/'))]
+
+    async def rglob(self, pattern: str) -> List['AsyncAnyPath']:
+        """
+        Matches the pattern against the paths relative to this directory, returning the directories of the matched
+        files as well, as AnyPath.rglob does
+        """
+        if self.async_handler is None:
+            return [AsyncAnyPath(p, self.max_concurrency) for p in await run_in_thread(self.path.rglob, pattern)]
+        glob_pattern = compile_rglob(pattern)
+        paths = []
+        seen_dirs = set()
+        async for url, _ in self._iter_stats(recursive=True):
+            relative_path = self._relative_path(url)
+            if not glob_pattern.match(relative_path):
+                continue
+            paths.append(AsyncAnyPath(url, self.max_concurrency))
+            if '/' in relative_path:
+                dir_path = self / relative_path.rsplit('/', 1)[0]
+                if dir_path.base_path not in seen_dirs:
+                    seen_dirs.add(dir_path.base_path)
+                    paths.append(dir_path)
+        return paths
+
+    async def _list_files(self) -> Dict[str, PathStat]:
+        if self.async_handler is None:
+            return await run_in_thread(self.path._list_files)
+        return {self._relative_path(url): path_stat async for url, path_stat in self._iter_stats(recursive=True) if
+                path_stat.is_file}
+
+    async def read_bytes(self) -> bytes:
+        if self.async_handler is None:
+            return await run_in_thread(self.path.read_bytes)
+        async with self._client() as client:
+            return await self.async_handler.read_bytes(client, self.base_path)
+
+    async def write_bytes(self, data: bytes):
+        if self.async_handler is None:
+            await run_in_thread(self.path.write_bytes, data)
+        else:
+            async with self._client() as client:
+                await self.async_handler.write_bytes(client, self.base_path, data)
+        self.path._invalidate_caches()
+
+    async def remove(self):
+        if self.async_handler is None:
+            await run_in_thread(self.path.remove)
+            return
+        async with self._client() as client:
+            await self.async_handler.remove(client, self.base_path, max_concurrency=self.max_concurrency)
+        self.path._invalidate_caches()
+
+    async def _copy_file_to(self, target: 'AsyncAnyPath', transfer_options: TransferOptions, size: Optional[int],
+                            source_client, target_client):
+        source_handler, target_handler = self.async_handler, target.async_handler
+        if source_handler is not None and source_handler is target_handler and (
+                source_handler.MAX_COPY_OBJECT_SIZE is None or size is None or
+                size <= source_handler.MAX_COPY_OBJECT_SIZE):
+            await source_handler.copy_file(target_client, self.base_path, target.base_path, size=size)
+        elif source_handler is not None and target.path.is_local:
+            await source_handler.download_file(source_client, self.base_path, Path(target.base_path),
+                                               transfer_options=transfer_options)
+        elif target_handler is not None and self.path.is_local:
+            await target_handler.upload_file(target_client, Path(self.base_path), target.base_path,
+                                             transfer_options=transfer_options)
+        else:
+            # Local to local, S3 to Azure and back, or a side without an async handler
+            await run_in_thread(self.path._copy_file_to, target.path, transfer_options=transfer_options, size=size)
+
+    async def copy(self, target: AnyPathLikeType,
+                   transfer_options: Optional[TransferOptions] = None) -> 'AsyncAnyPath':
+        """
+        Copies a file or a directory, max_concurrency files at a time, raising a TransferError once done if some of
+        the files failed
+        """
+        transfer_options = TransferOptions.resolve(transfer_options)
+        valid_target = AsyncAnyPath(target, max_concurrency=self.max_concurrency)
+        source_stat = await self._stat()
+        assert source_stat is not None, f'source path: {self.base_path} does not exist'
+        if source_stat.is_file and await valid_target.is_dir():
+            valid_target = valid_target / self.name
+        async with self._client(transfer_options) as source_client, \
+                valid_target._client(transfer_options) as target_client:
+            if source_stat.is_file:
+                await self._copy_file_to(valid_target, transfer_options, source_stat.size, source_client,
+                                         target_client)
+            else:
+                source_files = await self._list_files()
+
+                async def copy_file(relative_path: str):
+                    await (self / relative_path)._copy_file_to(valid_target / relative_path, transfer_options,
+                                                               source_files[relative_path].size, source_client,
+                                                               target_client)
+
+                _, failures = await run_concurrently(copy_file, sorted(source_files),
+                                                     max_concurrency=self.max_concurrency)
+                if failures:
+                    raise TransferError(f'Failed copying {self.base_path} to {valid_target.base_path}', failures)
+        valid_target.path._invalidate_caches()
+        return valid_target
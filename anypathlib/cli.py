@@ -1,5 +1,7 @@
+import dataclasses
+
 import click
-from anypathlib import AnyPath
+from anypathlib import AnyPath, TransferOptions
 
 
 @click.group()
@@ -12,10 +14,25 @@ def cli():
 @click.option('-o', '--output', 'output_path', type=click.STRING, help='Output path to copy to')
 @click.option('-v', '--verbose', is_flag=True, default=False, help='Verbose flag')
 @click.option('-f', '--force/--no-force', is_flag=True, default=True, help='Force overwrite flag')
-def copy(input_path, output_path, verbose, force):
+@click.option('-w', '--max-workers', type=click.INT, default=None,
+              help='Number of files transferred in parallel when copying a directory')
+@click.option('--multipart-threshold', type=click.INT, default=None,
+              help='Size in bytes above which files are transferred in parts')
+@click.option('--part-size', type=click.INT, default=None, help='Size in bytes of each transferred part')
+@click.option('--max-concurrency', type=click.INT, default=None,
+              help='Number of parts of a single file transferred in parallel')
+@click.option('--max-pool-connections', type=click.INT, default=None, help='Size of the HTTP connection pool')
+def copy(input_path, output_path, verbose, force, max_workers, multipart_threshold, part_size, max_concurrency,
+         max_pool_connections):
     """Copy files from input to output path. """
+    transfer_options_overrides = {'max_workers': max_workers, 'multipart_threshold': multipart_threshold,
+                                  'part_size': part_size, 'max_concurrency': max_concurrency,
+                                  'max_pool_connections': max_pool_connections}
+    transfer_options = dataclasses.replace(TransferOptions.get_default(),
+                                           **{name: value for name, value in transfer_options_overrides.items() if
+                                              value is not None})
     target_path = AnyPath(input_path).copy(target=AnyPath(output_path) if output_path else None,
-                                           verbose=verbose, force_overwrite=force)
+                                           verbose=verbose, force_overwrite=force, transfer_options=transfer_options)
     click.echo(f'Copied Successfully to {target_path}')
 
 
@@ -0,0 +1,355 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Type, Iterable, Set
+
+from loguru import logger
+
+from anypathlib.path_handlers.base_path_handler import BasePathHandler
+from anypathlib.path_handlers.glob_pattern import compile_glob, compile_rglob
+from anypathlib.path_handlers.path_types import PathStat, PathKind
+
+REFRESH_MODES = ('full', 'incremental')
+# Rows inserted per executemany batch while a listing is consumed
+INSERT_BATCH_SIZE = 10_000
+# Rows fetched per query while answering a listing
+FIRST_QUERY_PAGE_SIZE = 16
+QUERY_PAGE_SIZE = 10_000
+
+
+@dataclass
+class IndexRefreshResult:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    # The smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class ListingIndex:
+    """
+    Snapshot of the recursive listing of a directory (relative key, size, etag, last-modified time, MD5) in a local
+    SQLite file, which answers stat, glob and rglob under the directory without listing the backend.
+
+    The snapshot is refreshed when it is older than max_age_seconds, by refresh_mode:
+    'full' lists the directory again and applies the difference, 'incremental' only lists the keys after the last
+    indexed one (S3 StartAfter), which suits append-only prefixes, and falls back to a full listing on backends that
+    cannot start a listing after a key.
+    Paths changed through AnyPath are relisted before the next query
+    """
+
+    def __init__(self, root_url: str, path_handler: Type[BasePathHandler], db_path: Path,
+                 max_age_seconds: Optional[float] = 3600, refresh_mode: str = 'full'):
+        if refresh_mode not in REFRESH_MODES:
+            raise ValueError(f'refresh_mode must be one of {REFRESH_MODES}, got {refresh_mode}')
+        self.root_url = root_url.rstrip('/')
+        self.path_handler = path_handler
+        self.db_path = Path(db_path)
+        self.max_age_seconds = max_age_seconds
+        self.refresh_mode = refresh_mode
+        self._lock = threading.RLock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        # The index can always be rebuilt from the backend, it does not need to survive power losses
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS objects (key TEXT PRIMARY KEY, size INTEGER, etag TEXT, '
+                                 'last_modified REAL, content_md5 TEXT) WITHOUT ROWID')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS pending (prefix TEXT PRIMARY KEY)')
+        indexed_root_url = self._get_meta('root_url')
+        if indexed_root_url is None:
+            self._set_meta('root_url', self.root_url)
+        elif indexed_root_url != self.root_url:
+            raise ValueError(f'{self.db_path} indexes {indexed_root_url}, not {self.root_url}')
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _get_meta(self, name: str) -> Optional[str]:
+        row = self._connection.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, name: str, value: str):
+        self._connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (name, value))
+
+    @property
+    def refreshed_at(self) -> Optional[float]:
+        """
+        Time (time.time()) of the last refresh, None if the directory was never indexed
+        """
+        refreshed_at = self._get_meta('refreshed_at')
+        return None if refreshed_at is None else float(refreshed_at)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM objects').fetchone()[0]
+
+    def covers(self, url: str) -> bool:
+        url = url.rstrip('/')
+        return url == self.root_url or url.startswith(self.root_url + '/')
+
+    def _relative_path(self, url: str) -> str:
+        return url.rstrip('/')[len(self.root_url) + 1:]
+
+    def _url(self, relative_path: str) -> str:
+        return f'{self.root_url}/{relative_path}'
+
+    @staticmethod
+    def _row(relative_path: str, path_stat: PathStat) -> tuple:
+        last_modified = path_stat.last_modified.timestamp() if path_stat.last_modified is not None else None
+        return relative_path, path_stat.size, path_stat.etag, last_modified, path_stat.content_md5
+
+    @staticmethod
+    def _stat_of_row(row: tuple) -> PathStat:
+        _, size, etag, last_modified, content_md5 = row
+        return PathStat(kind=PathKind.file, size=size, etag=etag, content_md5=content_md5,
+                        last_modified=datetime.fromtimestamp(last_modified, timezone.utc)
+                        if last_modified is not None else None)
+
+    def _insert_rows(self, table: str, rows: list):
+        # Outside of a transaction, every row inserted by executemany would be committed on its own
+        in_transaction = self._connection.in_transaction
+        if not in_transaction:
+            self._connection.execute('BEGIN')
+        self._connection.executemany(f'INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?, ?)', rows)
+        if not in_transaction:
+            self._connection.execute('COMMIT')
+
+    def _insert_listing(self, table: str, listing: Iterable[Tuple[str, PathStat]]) -> int:
+        n_rows = 0
+        batch = []
+        for url, path_stat in listing:
+            batch.append(self._row(self._relative_path(url), path_stat))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                self._insert_rows(table, batch)
+                n_rows += len(batch)
+                batch = []
+        self._insert_rows(table, batch)
+        return n_rows + len(batch)
+
+    def refresh(self, full: bool = True) -> IndexRefreshResult:
+        """
+        Brings the index up to date. full lists the whole directory and applies the difference, otherwise only the
+        keys after the last indexed one are listed, where the backend supports it
+        """
+        start_time = time.perf_counter()
+        with self._lock:
+            last_key = self._connection.execute('SELECT MAX(key) FROM objects').fetchone()[0]
+            if not full and last_key is not None and self.path_handler.SUPPORTS_START_AFTER:
+                self._refresh_pending()
+                result = self._refresh_after(last_key)
+            else:
+                result = self._refresh_full()
+                self._connection.execute('DELETE FROM pending')
+            self._set_meta('refreshed_at', str(time.time()))
+        result.seconds = time.perf_counter() - start_time
+        logger.debug(f'Refreshed the listing index of {self.root_url}: {result}')
+        return result
+
+    @contextmanager
+    def _staging_table(self):
+        """
+        TEMP table private to this connection, where listings are staged before the write lock is taken, so that the
+        processes sharing the index file are not blocked while the backend is listed
+        """
+        self._connection.execute('DROP TABLE IF EXISTS temp.listing')
+        self._connection.execute('CREATE TEMP TABLE listing (key TEXT PRIMARY KEY, size INTEGER, etag TEXT, '
+                                 'last_modified REAL, content_md5 TEXT) WITHOUT ROWID')
+        try:
+            yield 'temp.listing'
+        finally:
+            self._connection.execute('DROP TABLE IF EXISTS temp.listing')
+
+    @contextmanager
+    def _write_transaction(self):
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+            self._connection.execute('COMMIT')
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+
+    def _refresh_after(self, last_key: str) -> IndexRefreshResult:
+        with self._staging_table() as staging_table:
+            added = self._insert_listing(staging_table, self.path_handler.iter_file_stats(self.root_url,
+                                                                                          start_after=last_key))
+            with self._write_transaction():
+                self._connection.execute(f'INSERT OR REPLACE INTO objects SELECT * FROM {staging_table}')
+        return IndexRefreshResult(added=added)
+
+    def _refresh_full(self) -> IndexRefreshResult:
+        with self._staging_table() as staging_table:
+            self._insert_listing(staging_table, self.path_handler.iter_file_stats(self.root_url))
+            with self._write_transaction():
+                added, changed = self._connection.execute(
+                    'SELECT COUNT(*) - COUNT(objects.key), '
+                    'SUM(objects.key IS NOT NULL AND '
+                    '(objects.etag IS NOT listing.etag OR objects.size IS NOT listing.size)) '
+                    'FROM temp.listing AS listing LEFT JOIN objects ON objects.key = listing.key').fetchone()
+                removed = self._connection.execute(
+                    'DELETE FROM objects WHERE NOT EXISTS '
+                    '(SELECT 1 FROM temp.listing AS listing WHERE listing.key = objects.key)').rowcount
+                # Only the rows that differ are written
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO objects SELECT * FROM temp.listing AS listing WHERE NOT EXISTS '
+                    '(SELECT 1 FROM objects WHERE objects.key = listing.key AND objects.size IS listing.size AND '
+                    'objects.etag IS listing.etag AND objects.last_modified IS listing.last_modified AND '
+                    'objects.content_md5 IS listing.content_md5)')
+        return IndexRefreshResult(added=added or 0, changed=changed or 0, removed=removed)
+
+    def invalidate(self, url: str):
+        """
+        Marks url and everything under it to be listed again before the next query
+        """
+        url = url.rstrip('/')
+        if self.covers(url):
+            prefix = self._relative_path(url)
+        elif self.root_url.startswith(url + '/'):
+            # an ancestor of the indexed directory
+            prefix = ''
+        else:
+            return
+        with self._lock:
+            self._connection.execute('INSERT OR IGNORE INTO pending VALUES (?)', (prefix,))
+
+    def _refresh_pending(self):
+        pending_prefixes = [row[0] for row in self._connection.execute('SELECT prefix FROM pending')]
+        if not pending_prefixes:
+            return
+        with self._staging_table() as staging_table:
+            for prefix in pending_prefixes:
+                url = self._url(prefix) if prefix else self.root_url
+                path_stat = self.path_handler.stat(url)
+                if path_stat is not None and path_stat.is_file:
+                    self._insert_listing(staging_table, [(url, path_stat)])
+                elif path_stat is not None:
+                    self._insert_listing(staging_table, self.path_handler.iter_file_stats(url))
+            with self._write_transaction():
+                for prefix in pending_prefixes:
+                    if not prefix:
+                        self._connection.execute('DELETE FROM objects')
+                    else:
+                        self._connection.execute('DELETE FROM objects WHERE key = ? OR (key >= ? AND key < ?)',
+                                                 (prefix, prefix + '/', _prefix_upper_bound(prefix + '/')))
+                self._connection.execute(f'INSERT OR REPLACE INTO objects SELECT * FROM {staging_table}')
+                # Prefixes invalidated meanwhile stay pending
+                self._connection.executemany('DELETE FROM pending WHERE prefix = ?',
+                                             [(prefix,) for prefix in pending_prefixes])
+
+    def ensure_fresh(self):
+        """
+        Refreshes the index if it was never built or is older than max_age_seconds, and relists invalidated paths
+        """
+        with self._lock:
+            refreshed_at = self.refreshed_at
+            if refreshed_at is None or (self.max_age_seconds is not None and
+                                        time.time() - refreshed_at > self.max_age_seconds):
+                self.refresh(full=self.refresh_mode == 'full' or refreshed_at is None)
+            else:
+                self._refresh_pending()
+
+    def _iter_rows(self, prefix: str, start: Optional[str] = None) -> Iterator[tuple]:
+        """
+        Rows whose keys start with prefix (and are at least start), in key order, fetched a page at a time. Pages grow
+        from a few rows, as stat and glob often stop after the first rows
+        """
+        start = prefix if start is None else start
+        upper_bound = _prefix_upper_bound(prefix) if prefix else None
+        page_size = FIRST_QUERY_PAGE_SIZE
+        while True:
+            with self._lock:
+                if upper_bound is None:
+                    rows = self._connection.execute('SELECT * FROM objects WHERE key >= ? ORDER BY key LIMIT ?',
+                                                    (start, page_size)).fetchall()
+                else:
+                    rows = self._connection.execute(
+                        'SELECT * FROM objects WHERE key >= ? AND key < ? ORDER BY key LIMIT ?',
+                        (start, upper_bound, page_size)).fetchall()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            start = rows[-1][0] + '\0'
+            page_size = min(page_size * 4, QUERY_PAGE_SIZE)
+
+    def stat(self, url: str) -> Optional[PathStat]:
+        self.ensure_fresh()
+        relative_path = self._relative_path(url)
+        if relative_path:
+            with self._lock:
+                row = self._connection.execute('SELECT * FROM objects WHERE key = ?', (relative_path,)).fetchone()
+            if row is not None:
+                return self._stat_of_row(row)
+        for _ in self._iter_rows(self._dir_prefix(url)):
+            return PathStat(kind=PathKind.directory)
+        return None
+
+    def _dir_prefix(self, url: str) -> str:
+        relative_path = self._relative_path(url)
+        return relative_path + '/' if relative_path else ''
+
+    def glob_stats(self, url: str, pattern: str) -> Iterator[Tuple[str, PathStat]]:
+        """
+        Same results as the handler's glob_stats, from the index
+        """
+        self.ensure_fresh()
+        dir_prefix = self._dir_prefix(url)
+        base_url = url.rstrip('/')
+        glob_pattern = compile_glob(pattern)
+        list_prefix = dir_prefix + glob_pattern.literal_prefix
+        if glob_pattern.is_recursive:
+            for row in self._iter_rows(list_prefix):
+                relative_key = row[0][len(dir_prefix):]
+                if glob_pattern.match(relative_key):
+                    yield f'{base_url}/{relative_key}', self._stat_of_row(row)
+            return
+        # Only the top level, as the delimited listing of the backend returns it: the keys under a subdirectory are
+        # contiguous, and skipped at once
+        start = None
+        while True:
+            skip_to = None
+            for row in self._iter_rows(list_prefix, start=start):
+                relative_key = row[0][len(dir_prefix):]
+                top_level_name, is_dir, _ = relative_key.partition('/')
+                if not is_dir:
+                    if glob_pattern.match(relative_key):
+                        yield f'{base_url}/{relative_key}', self._stat_of_row(row)
+                    continue
+                if glob_pattern.match(top_level_name):
+                    yield f'{base_url}/{top_level_name}', PathStat(kind=PathKind.directory)
+                skip_to = _prefix_upper_bound(f'{dir_prefix}{top_level_name}/')
+                break
+            if skip_to is None:
+                return
+            start = skip_to
+
+    def rglob_stats(self, url: str, pattern: str) -> Iterator[Tuple[str, PathStat]]:
+        """
+        Same results as the handler's rglob_stats, from the index: the matched files and the directories containing
+        them
+        """
+        self.ensure_fresh()
+        dir_prefix = self._dir_prefix(url)
+        base_url = url.rstrip('/')
+        glob_pattern = compile_rglob(pattern)
+        seen_dirs: Set[str] = set()
+        for row in self._iter_rows(dir_prefix):
+            relative_key = row[0][len(dir_prefix):]
+            if not glob_pattern.match(relative_key):
+                continue
+            yield f'{base_url}/{relative_key}', self._stat_of_row(row)
+            if '/' in relative_key:
+                dir_url = f"{base_url}/{relative_key.rsplit('/', 1)[0]}"
+                if dir_url not in seen_dirs:
+                    seen_dirs.add(dir_url)
+                    yield dir_url, PathStat(kind=PathKind.directory)
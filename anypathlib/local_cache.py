@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from loguru import logger
+
+from anypathlib.path_handlers.parallel import run_in_parallel, TransferError
+from anypathlib.path_handlers.path_types import PathStat
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock_file(f):
+        # msvcrt locks a byte range, retrying for ~10 seconds, so retry with a back-off until the holder is done
+        f.seek(0)
+        retry_delay = 0.05
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class LocalCache:
+    """
+    On-disk cache of remote files, safe to share between processes.
+    Each entry has a sidecar with the size, etag and last-modified time of the remote file it was downloaded from,
+    and is served as long as they still match the stat of the remote file. Entries are written to a temp file and
+    renamed into place under a per-entry file lock, so concurrent readers download each file once.
+    With max_bytes, the least recently used entries are evicted once the cache grows over it. The size is tracked as a
+    running total of this process' downloads and removals, and the entries are only scanned when it goes over max_bytes
+    (which also picks up the changes of other processes).
+    """
+    META_DIR = '.meta'
+    LOCKS_DIR = '.locks'
+    TEMP_DIR = '.tmp'
+
+    def __init__(self, root: Path, max_bytes: Optional[int] = None):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        # None until the first scan of the entries
+        self._size: Optional[int] = None
+        self._size_lock = threading.Lock()
+
+    def data_path(self, key: str) -> Path:
+        return self.root / key
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / self.META_DIR / f'{key}.json'
+
+    def _lock_path(self, key: str) -> Path:
+        return self.root / self.LOCKS_DIR / f'{key}.lock'
+
+    def _temp_path(self) -> Path:
+        temp_dir = self.root / self.TEMP_DIR
+        temp_dir.mkdir(exist_ok=True, parents=True)
+        return temp_dir / uuid.uuid4().hex
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        lock_path = self._lock_path(key)
+        lock_path.parent.mkdir(exist_ok=True, parents=True)
+        with open(lock_path, 'a+b') as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+    @staticmethod
+    def _stat_to_meta(path_stat: PathStat) -> dict:
+        last_modified = path_stat.last_modified.isoformat() if path_stat.last_modified is not None else None
+        return {'size': path_stat.size, 'etag': path_stat.etag, 'last_modified': last_modified}
+
+    def _read_meta(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._meta_path(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_meta(self, key: str, path_stat: PathStat):
+        meta_path = self._meta_path(key)
+        meta_path.parent.mkdir(exist_ok=True, parents=True)
+        temp_path = self._temp_path()
+        temp_path.write_text(json.dumps(self._stat_to_meta(path_stat)))
+        os.replace(temp_path, meta_path)
+
+    def is_valid(self, key: str, path_stat: Optional[PathStat] = None) -> bool:
+        """
+        Whether the entry exists and, if path_stat is given, was downloaded from a remote file with the same stat
+        """
+        meta = self._read_meta(key)
+        if meta is None or not self.data_path(key).is_file():
+            return False
+        return path_stat is None or meta == self._stat_to_meta(path_stat)
+
+    def _file_size(self, key: str) -> int:
+        try:
+            return self.data_path(key).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _add_size(self, size_delta: int):
+        with self._size_lock:
+            if self._size is not None:
+                self._size += size_delta
+
+    def _touch(self, key: str):
+        # The sidecar's mtime is the last access time used for LRU eviction
+        try:
+            os.utime(self._meta_path(key))
+        except FileNotFoundError:
+            pass
+
+    def get_file(self, key: str, path_stat: PathStat, fetch: Callable[[Path], None], revalidate: bool = True,
+                 evict: bool = True) -> Path:
+        """
+        Returns the cached file of key, calling fetch with a temp path to download it when it is missing or, with
+        revalidate, when it does not match path_stat
+        """
+        valid_stat = path_stat if revalidate else None
+        if not self.is_valid(key, valid_stat):
+            with self.lock(key):
+                # Another process may have downloaded it while we waited for the lock
+                if not self.is_valid(key, valid_stat):
+                    data_path = self.data_path(key)
+                    data_path.parent.mkdir(exist_ok=True, parents=True)
+                    temp_path = self._temp_path()
+                    replaced_size = self._file_size(key)
+                    try:
+                        fetch(temp_path)
+                        os.replace(temp_path, data_path)
+                    finally:
+                        if temp_path.exists():
+                            temp_path.unlink()
+                    self._write_meta(key, path_stat)
+                    self._add_size(self._file_size(key) - replaced_size)
+            if evict:
+                self.evict(keep=key)
+        self._touch(key)
+        return self.data_path(key)
+
+    def get_directory(self, key: str, files: Dict[str, PathStat], fetch: Callable[[str, Path], None],
+                      revalidate: bool = True, max_workers: Optional[int] = None, verbose: bool = False) -> Path:
+        """
+        Returns the cached directory of key, with an entry per file of files (relative path to stat). fetch is called
+        with the relative path and a temp path for every file that is missing or changed. Cached files which are not
+        in files anymore are removed. The directory is never evicted to make room for itself, so it is complete even
+        when larger than max_bytes
+        """
+
+        def get_directory_file(relative_path: str) -> Path:
+            return self.get_file(f'{key}/{relative_path}', files[relative_path],
+                                 fetch=lambda temp_path: fetch(relative_path, temp_path), revalidate=revalidate,
+                                 evict=False)
+
+        _, failures = run_in_parallel(get_directory_file, sorted(files), max_workers=max_workers, verbose=verbose,
+                                      desc='Downloading files')
+        if failures:
+            raise TransferError(f'Failed to cache {key}', failures)
+        directory_path = self.data_path(key)
+        directory_path.mkdir(exist_ok=True, parents=True)
+        for local_path in list(directory_path.rglob('*')):
+            if local_path.is_file() and local_path.relative_to(directory_path).as_posix() not in files:
+                self.remove(f'{key}/{local_path.relative_to(directory_path).as_posix()}')
+        self.evict(keep=key)
+        return directory_path
+
+    def remove(self, key: str):
+        with self.lock(key):
+            self._add_size(-self._file_size(key))
+            for path in [self.data_path(key), self._meta_path(key)]:
+                if path.exists():
+                    path.unlink()
+
+    def size(self) -> int:
+        return sum(self._entry_size(meta_path) for meta_path in self._iter_meta_paths())
+
+    def _iter_meta_paths(self) -> Iterator[Path]:
+        meta_root = self.root / self.META_DIR
+        if meta_root.exists():
+            yield from meta_root.rglob('*.json')
+
+    def _meta_path_to_key(self, meta_path: Path) -> str:
+        return meta_path.relative_to(self.root / self.META_DIR).as_posix()[:-len('.json')]
+
+    def _entry_size(self, meta_path: Path) -> int:
+        return self._file_size(self._meta_path_to_key(meta_path))
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Removes the least recently used entries until the cache is within max_bytes, except keep and the entries under
+        it. The entries are scanned once, and only if the running size is unknown or over max_bytes
+        """
+        if self.max_bytes is None or (self._size is not None and self._size <= self.max_bytes):
+            return
+        entries = []
+        for meta_path in self._iter_meta_paths():
+            try:
+                entries.append((meta_path.stat().st_mtime, self._meta_path_to_key(meta_path),
+                                self._entry_size(meta_path)))
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                continue
+        total_size = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if keep is not None and (key == keep or key.startswith(f'{keep}/')):
+                continue
+            logger.debug(f'Evicting {key} from the local cache')
+            self.remove(key)
+            total_size -= size
+        with self._size_lock:
+            self._size = total_size
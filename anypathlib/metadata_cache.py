@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from anypathlib.path_handlers.path_types import PathStat
+
+
+class MetadataCache:
+    """
+    Bounded LRU cache of PathStat results keyed by normalized url, with a per-entry TTL.
+    Missing paths are cached as negative (None) entries, with their own TTL.
+    Cached keys are also linked into a tree of their '/'-separated ancestors, so invalidation only visits the
+    affected subtree and ancestors instead of scanning the whole cache.
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl_seconds: float = 60, negative_ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = ttl_seconds if negative_ttl_seconds is None else negative_ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[PathStat]]]' = OrderedDict()
+        self._children: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def _normalize(url: str) -> str:
+        return url.rstrip('/')
+
+    @staticmethod
+    def _parent(key: str) -> str:
+        return key.rpartition('/')[0]
+
+    def _link(self, key: str):
+        child, parent = key, self._parent(key)
+        while parent:
+            siblings = self._children.get(parent)
+            if siblings is not None:
+                siblings.add(child)
+                return
+            self._children[parent] = {child}
+            child, parent = parent, self._parent(parent)
+
+    def _unlink(self, key: str):
+        # A key stays in the tree while it is cached or while anything is cached below it
+        child, parent = key, self._parent(key)
+        while parent and child not in self._entries and child not in self._children:
+            siblings = self._children.get(parent)
+            if siblings is None:
+                return
+            siblings.discard(child)
+            if siblings:
+                return
+            del self._children[parent]
+            child, parent = parent, self._parent(parent)
+
+    def _drop(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self._unlink(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> Tuple[bool, Optional[PathStat]]:
+        """
+        Returns (hit, stat). A hit with a None stat is a cached negative entry, i.e. the path does not exist
+        """
+        key = self._normalize(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, path_stat = entry
+            if time.monotonic() > expires_at:
+                self._drop(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, path_stat
+
+    def put(self, url: str, path_stat: Optional[PathStat]):
+        ttl_seconds = self.negative_ttl_seconds if path_stat is None else self.ttl_seconds
+        key = self._normalize(url)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, path_stat)
+            self._entries.move_to_end(key)
+            self._link(key)
+            while len(self._entries) > self.max_size:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._unlink(evicted_key)
+
+    def invalidate(self, url: str):
+        """
+        Drops the entries of url, of everything under it and of its ancestors, whose existence may depend on it
+        """
+        key = self._normalize(url)
+        with self._lock:
+            subtree = [key]
+            while subtree:
+                for child in self._children.pop(subtree.pop(), ()):
+                    self._entries.pop(child, None)
+                    subtree.append(child)
+            self._drop(key)
+            self._unlink(key)
+            ancestor = self._parent(key)
+            while ancestor:
+                self._drop(ancestor)
+                ancestor = self._parent(ancestor)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._children.clear()
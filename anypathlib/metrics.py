@@ -0,0 +1,365 @@
+import bisect
+import functools
+import os
+import threading
+import time
+import types
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from anypathlib.path_handlers.path_types import PathType
+
+# Upper bounds of the latency histogram buckets, in seconds, the last bucket being unbounded
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+@dataclass(frozen=True)
+class OperationEvent:
+    """
+    A single call of a handler method, which may send any number of backend requests (e.g. a directory download, or
+    a call retried by the SDK). bytes_transferred is set for the operations that move file data
+    """
+    path_type: PathType
+    operation: str
+    duration_seconds: float
+    bytes_transferred: int = 0
+    error: Optional[BaseException] = None
+
+
+@dataclass(frozen=True)
+class RequestEvent:
+    """
+    A single HTTP request sent to S3 or Azure, counted per attempt, so that the counts match what the backend sees.
+    request is the S3 API operation (e.g. 'GetObject') or the Azure HTTP method and comp (e.g. 'PUT block').
+    attempt is 1 for the first attempt of an SDK call and counts up on its retries
+    """
+    path_type: PathType
+    request: str
+    attempt: int = 1
+
+    @property
+    def is_retry(self) -> bool:
+        return self.attempt > 1
+
+
+class MetricsSink:
+    """
+    Receives an OperationEvent for every instrumented handler call and a RequestEvent for every backend request, see
+    add_metrics_sink. Events are sent from the calling thread, so sinks should be quick and thread-safe
+    """
+
+    def on_operation(self, event: OperationEvent):
+        pass
+
+    def on_request(self, event: RequestEvent):
+        pass
+
+
+class CallbackMetrics(MetricsSink):
+    """
+    Forwards every event to callback (and every request event to request_callback), e.g. to update Prometheus or
+    StatsD metrics
+    """
+
+    def __init__(self, callback: Callable[[OperationEvent], None],
+                 request_callback: Optional[Callable[[RequestEvent], None]] = None):
+        self.callback = callback
+        self.request_callback = request_callback
+
+    def on_operation(self, event: OperationEvent):
+        self.callback(event)
+
+    def on_request(self, event: RequestEvent):
+        if self.request_callback is not None:
+            self.request_callback(event)
+
+
+@dataclass
+class OperationStats:
+    count: int = 0
+    errors: int = 0
+    bytes_transferred: int = 0
+    total_seconds: float = 0
+    # Number of calls per bucket of LATENCY_BUCKETS
+    latency_buckets: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Bytes per second of call time. Calls in parallel each count their own time
+        """
+        return self.bytes_transferred / self.total_seconds if self.total_seconds else 0.0
+
+    def latency_quantile(self, quantile: float) -> float:
+        """
+        Upper bound of the histogram bucket holding the given quantile of the latencies
+        """
+        rank = quantile * self.count
+        seen = 0
+        for upper_bound, bucket_count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return upper_bound
+        return LATENCY_BUCKETS[-1]
+
+
+@dataclass
+class RequestStats:
+    # Every attempt, retries included
+    count: int = 0
+    retries: int = 0
+
+
+class InMemoryMetrics(MetricsSink):
+    """
+    Aggregates the events per (PathType, operation) into counts, errors, bytes and a latency histogram, and the
+    request events per (PathType, request) into request and retry counts
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[PathType, str], OperationStats] = {}
+        self._request_stats: Dict[Tuple[PathType, str], RequestStats] = {}
+
+    def on_operation(self, event: OperationEvent):
+        bucket_index = bisect.bisect_left(LATENCY_BUCKETS, event.duration_seconds)
+        with self._lock:
+            stats = self._stats.setdefault((event.path_type, event.operation), OperationStats())
+            stats.count += 1
+            stats.errors += event.error is not None
+            stats.bytes_transferred += event.bytes_transferred
+            stats.total_seconds += event.duration_seconds
+            stats.latency_buckets[bucket_index] += 1
+
+    def on_request(self, event: RequestEvent):
+        with self._lock:
+            request_stats = self._request_stats.setdefault((event.path_type, event.request), RequestStats())
+            request_stats.count += 1
+            request_stats.retries += event.is_retry
+
+    def snapshot(self) -> Dict[Tuple[PathType, str], OperationStats]:
+        with self._lock:
+            return {key: OperationStats(count=stats.count, errors=stats.errors,
+                                        bytes_transferred=stats.bytes_transferred, total_seconds=stats.total_seconds,
+                                        latency_buckets=list(stats.latency_buckets))
+                    for key, stats in self._stats.items()}
+
+    def request_snapshot(self) -> Dict[Tuple[PathType, str], RequestStats]:
+        with self._lock:
+            return {key: RequestStats(count=request_stats.count, retries=request_stats.retries)
+                    for key, request_stats in self._request_stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._request_stats.clear()
+
+
+# Replaced rather than mutated, so that reporting reads it without a lock
+_sinks: Tuple[MetricsSink, ...] = ()
+_sinks_lock = threading.Lock()
+
+
+def add_metrics_sink(sink: MetricsSink) -> MetricsSink:
+    global _sinks
+    with _sinks_lock:
+        _sinks = _sinks + (sink,)
+    return sink
+
+
+def remove_metrics_sink(sink: MetricsSink):
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+def _report(path_type: PathType, operation: str, start_time: float, bytes_transferred: int,
+            error: Optional[BaseException]):
+    event = OperationEvent(path_type=path_type, operation=operation,
+                           duration_seconds=time.perf_counter() - start_time, bytes_transferred=bytes_transferred,
+                           error=error)
+    for sink in _sinks:
+        try:
+            sink.on_operation(event)
+        except Exception as e:
+            logger.warning(f'Metrics sink {sink} failed: {e}')
+
+
+def report_request(path_type: PathType, request: str, attempt: int = 1):
+    if not _sinks:
+        return
+    event = RequestEvent(path_type=path_type, request=request, attempt=attempt)
+    for sink in _sinks:
+        try:
+            sink.on_request(event)
+        except Exception as e:
+            logger.warning(f'Metrics sink {sink} failed: {e}')
+
+
+def _on_boto3_before_send(request, event_name: str, **kwargs):
+    # before-send is emitted for every attempt, with the attempt number in the context of the call.
+    # Returning None lets botocore send the request
+    if _sinks:
+        attempt = request.context.get('retries', {}).get('attempt', 1)
+        report_request(PathType.s3, event_name.rsplit('.', 1)[-1], attempt)
+
+
+def instrument_boto3_client(client):
+    """
+    Reports a RequestEvent for every HTTP request sent by a boto3 (or aiobotocore) S3 client, retries included
+    """
+    client.meta.events.register('before-send.s3', _on_boto3_before_send)
+    return client
+
+
+# The attempt number of an Azure call, kept in the pipeline context that its retries share
+_AZURE_ATTEMPT_CONTEXT_KEY = 'anypathlib_attempt'
+
+
+def report_azure_request(pipeline_request):
+    """
+    raw_request_hook of the Azure clients, called by the pipeline for every attempt of a request
+    """
+    attempt = pipeline_request.context.get(_AZURE_ATTEMPT_CONTEXT_KEY, 0) + 1
+    pipeline_request.context[_AZURE_ATTEMPT_CONTEXT_KEY] = attempt
+    if _sinks:
+        http_request = pipeline_request.http_request
+        comp = http_request.query.get('comp')
+        report_request(PathType.azure, f'{http_request.method} {comp}' if comp else http_request.method, attempt)
+
+
+def _file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# The handler methods that are instrumented, with a function of (result, args, kwargs) to the number of bytes they
+# transferred. The arguments are those of the classmethod, without cls
+INSTRUMENTED_OPERATIONS: Dict[str, Optional[Callable[[object, tuple, dict], int]]] = {
+    'stat': None,
+    'iterdir_stats': None,
+    'glob_stats': None,
+    'rglob_stats': None,
+    'iter_file_stats': None,
+    'remove': None,
+    'download_file': lambda result, args, kwargs: _file_size(result) if result is not None else 0,
+    'upload_file': lambda result, args, kwargs: _file_size(kwargs['local_path'] if 'local_path' in kwargs else
+                                                           args[0]),
+    'upload_stream': lambda result, args, kwargs: kwargs.get('size') or 0,
+    'open_read_stream': None,
+    'read_range': lambda result, args, kwargs: len(result),
+    'read_range_into': lambda result, args, kwargs: result,
+    'download_directory': None,
+    'upload_directory': None,
+    'copy': None,
+    'copy_file': None,
+}
+# The operations returning a context manager of a read stream, timed until the stream is closed, with the bytes read
+# from it
+STREAM_OPERATIONS = {'open_read_stream'}
+
+
+def instrument(func: Callable, path_type: PathType, operation: str,
+               bytes_transferred: Optional[Callable[[object, tuple, dict], int]] = None) -> Callable:
+    """
+    Wraps func to report an OperationEvent per call to the registered sinks. Calls made while no sink is registered
+    cost a single check. Generators (listings) are timed until they are exhausted or closed, and STREAM_OPERATIONS
+    until their stream is closed
+    """
+
+    @functools.wraps(func)
+    def instrumented(*args, **kwargs):
+        if not _sinks:
+            return func(*args, **kwargs)
+        start_time = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            _report(path_type, operation, start_time, 0, e)
+            raise
+        if isinstance(result, types.GeneratorType):
+            return _instrument_generator(result, path_type, operation, start_time)
+        if operation in STREAM_OPERATIONS:
+            return _instrument_stream(result, path_type, operation, start_time)
+        # args[0] is cls
+        n_bytes = bytes_transferred(result, args[1:], kwargs) if bytes_transferred is not None else 0
+        _report(path_type, operation, start_time, n_bytes, None)
+        return result
+
+    return instrumented
+
+
+def _instrument_generator(generator: types.GeneratorType, path_type: PathType, operation: str, start_time: float):
+    error = None
+    try:
+        yield from generator
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        # A generator closed before its end (GeneratorExit) is not a failure
+        _report(path_type, operation, start_time, 0, error if not isinstance(error, GeneratorExit) else None)
+
+
+class _CountingStream:
+    """
+    Proxy of a read stream which counts the bytes read through it
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_read = 0
+
+    def read(self, *args, **kwargs):
+        data = self._stream.read(*args, **kwargs)
+        self.bytes_read += len(data)
+        return data
+
+    def readall(self):
+        data = self._stream.readall()
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        n_bytes = self._stream.readinto(buffer)
+        self.bytes_read += n_bytes or 0
+        return n_bytes
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+@contextmanager
+def _instrument_stream(stream_context, path_type: PathType, operation: str, start_time: float):
+    counting_stream = None
+    error = None
+    try:
+        with stream_context as stream:
+            counting_stream = _CountingStream(stream)
+            yield counting_stream
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _report(path_type, operation, start_time, counting_stream.bytes_read if counting_stream is not None else 0,
+                error)
+
+
+def instrument_handler(handler_class: type, path_type: PathType):
+    """
+    Instruments the INSTRUMENTED_OPERATIONS classmethods that handler_class defines itself
+    """
+    for operation, bytes_transferred in INSTRUMENTED_OPERATIONS.items():
+        method = handler_class.__dict__.get(operation)
+        if isinstance(method, classmethod):
+            setattr(handler_class, operation, classmethod(
+                instrument(method.__func__, path_type, operation, bytes_transferred)))
@@ -0,0 +1,235 @@
+import asyncio
+import functools
+import weakref
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple, ClassVar, Dict, List
+
+import aiohttp  # the default transport of the aio clients
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import BlobProperties
+from azure.storage.blob.aio import BlobServiceClient, ContainerClient
+
+from anypathlib.metrics import report_azure_request
+from anypathlib.path_handlers.azure_handler import AzureHandler, AzureStoragePath, ClientSettings
+from anypathlib.path_handlers.parallel import run_concurrently, TransferError
+from anypathlib.path_handlers.path_types import PathStat, PathKind
+from anypathlib.path_handlers.transfer_options import TransferOptions
+
+# The aiohttp session is shared by the pipeline of the BlobServiceClient, and closed after it
+OpenedClients = Tuple[aiohttp.ClientSession, BlobServiceClient]
+# The connection string and the client settings the clients were opened with
+ClientKey = Tuple[str, ClientSettings]
+
+
+class AsyncAzureHandler:
+    """
+    azure.storage.blob.aio counterpart of AzureHandler. Every method takes the container client of the url, from
+    client(). The BlobServiceClient and aiohttp session behind it are kept open per event loop, connection string and
+    client settings until close_clients(). Connection strings come from the cache of AzureHandler
+    """
+    DELETE_BATCH_SIZE = 256
+    # Server-side copies of any size are a single request
+    MAX_COPY_OBJECT_SIZE = None
+    # Clients are bound to the event loop they were opened in
+    _clients: ClassVar['weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, OpenedClients]]'] = \
+        weakref.WeakKeyDictionary()
+
+    @classmethod
+    async def _open_blob_service_client(cls, connection_string: str,
+                                        transfer_options: TransferOptions) -> OpenedClients:
+        connector = aiohttp.TCPConnector(limit=transfer_options.max_pool_connections)
+        session = aiohttp.ClientSession(connector=connector)
+        blob_service_client = BlobServiceClient.from_connection_string(
+            connection_string, max_single_put_size=transfer_options.multipart_threshold,
+            max_block_size=transfer_options.part_size, max_single_get_size=transfer_options.multipart_threshold,
+            max_chunk_get_size=transfer_options.part_size,
+            transport=AioHttpTransport(session=session, session_owner=False), raw_request_hook=report_azure_request)
+        await blob_service_client.__aenter__()
+        return session, blob_service_client
+
+    @classmethod
+    async def get_blob_service_client(cls, storage_account: str,
+                                      transfer_options: Optional[TransferOptions] = None) -> BlobServiceClient:
+        transfer_options = TransferOptions.resolve(transfer_options)
+        loop = asyncio.get_running_loop()
+        # The key lookup is a blocking management API call, done once per account thanks to the client cache
+        connection_string = await loop.run_in_executor(None, AzureHandler.client_cache.get_connection_string,
+                                                       storage_account)
+        # A rotated connection string gets new clients, the stale ones are closed by close_clients()
+        client_key = (connection_string, AzureHandler.get_client_settings(transfer_options))
+        loop_clients = cls._clients.setdefault(loop, {})
+        if client_key not in loop_clients:
+            opened_clients = await cls._open_blob_service_client(connection_string, transfer_options)
+            # Another coroutine may have opened the clients meanwhile
+            if loop_clients.setdefault(client_key, opened_clients) is not opened_clients:
+                await cls._close(*opened_clients)
+        return loop_clients[client_key][1]
+
+    @classmethod
+    @asynccontextmanager
+    async def client(cls, url: str, transfer_options: Optional[TransferOptions] = None):
+        storage_path = AzureHandler.http_to_storage_params(url)
+        blob_service_client = await cls.get_blob_service_client(storage_path.storage_account, transfer_options)
+        yield blob_service_client.get_container_client(storage_path.container_name)
+
+    @classmethod
+    async def _close(cls, session: aiohttp.ClientSession, blob_service_client: BlobServiceClient):
+        await blob_service_client.close()
+        await session.close()
+
+    @classmethod
+    async def close_clients(cls):
+        """
+        Closes the clients and sessions opened in the running event loop
+        """
+        for opened_clients in cls._clients.pop(asyncio.get_running_loop(), {}).values():
+            await cls._close(*opened_clients)
+
+    @classmethod
+    async def _list_first_blob(cls, container_client: ContainerClient, prefix: str) -> Optional[BlobProperties]:
+        try:
+            async for blob in container_client.list_blobs(name_starts_with=prefix, include=['metadata'],
+                                                          results_per_page=1):
+                return blob
+        except ResourceNotFoundError:
+            return None
+        return None
+
+    @classmethod
+    async def stat(cls, container_client: ContainerClient, url: str) -> Optional[PathStat]:
+        blob_name = AzureHandler.http_to_storage_params(url).blob_name
+        dir_prefix = blob_name.rstrip('/') + '/' if blob_name.rstrip('/') else ''
+        if blob_name and not blob_name.endswith('/'):
+            first_blob = await cls._list_first_blob(container_client, prefix=blob_name)
+            if first_blob is None:
+                return None
+            if first_blob.name == blob_name:
+                if AzureHandler._is_folder_placeholder(first_blob):
+                    return PathStat(kind=PathKind.directory, last_modified=first_blob.last_modified)
+                return AzureHandler._blob_to_stat(first_blob)
+            if first_blob.name.startswith(dir_prefix):
+                return PathStat(kind=PathKind.directory)
+        if await cls._list_first_blob(container_client, prefix=dir_prefix) is None:
+            return None
+        return PathStat(kind=PathKind.directory)
+
+    @classmethod
+    def _blob_url(cls, url: str, blob_name: str) -> str:
+        storage_path = AzureHandler.http_to_storage_params(url)
+        return AzureStoragePath(storage_account=storage_path.storage_account,
+                                container_name=storage_path.container_name, blob_name=blob_name).http_url
+
+    @classmethod
+    async def iter_stats(cls, container_client: ContainerClient, url: str,
+                         recursive: bool) -> AsyncIterator[Tuple[str, PathStat]]:
+        """
+        Lists the files under url, and with recursive=False its direct subdirectories as well
+        """
+        blob_name = AzureHandler.http_to_storage_params(url).blob_name
+        dir_prefix = blob_name.rstrip('/') + '/' if blob_name.rstrip('/') else ''
+        blobs = container_client.list_blobs(name_starts_with=dir_prefix) if recursive else \
+            container_client.walk_blobs(name_starts_with=dir_prefix, delimiter='/')
+        async for blob in blobs:
+            if not isinstance(blob, BlobProperties):
+                yield cls._blob_url(url, blob.name.rstrip('/')), PathStat(kind=PathKind.directory)
+            elif not blob.name.endswith('/'):
+                yield cls._blob_url(url, blob.name), AzureHandler._blob_to_stat(blob)
+
+    @classmethod
+    async def read_bytes(cls, container_client: ContainerClient, url: str) -> bytes:
+        downloader = await container_client.download_blob(AzureHandler.http_to_storage_params(url).blob_name)
+        return await downloader.readall()
+
+    @classmethod
+    async def write_bytes(cls, container_client: ContainerClient, url: str, data: bytes):
+        await container_client.upload_blob(AzureHandler.http_to_storage_params(url).blob_name, data, overwrite=True)
+
+    @classmethod
+    async def download_file(cls, container_client: ContainerClient, url: str, target_path: Path,
+                            transfer_options: Optional[TransferOptions] = None) -> Path:
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        downloader = await container_client.download_blob(
+            AzureHandler.http_to_storage_params(url).blob_name,
+            max_concurrency=TransferOptions.resolve(transfer_options).max_concurrency)
+        with open(target_path, 'wb') as f:
+            await downloader.readinto(f)
+        return target_path
+
+    @classmethod
+    async def upload_file(cls, container_client: ContainerClient, local_path: Path, target_url: str,
+                          transfer_options: Optional[TransferOptions] = None):
+        max_concurrency = TransferOptions.resolve(transfer_options).max_concurrency
+        with open(local_path, 'rb') as f:
+            await container_client.upload_blob(AzureHandler.http_to_storage_params(target_url).blob_name, f,
+                                               overwrite=True, max_concurrency=max_concurrency)
+
+    @classmethod
+    async def copy_file(cls, container_client: ContainerClient, source_url: str, target_url: str,
+                        size: Optional[int] = None):
+        """
+        Server-side copy, polled until done as AzureHandler.copy_file does
+        """
+        source_storage_path = AzureHandler.http_to_storage_params(source_url)
+        target_storage_path = AzureHandler.http_to_storage_params(target_url)
+        sas_token = await asyncio.get_running_loop().run_in_executor(None, AzureHandler._copy_source_sas,
+                                                                     source_storage_path, target_storage_path)
+        target_blob = container_client.get_blob_client(target_storage_path.blob_name)
+        copy_properties = await target_blob.start_copy_from_url(
+            f'{source_url}?{sas_token}' if sas_token is not None else source_url)
+        copy_status, copy_id = copy_properties['copy_status'], copy_properties['copy_id']
+        poll_interval = AzureHandler.COPY_POLL_INTERVAL_SECONDS
+        while copy_status == 'pending':
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, AzureHandler.MAX_COPY_POLL_INTERVAL_SECONDS)
+            blob_copy = (await target_blob.get_blob_properties()).copy
+            if blob_copy.id != copy_id:
+                raise OSError(f'{target_url} was overwritten during the copy')
+            copy_status = blob_copy.status
+        if copy_status != 'success':
+            raise OSError(f'Copying {source_url} to {target_url}: {copy_status}')
+
+    @classmethod
+    async def _delete_batch(cls, container_client: ContainerClient, blob_names: List[str]) -> int:
+        """
+        Deletes blob_names with a single blob batch request, returning the number of blobs deleted. Missing blobs are
+        skipped, and any other failure raises an OSError
+        """
+        failed = []
+        deleted = 0
+        async for response in await container_client.delete_blobs(*blob_names, raise_on_any_failure=False):
+            if response.status_code == 202:
+                deleted += 1
+            elif response.status_code != 404:
+                failed.append(f'{response.request.url}: {response.status_code}')
+        if failed:
+            raise OSError(f'{len(failed)} blobs were not deleted, e.g. {failed[0]}')
+        return deleted
+
+    @classmethod
+    async def remove(cls, container_client: ContainerClient, url: str, max_concurrency: int,
+                     allow_missing: bool = False):
+        """
+        Removes the blob at url and everything under it, with blob batch requests of 256 deletions.
+        Raises ResourceNotFoundError if there was nothing to remove, unless allow_missing or url ends with a '/', as
+        AzureHandler.remove does
+        """
+        blob_name = AzureHandler.http_to_storage_params(url).blob_name
+        # A missing blob is reported as 404 by the batch, so url is removed both as a blob and as a directory
+        blob_names = [blob_name] if blob_name and not blob_name.endswith('/') else []
+        dir_prefix = blob_name.rstrip('/') + '/' if blob_name.rstrip('/') else ''
+        try:
+            async for name in container_client.list_blob_names(name_starts_with=dir_prefix):
+                blob_names.append(name)
+        except ResourceNotFoundError:
+            # The container does not exist
+            blob_names = []
+
+        batches = [blob_names[i:i + cls.DELETE_BATCH_SIZE] for i in range(0, len(blob_names), cls.DELETE_BATCH_SIZE)]
+        deleted_counts, failures = await run_concurrently(functools.partial(cls._delete_batch, container_client),
+                                                          batches, max_concurrency=max_concurrency)
+        if failures:
+            raise TransferError(f'Failed removing {url}', failures)
+        if sum(deleted_counts) == 0 and blob_name and not url.endswith('/') and not allow_missing:
+            raise ResourceNotFoundError(f'{url} does not exist')
@@ -0,0 +1,192 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple, ClassVar, Dict
+
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session, AioSession
+
+from anypathlib.metrics import instrument_boto3_client
+from anypathlib.path_handlers.parallel import run_concurrently, TransferError
+from anypathlib.path_handlers.path_types import PathStat, PathKind
+from anypathlib.path_handlers.s3_handler import S3Handler
+from anypathlib.path_handlers.transfer_options import TransferOptions
+
+
+class AsyncS3Handler:
+    """
+    aiobotocore counterpart of S3Handler. Every method takes a client from client(), which is kept open per event loop
+    and connection pool size, so that connections and credentials are reused across operations until close_clients()
+    """
+    DELETE_BATCH_SIZE = 1000
+    MAX_COPY_OBJECT_SIZE = 5 * 1024 ** 3
+    _session: ClassVar[Optional[AioSession]] = None
+    # Clients are bound to the event loop they were opened in
+    _clients: ClassVar['weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, object]]'] = \
+        weakref.WeakKeyDictionary()
+
+    @classmethod
+    async def get_client(cls, transfer_options: Optional[TransferOptions] = None):
+        max_pool_connections = TransferOptions.resolve(transfer_options).max_pool_connections
+        loop_clients = cls._clients.setdefault(asyncio.get_running_loop(), {})
+        client = loop_clients.get(max_pool_connections)
+        if client is None:
+            # Clients of a shared session reuse its loaded service models, which makes them cheap to create
+            if cls._session is None:
+                cls._session = get_session()
+            new_client = await cls._session.create_client(
+                's3', config=AioConfig(max_pool_connections=max_pool_connections)).__aenter__()
+            instrument_boto3_client(new_client)
+            # Another coroutine may have opened a client meanwhile
+            client = loop_clients.setdefault(max_pool_connections, new_client)
+            if client is not new_client:
+                await new_client.close()
+        return client
+
+    @classmethod
+    @asynccontextmanager
+    async def client(cls, url: str, transfer_options: Optional[TransferOptions] = None):
+        yield await cls.get_client(transfer_options)
+
+    @classmethod
+    async def close_clients(cls):
+        """
+        Closes the clients opened in the running event loop
+        """
+        for client in cls._clients.pop(asyncio.get_running_loop(), {}).values():
+            await client.close()
+
+    @classmethod
+    async def _list_first_object(cls, client, bucket: str, prefix: str) -> Optional[dict]:
+        try:
+            resp = await client.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=1)
+        except client.exceptions.NoSuchBucket:
+            return None
+        contents = resp.get('Contents', [])
+        return contents[0] if contents else None
+
+    @classmethod
+    async def stat(cls, client, url: str) -> Optional[PathStat]:
+        bucket, key = S3Handler.get_bucket_and_key_from_uri(url)
+        dir_prefix = key.rstrip('/') + '/' if key.rstrip('/') else ''
+        if key and not key.endswith('/'):
+            first_object = await cls._list_first_object(client, bucket=bucket, prefix=key)
+            if first_object is None:
+                return None
+            if first_object['Key'] == key:
+                return S3Handler._object_to_stat(first_object)
+            if first_object['Key'].startswith(dir_prefix):
+                return PathStat(kind=PathKind.directory)
+        if await cls._list_first_object(client, bucket=bucket, prefix=dir_prefix) is None:
+            return None
+        return PathStat(kind=PathKind.directory)
+
+    @classmethod
+    async def iter_stats(cls, client, url: str, recursive: bool) -> AsyncIterator[Tuple[str, PathStat]]:
+        """
+        Lists the files under url, and with recursive=False its direct subdirectories as well
+        """
+        bucket, key = S3Handler.get_bucket_and_key_from_uri(url)
+        dir_prefix = key.rstrip('/') + '/' if key.rstrip('/') else ''
+        pagination_kwargs = {'Bucket': bucket, 'Prefix': dir_prefix}
+        if not recursive:
+            pagination_kwargs['Delimiter'] = '/'
+        async for page in client.get_paginator('list_objects_v2').paginate(**pagination_kwargs):
+            for common_prefix in page.get('CommonPrefixes', []):
+                yield S3Handler.get_full_path(bucket=bucket, key=common_prefix['Prefix'].rstrip('/')), PathStat(
+                    kind=PathKind.directory)
+            for obj in page.get('Contents', []):
+                # skip directory markers
+                if not obj['Key'].endswith('/'):
+                    yield S3Handler.get_full_path(bucket=bucket, key=obj['Key']), S3Handler._object_to_stat(obj)
+
+    @classmethod
+    async def read_bytes(cls, client, url: str) -> bytes:
+        bucket, key = S3Handler.get_bucket_and_key_from_uri(url)
+        resp = await client.get_object(Bucket=bucket, Key=key)
+        async with resp['Body'] as body:
+            return await body.read()
+
+    @classmethod
+    async def write_bytes(cls, client, url: str, data: bytes):
+        bucket, key = S3Handler.get_bucket_and_key_from_uri(url)
+        await client.put_object(Bucket=bucket, Key=key, Body=data)
+
+    @classmethod
+    async def download_file(cls, client, url: str, target_path: Path,
+                            transfer_options: Optional[TransferOptions] = None) -> Path:
+        transfer_options = TransferOptions.resolve(transfer_options)
+        bucket, key = S3Handler.get_bucket_and_key_from_uri(url)
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        resp = await client.get_object(Bucket=bucket, Key=key)
+        async with resp['Body'] as body:
+            with open(target_path, 'wb') as f:
+                async for chunk in body.iter_chunks(transfer_options.part_size):
+                    f.write(chunk)
+        return target_path
+
+    @classmethod
+    async def upload_file(cls, client, local_path: Path, target_url: str,
+                          transfer_options: Optional[TransferOptions] = None):
+        """
+        Files larger than multipart_threshold are uploaded in parts of part_size, max_concurrency parts at a time
+        """
+        transfer_options = TransferOptions.resolve(transfer_options)
+        bucket, key = S3Handler.get_bucket_and_key_from_uri(target_url)
+        file_size = local_path.stat().st_size
+        if file_size <= transfer_options.multipart_threshold:
+            await client.put_object(Bucket=bucket, Key=key, Body=local_path.read_bytes())
+            return
+        upload_id = (await client.create_multipart_upload(Bucket=bucket, Key=key))['UploadId']
+
+        async def upload_part(part_number: int) -> dict:
+            with open(local_path, 'rb') as f:
+                f.seek((part_number - 1) * transfer_options.part_size)
+                data = f.read(transfer_options.part_size)
+            resp = await client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
+                                            Body=data)
+            return {'PartNumber': part_number, 'ETag': resp['ETag']}
+
+        part_numbers = list(range(1, (file_size + transfer_options.part_size - 1) // transfer_options.part_size + 1))
+        parts, failures = await run_concurrently(upload_part, part_numbers,
+                                                 max_concurrency=transfer_options.max_concurrency)
+        if failures:
+            await client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            raise TransferError(f'Failed uploading {local_path} to {target_url}', failures)
+        await client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                               MultipartUpload={'Parts': parts})
+
+    @classmethod
+    async def copy_file(cls, client, source_url: str, target_url: str, size: Optional[int] = None):
+        """
+        Server-side copy of objects up to 5GB, the limit of a single CopyObject request
+        """
+        if size is not None and size > cls.MAX_COPY_OBJECT_SIZE:
+            raise ValueError(f'{source_url} is too large for a single CopyObject request')
+        source_bucket, source_key = S3Handler.get_bucket_and_key_from_uri(source_url)
+        target_bucket, target_key = S3Handler.get_bucket_and_key_from_uri(target_url)
+        await client.copy_object(CopySource={'Bucket': source_bucket, 'Key': source_key}, Bucket=target_bucket,
+                                 Key=target_key)
+
+    @classmethod
+    async def remove(cls, client, url: str, max_concurrency: int):
+        """
+        Removes the object at url and everything under it, with DeleteObjects batches of 1000 keys
+        """
+        bucket, key = S3Handler.get_bucket_and_key_from_uri(url)
+        keys = [key] if key and not key.endswith('/') else []
+        dir_prefix = key.rstrip('/') + '/' if key.rstrip('/') else ''
+        async for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=dir_prefix):
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+
+        async def delete_batch(batch_keys):
+            resp = await client.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': k} for k in batch_keys],
+                                                                      'Quiet': True})
+            for error in resp.get('Errors', []):
+                raise OSError(f"{error['Key']}: {error['Code']} {error['Message']}")
+
+        batches = [keys[i:i + cls.DELETE_BATCH_SIZE] for i in range(0, len(keys), cls.DELETE_BATCH_SIZE)]
+        _, failures = await run_concurrently(delete_batch, batches, max_concurrency=max_concurrency)
+        if failures:
+            raise TransferError(f'Failed removing {url}', failures)
@@ -1,21 +1,125 @@
-import fnmatch
 import os
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, ClassVar, Iterator, BinaryIO
 from urllib.parse import urlparse
 
-from tqdm import tqdm
-from azure.core.exceptions import ResourceNotFoundError
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.exceptions import ResourceNotFoundError, HttpResponseError
+from azure.core.pipeline.transport import RequestsTransport
 
 from azure.identity import DefaultAzureCredential
 from azure.mgmt.storage import StorageManagementClient
-from azure.storage.blob import BlobServiceClient, ContainerClient
+from azure.storage.blob import BlobServiceClient, ContainerClient, BlobProperties, ContainerSasPermissions, \
+    generate_container_sas, CopyProperties
 
 from loguru import logger
 
+from anypathlib.metrics import report_azure_request
 from anypathlib.path_handlers.base_path_handler import BasePathHandler
+from anypathlib.path_handlers.glob_pattern import compile_glob, compile_rglob
+from anypathlib.path_handlers.parallel import run_in_parallel, TransferError
+from anypathlib.path_handlers.path_types import PathStat, PathKind, PathType
+from anypathlib.path_handlers.transfer_options import TransferOptions
+
+
+# The TransferOptions fields that are set on the clients themselves
+ClientSettings = Tuple[int, int, int]
+
+
+@dataclass
+class AzureAccountClients:
+    connection_string: str
+    created_at: float
+    # Set with AzureClientCache.set_connection_string, and never looked up again
+    pinned: bool = False
+    blob_service_clients: Dict[ClientSettings, BlobServiceClient] = field(default_factory=dict)
+    container_clients: Dict[Tuple[str, ClientSettings], ContainerClient] = field(default_factory=dict)
+
+
+class AzureClientCache:
+    """
+    Thread-safe cache of connection strings, BlobServiceClient and ContainerClient instances per storage account
+    (and per client-level TransferOptions settings).
+    Entries are rebuilt (including the account key lookup) once they are older than ttl_seconds.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._account_locks: Dict[str, threading.Lock] = {}
+        self._accounts: Dict[str, AzureAccountClients] = {}
+
+    def _account_lock(self, storage_account: str) -> threading.Lock:
+        with self._lock:
+            return self._account_locks.setdefault(storage_account, threading.Lock())
+
+    def _is_expired(self, account_clients: AzureAccountClients) -> bool:
+        return not account_clients.pinned and time.monotonic() - account_clients.created_at > self.ttl_seconds
+
+    def get(self, storage_account: str) -> AzureAccountClients:
+        account_clients = self._accounts.get(storage_account)
+        if account_clients is not None and not self._is_expired(account_clients):
+            return account_clients
+        # Only one thread per storage account fetches the key, the rest wait and reuse its result
+        with self._account_lock(storage_account):
+            account_clients = self._accounts.get(storage_account)
+            if account_clients is None or self._is_expired(account_clients):
+                connection_string = AzureHandler.get_connection_string(storage_account)
+                account_clients = AzureAccountClients(connection_string=connection_string,
+                                                      created_at=time.monotonic())
+                with self._lock:
+                    self._accounts[storage_account] = account_clients
+            return account_clients
+
+    def get_connection_string(self, storage_account: str) -> str:
+        return self.get(storage_account).connection_string
+
+    def get_blob_service_client(self, storage_account: str,
+                                transfer_options: Optional[TransferOptions] = None) -> BlobServiceClient:
+        account_clients = self.get(storage_account)
+        client_settings = AzureHandler.get_client_settings(transfer_options)
+        blob_service_client = account_clients.blob_service_clients.get(client_settings)
+        if blob_service_client is None:
+            with self._lock:
+                if client_settings not in account_clients.blob_service_clients:
+                    account_clients.blob_service_clients[client_settings] = AzureHandler.create_blob_service_client(
+                        account_clients.connection_string, transfer_options)
+                blob_service_client = account_clients.blob_service_clients[client_settings]
+        return blob_service_client
+
+    def get_container_client(self, storage_account: str, container_name: str,
+                             transfer_options: Optional[TransferOptions] = None) -> ContainerClient:
+        account_clients = self.get(storage_account)
+        container_key = (container_name, AzureHandler.get_client_settings(transfer_options))
+        container_client = account_clients.container_clients.get(container_key)
+        if container_client is None:
+            blob_service_client = self.get_blob_service_client(storage_account, transfer_options)
+            with self._lock:
+                container_client = account_clients.container_clients.setdefault(
+                    container_key, blob_service_client.get_container_client(container_name))
+        return container_client
+
+    def set_connection_string(self, storage_account: str, connection_string: str):
+        """
+        Uses connection_string for storage_account instead of looking up its key, e.g. to point it at a local
+        emulator such as Azurite
+        """
+        with self._lock:
+            self._accounts[storage_account] = AzureAccountClients(connection_string=connection_string,
+                                                                  created_at=time.monotonic(), pinned=True)
+
+    def invalidate(self, storage_account: Optional[str] = None):
+        with self._lock:
+            if storage_account is None:
+                self._accounts.clear()
+            else:
+                self._accounts.pop(storage_account, None)
 
 
 @dataclass
@@ -28,8 +132,6 @@ class AzureStoragePath:
     _container_client: Optional[ContainerClient] = field(init=False, default=None)
 
     def __post_init__(self):
-        if self.connection_string is None:
-            self.connection_string = AzureHandler.get_connection_string(self.storage_account)
         self._container_client = None
         self._blob_service_client = None
 
@@ -40,22 +142,74 @@ class AzureStoragePath:
     @property
     def blob_service_client(self) -> BlobServiceClient:
         if self._blob_service_client is None:
-            self._blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
+            if self.connection_string is None:
+                self._blob_service_client = AzureHandler.client_cache.get_blob_service_client(self.storage_account)
+            else:
+                self._blob_service_client = AzureHandler.create_blob_service_client(self.connection_string)
         return self._blob_service_client
 
     @property
-    def container_client(cls) -> ContainerClient:
-        if cls._container_client is None:
-            cls._container_client = cls.blob_service_client.get_container_client(cls.container_name)
+    def container_client(self) -> ContainerClient:
+        if self._container_client is None:
+            self._container_client = self.get_container_client()
+        return self._container_client
+
+    def get_container_client(self, transfer_options: Optional[TransferOptions] = None) -> ContainerClient:
+        if self.connection_string is None:
+            return AzureHandler.client_cache.get_container_client(self.storage_account, self.container_name,
+                                                                  transfer_options)
+        return AzureHandler.create_blob_service_client(self.connection_string,
+                                                       transfer_options).get_container_client(self.container_name)
+
+
+@dataclass
+class BlobCopyStatus:
+    """
+    Status of a server-side blob copy: 'success', 'pending', 'failed' or 'aborted', with the reason of a failure
+    """
+    source_url: str
+    target_url: str
+    status: str
+    copy_id: Optional[str] = None
+    error: Optional[str] = None
 
-        return cls._container_client
+
+class MemoryViewWriter:
+    """
+    Sequential writable stream over a memoryview, for the downloaders' readinto
+    """
+
+    def __init__(self, buffer: memoryview):
+        self.buffer = buffer
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self.buffer[self.position:self.position + len(data)] = data
+        self.position += len(data)
+        return len(data)
 
 
 class AzureHandler(BasePathHandler):
+    PATH_TYPE = PathType.azure
     DEFAULT_SUBSCRIPTION_ID = os.environ.get('AZURE_SUBSCRIPTION_ID', None)
 
     DEFAULT_GROUP_NAME = os.environ.get('AZURE_RESOURCE_GROUP_NAME', None)
     AZURE_URL_SUFFIX = r'blob.core.windows.net'
+    DELETE_BATCH_SIZE = 256
+    # Batches listed ahead of the deletions when transfer_options.max_workers is not set
+    DELETE_WINDOW_BATCHES = 32
+    COPY_POLL_INTERVAL_SECONDS = 0.5
+    MAX_COPY_POLL_INTERVAL_SECONDS = 15
+    # Up to this many pending copies are polled blob by blob, more with a single listing of the target prefix
+    MAX_COPIES_POLLED_PER_BLOB = 8
+    COPY_SOURCE_SAS_TTL_SECONDS = 24 * 3600
+    CLIENT_CACHE_TTL_SECONDS = 3600
+    client_cache: ClassVar[AzureClientCache] = AzureClientCache(ttl_seconds=CLIENT_CACHE_TTL_SECONDS)
+    _credential: ClassVar[Optional[DefaultAzureCredential]] = None
+    _credential_lock: ClassVar[threading.Lock] = threading.Lock()
 
     @classmethod
     def refresh_credentials(cls):
@@ -65,32 +219,85 @@ class AzureHandler(BasePathHandler):
             cls.DEFAULT_GROUP_NAME = os.environ.get('AZURE_RESOURCE_GROUP_NAME', None)
 
     @classmethod
-    def relative_path(cls, url: str) -> str:
-        storage_path = cls.http_to_storage_params(url)
-        return f'{storage_path.container_name}/{storage_path.blob_name}'
+    def get_credential(cls) -> DefaultAzureCredential:
+        with cls._credential_lock:
+            if cls._credential is None:
+                cls._credential = DefaultAzureCredential()
+            return cls._credential
 
     @classmethod
-    def is_dir(cls, url: str) -> bool:
-        return cls.exists(url) and not cls.is_file(url)
+    def get_client_settings(cls, transfer_options: Optional[TransferOptions] = None) -> ClientSettings:
+        transfer_options = TransferOptions.resolve(transfer_options)
+        return (transfer_options.multipart_threshold, transfer_options.part_size,
+                transfer_options.max_pool_connections)
+
+    @classmethod
+    def create_blob_service_client(cls, connection_string: str,
+                                   transfer_options: Optional[TransferOptions] = None) -> BlobServiceClient:
+        """
+        Blobs larger than multipart_threshold are uploaded in blocks and downloaded in ranges of part_size bytes,
+        and all the requests of the client share a pool of max_pool_connections connections. Every attempt of a request
+        is reported to the metrics sinks
+        """
+        transfer_options = TransferOptions.resolve(transfer_options)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=transfer_options.max_pool_connections)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return BlobServiceClient.from_connection_string(connection_string,
+                                                        max_single_put_size=transfer_options.multipart_threshold,
+                                                        max_block_size=transfer_options.part_size,
+                                                        max_single_get_size=transfer_options.multipart_threshold,
+                                                        max_chunk_get_size=transfer_options.part_size,
+                                                        # The transport owns the session: it is closed with the
+                                                        # client, and freed with the clients the cache drops
+                                                        transport=RequestsTransport(session=session,
+                                                                                    session_owner=True),
+                                                        raw_request_hook=report_azure_request)
+
+    @classmethod
+    def invalidate_clients(cls, storage_account: Optional[str] = None):
+        """
+        Drops the cached connection string and clients of storage_account (or of all accounts if None),
+        forcing a new key lookup on the next operation.
+        """
+        cls.client_cache.invalidate(storage_account)
 
     @classmethod
-    def is_file(cls, url: str) -> bool:
+    def relative_path(cls, url: str) -> str:
         storage_path = cls.http_to_storage_params(url)
-        container_client = storage_path.container_client
-        blob_client = container_client.get_blob_client(storage_path.blob_name)
+        return f'{storage_path.container_name}/{storage_path.blob_name}'
 
+    @classmethod
+    def _list_first_blob(cls, container_client: ContainerClient, prefix: str) -> Optional[BlobProperties]:
+        pages = container_client.list_blobs(name_starts_with=prefix, include=['metadata'],
+                                            results_per_page=1).by_page()
         try:
-            blob_properties = blob_client.get_blob_properties()
-            # If the blob exists and is not a directory placeholder, it's a file
-            return not blob_properties.metadata.get('hdi_isfolder', False)
-        except Exception:
-            return False  # If exception is raised, the blob does not exist or is not a file
+            return next(iter(next(pages, [])), None)
+        except ResourceNotFoundError:
+            # The container does not exist
+            return None
 
     @classmethod
-    def exists(cls, url: str) -> bool:
+    def stat(cls, url: str) -> Optional[PathStat]:
         storage_path = cls.http_to_storage_params(url)
         container_client = storage_path.container_client
-        return len([p for p in container_client.list_blobs(name_starts_with=storage_path.blob_name)]) > 0
+        blob_name = storage_path.blob_name
+        dir_prefix = blob_name.rstrip('/') + '/' if blob_name.rstrip('/') else ''
+        if blob_name and not blob_name.endswith('/'):
+            first_blob = cls._list_first_blob(container_client=container_client, prefix=blob_name)
+            if first_blob is None:
+                return None
+            if first_blob.name == blob_name:
+                if cls._is_folder_placeholder(first_blob):
+                    return PathStat(kind=PathKind.directory, last_modified=first_blob.last_modified)
+                return cls._blob_to_stat(first_blob)
+            if first_blob.name.startswith(dir_prefix):
+                return PathStat(kind=PathKind.directory)
+            # A sibling sharing the prefix (e.g. "name.txt" for "name") sorts before "name/", so look under it
+        if cls._list_first_blob(container_client=container_client, prefix=dir_prefix) is None:
+            return None
+        return PathStat(kind=PathKind.directory)
 
     @classmethod
     def get_connection_string(cls, storage_account: str, subscription_id: Optional[str] = None,
@@ -149,7 +356,7 @@ class AzureHandler(BasePathHandler):
                         Set the AZURE_RESOURCE_GROUP_NAME environment variable, or pass it as an argument.
                         """
                     )
-            client = StorageManagementClient(credential=DefaultAzureCredential(), subscription_id=subscription_id)
+            client = StorageManagementClient(credential=cls.get_credential(), subscription_id=subscription_id)
             response = client.storage_accounts.list_keys(resource_group_name=resource_group_name,
                                                          account_name=storage_account_name, )
             if not response.keys:
@@ -173,33 +380,44 @@ class AzureHandler(BasePathHandler):
             raise e
 
     @classmethod
-    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True) -> Path:
+    def _download_blob(cls, container_client: ContainerClient, blob_name: str, target_path: Path,
+                       force_overwrite: bool = True, transfer_options: Optional[TransferOptions] = None) -> Path:
         if target_path.exists() and not force_overwrite:
             return target_path
-        azure_storage_path = cls.http_to_storage_params(url)
-        # Construct the Blob Service Client
-        blob_service_client = BlobServiceClient(
-            account_url=f"https://{azure_storage_path.storage_account}.{cls.AZURE_URL_SUFFIX}")
-
-        # Get a client to interact with the specified container and blob
-        blob_client = blob_service_client.get_blob_client(container=azure_storage_path.container_name,
-                                                          blob=azure_storage_path.blob_name)
+        # Get a client to interact with the specified blob
+        blob_client = container_client.get_blob_client(blob_name)
 
         # Ensure the directory exists
         target_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Download the blob to a local file
+        # Stream the blob to a local file chunk by chunk, downloading up to max_concurrency ranges in parallel
         with open(target_path, "wb") as download_file:
-            download_file.write(blob_client.download_blob().readall())
+            blob_client.download_blob(
+                max_concurrency=TransferOptions.resolve(transfer_options).max_concurrency).readinto(download_file)
 
         return target_path
 
     @classmethod
-    def upload_file(cls, local_path: str, target_url: str):
+    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True,
+                      transfer_options: Optional[TransferOptions] = None) -> Path:
+        if target_path.exists() and not force_overwrite:
+            return target_path
+        azure_storage_path = cls.http_to_storage_params(url)
+        return cls._download_blob(container_client=azure_storage_path.get_container_client(transfer_options),
+                                  blob_name=azure_storage_path.blob_name, target_path=target_path,
+                                  force_overwrite=force_overwrite, transfer_options=transfer_options)
+
+    @classmethod
+    def upload_file(cls, local_path: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
         """Upload a single file to Azure Blob Storage."""
+        with open(local_path, "rb") as data:
+            cls.upload_stream(stream=data, target_url=target_url, transfer_options=transfer_options)
+
+    @classmethod
+    def upload_stream(cls, stream: BinaryIO, target_url: str, size: Optional[int] = None,
+                      transfer_options: Optional[TransferOptions] = None):
         azure_storage_path = cls.http_to_storage_params(target_url)
-        blob_service_client = azure_storage_path.blob_service_client
-        container_client = azure_storage_path.container_client
+        container_client = azure_storage_path.get_container_client(transfer_options)
         # Check if the container exists and create if it does not
         try:
             container_client.get_container_properties()
@@ -207,66 +425,161 @@ class AzureHandler(BasePathHandler):
             # Assuming exception means container does not exist. Create new container
             container_client.create_container()
 
-        # Now, upload the file
-        blob_client = blob_service_client.get_blob_client(container=azure_storage_path.container_name,
-                                                          blob=azure_storage_path.blob_name)
-        with open(local_path, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
+        # Blocks of part_size are read from the stream and staged up to max_concurrency at a time
+        blob_client = container_client.get_blob_client(azure_storage_path.blob_name)
+        blob_client.upload_blob(stream, length=size, overwrite=True,
+                                max_concurrency=TransferOptions.resolve(transfer_options).max_concurrency)
+
+    @classmethod
+    def read_range(cls, url: str, offset: int, length: int,
+                   transfer_options: Optional[TransferOptions] = None) -> bytes:
+        azure_storage_path = cls.http_to_storage_params(url)
+        blob_client = azure_storage_path.get_container_client(transfer_options).get_blob_client(
+            azure_storage_path.blob_name)
+        return blob_client.download_blob(offset=offset, length=length).readall()
+
+    @classmethod
+    def read_range_into(cls, url: str, offset: int, buffer: memoryview,
+                        transfer_options: Optional[TransferOptions] = None) -> int:
+        azure_storage_path = cls.http_to_storage_params(url)
+        blob_client = azure_storage_path.get_container_client(transfer_options).get_blob_client(
+            azure_storage_path.blob_name)
+        writer = MemoryViewWriter(buffer)
+        blob_client.download_blob(offset=offset, length=len(buffer)).readinto(writer)
+        return writer.position
+
+    @classmethod
+    @contextmanager
+    def open_read_stream(cls, url: str, transfer_options: Optional[TransferOptions] = None) -> Iterator[BinaryIO]:
+        azure_storage_path = cls.http_to_storage_params(url)
+        blob_client = azure_storage_path.get_container_client(transfer_options).get_blob_client(
+            azure_storage_path.blob_name)
+        # The downloader fetches chunk_size ranges as they are read, up to max_concurrency at a time
+        yield blob_client.download_blob(max_concurrency=TransferOptions.resolve(transfer_options).max_concurrency)
+
+    @classmethod
+    def _iter_delete_windows(cls, container_client: ContainerClient, dir_prefix: str,
+                             window_size: int) -> Iterator[List[List[str]]]:
+        """
+        Streams the listing of dir_prefix as windows of up to window_size batches of DELETE_BATCH_SIZE blob names,
+        so that only one window is held in memory at a time
+        """
+        window, batch = [], []
+        for blob_name in container_client.list_blob_names(name_starts_with=dir_prefix):
+            batch.append(blob_name)
+            if len(batch) == cls.DELETE_BATCH_SIZE:
+                window.append(batch)
+                batch = []
+                if len(window) == window_size:
+                    yield window
+                    window = []
+        if batch:
+            window.append(batch)
+        if window:
+            yield window
 
     @classmethod
-    def remove_directory(cls, url: str):
-        """Remove a directory (all blobs with the same prefix) from Azure Blob Storage."""
+    def remove_directory(cls, url: str, transfer_options: Optional[TransferOptions] = None) -> int:
+        """
+        Removes all the blobs under url with blob batch requests of DELETE_BATCH_SIZE deletions,
+        transfer_options.max_workers batches at a time, deleting each listing window before listing the next one.
+        Returns the number of removed blobs, and raises a TransferError with the failed blobs once done if some of
+        them could not be removed
+        """
+        transfer_options = TransferOptions.resolve(transfer_options)
         azure_storage_path = cls.http_to_storage_params(url)
         container_client = azure_storage_path.container_client
-        for blob in container_client.list_blobs(name_starts_with=azure_storage_path.blob_name):
-            container_client.delete_blob(blob.name)
+        dir_prefix = azure_storage_path.blob_name.rstrip('/') + '/' if azure_storage_path.blob_name.rstrip('/') else ''
+
+        def delete_batch(batch_blob_names: List[str]) -> List[Tuple[str, Exception]]:
+            responses = container_client.delete_blobs(*batch_blob_names, raise_on_any_failure=False)
+            # The sub-responses are in the order of the sub-requests. A blob deleted meanwhile is not a failure
+            return [(blob_name, OSError(f'Deleting {blob_name} failed with HTTP {response.status_code}'))
+                    for blob_name, response in zip(batch_blob_names, responses)
+                    if response.status_code not in (202, 404)]
+
+        removed_blobs = 0
+        failures = []
+        windows = cls._iter_delete_windows(container_client, dir_prefix,
+                                           window_size=transfer_options.max_workers or cls.DELETE_WINDOW_BATCHES)
+        try:
+            for batches in windows:
+                batch_results, batch_failures = run_in_parallel(delete_batch, batches,
+                                                                max_workers=transfer_options.max_workers,
+                                                                desc='Removing blobs',
+                                                                retry_policy=transfer_options.retry_policy)
+                failures += [failure for batch_result in batch_results for failure in batch_result]
+                # A failed batch request fails all of its blobs
+                failures += [(blob_name, exc) for batch, exc in batch_failures for blob_name in batch]
+                removed_blobs += sum(len(batch) for batch in batches)
+        except ResourceNotFoundError:
+            # The container does not exist
+            return 0
+        if failures:
+            raise TransferError(f'Failed removing {url}', failures=failures)
+        return removed_blobs
 
     @classmethod
     def remove(cls, url: str, allow_missing: bool = False):
-        """Remove a single file/directory from Azure Blob Storage."""
-        if url.endswith('/'):
+        """
+        Removes the blob at url, or everything under url as a directory if there is no such blob or url ends with a '/'.
+        Raises ResourceNotFoundError if there was nothing to remove, unless allow_missing or url ends with a '/'
+        """
+        azure_storage_path = cls.http_to_storage_params(url)
+        if not azure_storage_path.blob_name or url.endswith('/'):
             cls.remove_directory(url)
-        else:
-            azure_storage_path = cls.http_to_storage_params(url)
-            container_client = azure_storage_path.container_client
-            try:
-                container_client.delete_blob(azure_storage_path.blob_name)
-            except ResourceNotFoundError as e:
-                if not allow_missing:
-                    raise e
+            return
+        # A single blob is removed with a single request, without listing the prefix first
+        try:
+            azure_storage_path.container_client.delete_blob(azure_storage_path.blob_name)
+            return
+        except ResourceNotFoundError as e:
+            missing_blob_error = e
+        except HttpResponseError as e:
+            # The placeholder of a non-empty directory of a hierarchical namespace goes after its content
+            if e.status_code != 409:
+                raise e
+            cls.remove_directory(url)
+            azure_storage_path.container_client.delete_blob(azure_storage_path.blob_name)
+            return
+        if cls.remove_directory(url) == 0 and not allow_missing:
+            raise missing_blob_error
 
     @classmethod
-    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path, verbose: bool) -> \
-            Optional[Tuple[Path, List[Path]]]:
+    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path, verbose: bool,
+                           transfer_options: Optional[TransferOptions] = None) -> Optional[Tuple[Path, List[Path]]]:
         """Download a directory (all blobs with the same prefix) from Azure Blob Storage."""
         assert target_dir.is_dir()
+        transfer_options = TransferOptions.resolve(transfer_options)
         azure_storage_path = cls.http_to_storage_params(url)
+        container_client = azure_storage_path.get_container_client(transfer_options)
+        dir_prefix = azure_storage_path.blob_name.rstrip('/') + '/' if azure_storage_path.blob_name.rstrip('/') else ''
 
-        container_client = azure_storage_path.container_client
-        local_paths = []
-
-        if verbose:
-            container_iterator = container_client.list_blobs(name_starts_with=azure_storage_path.blob_name)
-            progress_bar = tqdm(container_iterator, desc='Downloading directory',
-                                total=len(list(container_iterator)))
-        else:
-            progress_bar = container_client.list_blobs(name_starts_with=azure_storage_path.blob_name)
-
-        for blob in progress_bar:
-            blob_url = AzureStoragePath(storage_account=azure_storage_path.storage_account,
-                                        container_name=azure_storage_path.container_name, blob_name=blob.name,
-                                        connection_string=azure_storage_path.connection_string).http_url
-            local_target = target_dir / Path(blob_url).relative_to(Path(url))
-            local_path = cls.download_file(url=blob_url, force_overwrite=force_overwrite, target_path=local_target)
-            assert local_path is not None, f'could not download from {url}'
-            local_paths.append(Path(local_path))
-        if len(local_paths) == 0:
+        # A single listing pass, used both for the downloads and for the progress bar
+        blob_names = [blob_name for blob_name in container_client.list_blob_names(name_starts_with=dir_prefix) if
+                      blob_name != dir_prefix]
+        if len(blob_names) == 0:
             return None
-        return local_paths[0].parent, local_paths
+
+        def download_blob_wrapper(blob_name: str) -> Path:
+            local_target = target_dir / blob_name[len(dir_prefix):]
+            return cls._download_blob(container_client=container_client, blob_name=blob_name,
+                                      target_path=local_target, force_overwrite=force_overwrite,
+                                      transfer_options=transfer_options)
+
+        local_paths, failures = run_in_parallel(download_blob_wrapper, blob_names,
+                                                max_workers=transfer_options.max_workers, verbose=verbose,
+                                                desc='Downloading directory',
+                                                retry_policy=transfer_options.retry_policy)
+        if failures:
+            raise TransferError(f'Failed downloading {url} to {target_dir}', failures=failures)
+        return target_dir, local_paths
 
     @classmethod
-    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool):
+    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool,
+                         transfer_options: Optional[TransferOptions] = None):
         """Upload a directory to Azure Blob Storage."""
+        transfer_options = TransferOptions.resolve(transfer_options)
         azure_storage_path = cls.http_to_storage_params(target_url)
         # Check if the container exists and create if it does not
         container_client = azure_storage_path.container_client
@@ -276,57 +589,176 @@ class AzureHandler(BasePathHandler):
             # Assuming exception means container does not exist. Create new container
             container_client.create_container()
 
-        def upload_file_wrapper(local_path: str, blob_name: str):
-            azure_url = rf'https://{azure_storage_path.storage_account}.{cls.AZURE_URL_SUFFIX}/{azure_storage_path.container_name}/{blob_name}'
-            cls.upload_file(local_path=local_path, target_url=azure_url)
+        def upload_file_wrapper(file_to_upload: Tuple[Path, str]):
+            local_path, blob_name = file_to_upload
+            azure_url = AzureStoragePath(storage_account=azure_storage_path.storage_account,
+                                         container_name=azure_storage_path.container_name, blob_name=blob_name).http_url
+            cls.upload_file(local_path=str(local_path), target_url=azure_url, transfer_options=transfer_options)
 
         # Collect all files to upload
         files_to_upload = []
         for file_path in local_dir.rglob('*'):
             if not file_path.is_file():
                 continue
-            blob_name = os.path.join(azure_storage_path.blob_name, file_path.relative_to(local_dir))
+            blob_name = '/'.join(part for part in [azure_storage_path.blob_name.rstrip('/'),
+                                                   file_path.relative_to(local_dir).as_posix()] if part)
             files_to_upload.append((file_path, blob_name))
 
-        # Upload files in parallel
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(upload_file_wrapper, str(local_path), blob_name) for local_path, blob_name in
-                       files_to_upload]
-            if verbose:
-                with tqdm(total=len(files_to_upload), desc='Uploading directory') as pbar:
-                    for future in futures:
-                        future.result()  # Wait for each upload to complete
-                        pbar.update(1)
-            else:
-                for future in futures:
-                    future.result()  # Wait for each upload to complete
+        _, failures = run_in_parallel(upload_file_wrapper, files_to_upload, max_workers=transfer_options.max_workers,
+                                      verbose=verbose, desc='Uploading directory',
+                                      retry_policy=transfer_options.retry_policy)
+        if failures:
+            raise TransferError(f'Failed uploading {local_dir} to {target_url}', failures=failures)
 
     @classmethod
-    def copy(cls, source_url: str, target_url: str):
-        source_storage_path = cls.http_to_storage_params(source_url)
-        target_storage_path = cls.http_to_storage_params(target_url)
+    def _copy_source_sas(cls, source_storage_path: AzureStoragePath,
+                         target_storage_path: AzureStoragePath) -> Optional[str]:
+        """
+        A read-only SAS of the source container, for copies across storage accounts. Copies within an account are
+        authorized by the target's own credentials
+        """
+        if source_storage_path.storage_account == target_storage_path.storage_account:
+            return None
+        account_key = getattr(source_storage_path.blob_service_client.credential, 'account_key', None)
+        if account_key is None:
+            logger.warning(f'No account key for {source_storage_path.storage_account}, copying from it without a SAS')
+            return None
+        return generate_container_sas(account_name=source_storage_path.storage_account,
+                                      container_name=source_storage_path.container_name, account_key=account_key,
+                                      permission=ContainerSasPermissions(read=True),
+                                      expiry=datetime.now(timezone.utc) + timedelta(
+                                          seconds=cls.COPY_SOURCE_SAS_TTL_SECONDS))
+
+    @classmethod
+    def _start_copy(cls, source_storage_path: AzureStoragePath, target_storage_path: AzureStoragePath,
+                    target_container_client: ContainerClient, sas_token: Optional[str]) -> BlobCopyStatus:
+        source_blob_url = source_storage_path.http_url
+        copy_source_url = f'{source_blob_url}?{sas_token}' if sas_token is not None else source_blob_url
+        target_blob = target_container_client.get_blob_client(target_storage_path.blob_name)
+        # Copies within an account usually complete synchronously, and need no polling
+        copy_properties = target_blob.start_copy_from_url(copy_source_url)
+        return BlobCopyStatus(source_url=source_blob_url, target_url=target_storage_path.http_url,
+                              status=copy_properties['copy_status'], copy_id=copy_properties['copy_id'])
+
+    @classmethod
+    def _get_copies(cls, container_client: ContainerClient, blob_names: List[str]) -> Dict[str, CopyProperties]:
+        """
+        The copy properties of the blobs that still exist, with a request per blob or a listing of their common prefix
+        """
+        if len(blob_names) > cls.MAX_COPIES_POLLED_PER_BLOB:
+            blobs = container_client.list_blobs(name_starts_with=os.path.commonprefix(blob_names), include=['copy'])
+            polled_names = set(blob_names)
+            return {blob.name: blob.copy for blob in blobs if blob.name in polled_names}
+        copies = {}
+        for blob_name in blob_names:
+            try:
+                copies[blob_name] = container_client.get_blob_client(blob_name).get_blob_properties().copy
+            except ResourceNotFoundError:
+                continue
+        return copies
+
+    @staticmethod
+    def _update_copy_status(copy_status: BlobCopyStatus, blob_copy: Optional[CopyProperties]):
+        if blob_copy is None:
+            copy_status.status, copy_status.error = 'failed', 'the target blob was removed during the copy'
+        elif blob_copy.id != copy_status.copy_id:
+            copy_status.status, copy_status.error = 'failed', 'the target blob was overwritten during the copy'
+        elif blob_copy.status != 'pending':
+            copy_status.status = blob_copy.status
+            if blob_copy.status != 'success':
+                copy_status.error = blob_copy.status_description
 
-        target_blob_service_client = target_storage_path.blob_service_client
-        source_container_client = source_storage_path.container_client
+    @classmethod
+    def _poll_copies(cls, container_client: ContainerClient, pending: Dict[str, BlobCopyStatus]):
+        copies = cls._get_copies(container_client, list(pending))
+        for blob_name, copy_status in list(pending.items()):
+            cls._update_copy_status(copy_status, copies.get(blob_name))
+            if copy_status.status != 'pending':
+                del pending[blob_name]
 
-        blobs_to_rename = source_container_client.list_blobs(name_starts_with=source_storage_path.blob_name)
+    @classmethod
+    def wait_for_copies(cls, container_client: ContainerClient, copy_statuses: List[BlobCopyStatus],
+                        timeout: Optional[float] = None):
+        """
+        Polls the pending copies to container_client, with an exponential backoff, until they are done or timeout
+        seconds passed. Updates copy_statuses in place
+        """
+        pending = {cls.http_to_storage_params(copy_status.target_url).blob_name: copy_status
+                   for copy_status in copy_statuses if copy_status.status == 'pending'}
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        poll_interval = cls.COPY_POLL_INTERVAL_SECONDS
+        while pending:
+            if deadline is not None:
+                if time.monotonic() >= deadline:
+                    logger.warning(f'{len(pending)} copies are still pending after {timeout} seconds')
+                    return
+                poll_interval = min(poll_interval, max(deadline - time.monotonic(), 0))
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, cls.MAX_COPY_POLL_INTERVAL_SECONDS)
+            cls._poll_copies(container_client, pending)
 
-        def copy_blob(blob):
-            source_blob_url = AzureStoragePath(storage_account=source_storage_path.storage_account,
-                                               container_name=source_storage_path.container_name, blob_name=blob.name,
-                                               connection_string=source_storage_path.connection_string).http_url
-            target_blob_name = blob.name.replace(source_storage_path.blob_name, target_storage_path.blob_name, 1)
+    @classmethod
+    def _raise_for_failed_copies(cls, copy_statuses: List[BlobCopyStatus], message: str):
+        failures = [(copy_status, OSError(f'{copy_status.status}: {copy_status.error}'))
+                    for copy_status in copy_statuses if copy_status.status != 'success']
+        if failures:
+            raise TransferError(message, failures=failures)
 
-            # Copy to new location
-            target_blob = target_blob_service_client.get_blob_client(container=target_storage_path.container_name,
-                                                                     blob=target_blob_name)
-            target_blob.start_copy_from_url(source_blob_url)
+    @classmethod
+    def copy(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None,
+             wait: bool = True, timeout: Optional[float] = None) -> List[BlobCopyStatus]:
+        """
+        Server-side copy of the blob at source_url and of the blobs under it, starting transfer_options.max_workers
+        copies at a time. Sources in another storage account are read with a SAS of their container.
+        With wait, blocks until the copies are done (or timeout seconds passed) and raises a TransferError with the
+        statuses of the copies that did not succeed. Returns the status of every blob copy
+        """
+        transfer_options = TransferOptions.resolve(transfer_options)
+        source_storage_path = cls.http_to_storage_params(source_url)
+        target_storage_path = cls.http_to_storage_params(target_url)
+        source_blob_name = source_storage_path.blob_name.rstrip('/')
+        target_blob_name = target_storage_path.blob_name.rstrip('/')
+        source_dir_prefix = source_blob_name + '/' if source_blob_name else ''
+        target_container_client = target_storage_path.container_client
+        sas_token = cls._copy_source_sas(source_storage_path, target_storage_path)
+        # The blob named as the source itself and the blobs under it, but not its siblings sharing its prefix
+        source_blob_names = [blob_name for blob_name in
+                             source_storage_path.container_client.list_blob_names(name_starts_with=source_blob_name)
+                             if blob_name == source_blob_name or blob_name.startswith(source_dir_prefix)]
+
+        def blob_paths(blob_name: str) -> Tuple[AzureStoragePath, AzureStoragePath]:
+            relative_name = blob_name[len(source_dir_prefix):] if blob_name != source_blob_name else ''
+            target_name = '/'.join(part for part in [target_blob_name, relative_name] if part)
+            return (AzureStoragePath(storage_account=source_storage_path.storage_account,
+                                     container_name=source_storage_path.container_name, blob_name=blob_name),
+                    AzureStoragePath(storage_account=target_storage_path.storage_account,
+                                     container_name=target_storage_path.container_name, blob_name=target_name))
+
+        def start_copy(blob_name: str) -> BlobCopyStatus:
+            source_blob_path, target_blob_path = blob_paths(blob_name)
+            return cls._start_copy(source_blob_path, target_blob_path, target_container_client, sas_token)
+
+        copy_statuses, failures = run_in_parallel(start_copy, source_blob_names,
+                                                  max_workers=transfer_options.max_workers, desc='Starting copies',
+                                                  retry_policy=transfer_options.retry_policy)
+        for blob_name, exc in failures:
+            source_blob_path, target_blob_path = blob_paths(blob_name)
+            copy_statuses.append(BlobCopyStatus(source_url=source_blob_path.http_url,
+                                                target_url=target_blob_path.http_url, status='failed', error=str(exc)))
+        if wait:
+            cls.wait_for_copies(target_container_client, copy_statuses, timeout=timeout)
+            cls._raise_for_failed_copies(copy_statuses, f'Failed copying {source_url} to {target_url}')
+        return copy_statuses
 
-        # Execute copy and delete operations in parallel
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(copy_blob, blob) for blob in blobs_to_rename]
-            for future in futures:
-                future.result()  # Wait for each operation to complete
+    @classmethod
+    def copy_file(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
+        source_storage_path = cls.http_to_storage_params(source_url)
+        target_storage_path = cls.http_to_storage_params(target_url)
+        target_container_client = target_storage_path.container_client
+        copy_status = cls._start_copy(source_storage_path, target_storage_path, target_container_client,
+                                      cls._copy_source_sas(source_storage_path, target_storage_path))
+        cls.wait_for_copies(target_container_client, [copy_status])
+        cls._raise_for_failed_copies([copy_status], f'Failed copying {source_url} to {target_url}')
 
     @classmethod
     def parent(cls, url: str) -> str:
@@ -358,30 +790,79 @@ class AzureHandler(BasePathHandler):
         return Path(blob_name).stem
 
     @classmethod
-    def iterdir(cls, url: str) -> List[str]:
-        return cls.glob(url, pattern='*')
+    def _is_folder_placeholder(cls, blob: BlobProperties) -> bool:
+        # A blob with hdi_isfolder=true metadata is a directory placeholder of a hierarchical namespace. Metadata
+        # values are strings, so 'false' is not a directory
+        return str((blob.metadata or {}).get('hdi_isfolder', '')).lower() == 'true'
+
+    @classmethod
+    def _blob_to_stat(cls, blob: BlobProperties) -> PathStat:
+        # Content-MD5 is set by single-shot uploads, and on block uploads only when the client computed it
+        content_md5 = blob.content_settings.content_md5
+        return PathStat(kind=PathKind.file, size=blob.size, last_modified=blob.last_modified,
+                        etag=blob.etag.strip('"'), content_md5=bytes(content_md5).hex() if content_md5 else None)
 
     @classmethod
-    def glob(cls, url: str, pattern: str) -> List[str]:
+    def glob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        """
+        Matches the pattern against the paths relative to url. The literal prefix of the pattern is pushed down to the
+        listing, and only the top level of the directory is walked unless the pattern can match deeper
+        """
         storage_path = cls.http_to_storage_params(url)
         container_client = storage_path.container_client
-        blob_names = [blob.name for blob in
-                      container_client.walk_blobs(name_starts_with=storage_path.blob_name, delimiter='/')]
-        all_blobs = [
-            f"https://{storage_path.storage_account}.{cls.AZURE_URL_SUFFIX}/{storage_path.container_name}/{blob}" for
-            blob in blob_names]
-        matched_blobs = [blob for blob in all_blobs if fnmatch.fnmatch(blob, pattern)]
-        return matched_blobs
+        url_prefix = f"https://{storage_path.storage_account}.{cls.AZURE_URL_SUFFIX}/{storage_path.container_name}/"
+        dir_prefix = storage_path.blob_name.rstrip('/') + '/' if storage_path.blob_name.rstrip('/') else ''
+        glob_pattern = compile_glob(pattern)
+        list_prefix = dir_prefix + glob_pattern.literal_prefix
+        if glob_pattern.is_recursive:
+            blobs = container_client.list_blobs(name_starts_with=list_prefix)
+        else:
+            blobs = container_client.walk_blobs(name_starts_with=list_prefix, delimiter='/')
+        for blob in blobs:
+            relative_name = blob.name[len(dir_prefix):]
+            # skip the directory marker of url itself
+            if not relative_name or not glob_pattern.match(relative_name.rstrip('/')):
+                continue
+            # walk_blobs yields a BlobPrefix for every virtual directory under the url
+            blob_stat = cls._blob_to_stat(blob) if isinstance(blob, BlobProperties) else PathStat(
+                kind=PathKind.directory)
+            yield f"{url_prefix}{blob.name}", blob_stat
 
     @classmethod
-    def rglob(cls, url: str, pattern: str) -> List[str]:
+    def iter_file_stats(cls, url: str, start_after: Optional[str] = None) -> Iterator[Tuple[str, PathStat]]:
+        """
+        Lists the blobs under url. Azure listings cannot start after a given name, start_after filters the listing
+        """
+        storage_path = cls.http_to_storage_params(url)
+        url_prefix = f"https://{storage_path.storage_account}.{cls.AZURE_URL_SUFFIX}/{storage_path.container_name}/"
+        dir_prefix = storage_path.blob_name.rstrip('/') + '/' if storage_path.blob_name.rstrip('/') else ''
+        for blob in storage_path.container_client.list_blobs(name_starts_with=dir_prefix):
+            relative_name = blob.name[len(dir_prefix):]
+            if not relative_name or relative_name.endswith('/'):
+                continue
+            if start_after is None or relative_name > start_after:
+                yield f"{url_prefix}{blob.name}", cls._blob_to_stat(blob)
+
+    @classmethod
+    def rglob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        """
+        Matches the pattern against the blob names relative to url at any depth. The directories containing matched
+        blobs are returned as well
+        """
         storage_path = cls.http_to_storage_params(url)
         container_client = storage_path.container_client
-        blobs = [blob for blob in container_client.list_blob_names(name_starts_with=storage_path.blob_name)]
-        all_blobs = [
-            f"https://{storage_path.storage_account}.{cls.AZURE_URL_SUFFIX}/{storage_path.container_name}/{blob}" for
-            blob in blobs]
-        matched_blobs = [blob for blob in all_blobs if fnmatch.fnmatch(blob, pattern)]
-        all_dirs = list(set([cls.parent(url) for url in matched_blobs]))
-        dirs_under_url = [dir.rstrip('/') for dir in all_dirs if dir.startswith(url) and dir != url]
-        return matched_blobs + dirs_under_url
+        url_prefix = f"https://{storage_path.storage_account}.{cls.AZURE_URL_SUFFIX}/{storage_path.container_name}/"
+        dir_prefix = storage_path.blob_name.rstrip('/') + '/' if storage_path.blob_name.rstrip('/') else ''
+        glob_pattern = compile_rglob(pattern)
+        seen_dirs = set()
+        for blob in container_client.list_blobs(name_starts_with=dir_prefix):
+            relative_name = blob.name[len(dir_prefix):]
+            if not relative_name or not glob_pattern.match(relative_name):
+                continue
+            yield f"{url_prefix}{blob.name}", cls._blob_to_stat(blob)
+            if '/' not in relative_name.rstrip('/'):
+                continue
+            dir = f"{url_prefix}{dir_prefix}{relative_name.rstrip('/').rsplit('/', 1)[0]}"
+            if dir not in seen_dirs:
+                seen_dirs.add(dir)
+                yield dir, PathStat(kind=PathKind.directory)
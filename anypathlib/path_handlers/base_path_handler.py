@@ -1,12 +1,39 @@
 from abc import abstractmethod, ABC
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Iterator, BinaryIO, ContextManager, ClassVar
+
+from anypathlib.metrics import instrument_handler
+from anypathlib.path_handlers.path_types import PathStat, PathType
+from anypathlib.path_handlers.transfer_options import TransferOptions
+
+
+def readinto_fully(stream: BinaryIO, buffer: memoryview) -> int:
+    """
+    Calls stream.readinto until buffer is full or the stream ends, returning the number of bytes read
+    """
+    n_read = 0
+    while n_read < len(buffer):
+        n_bytes = stream.readinto(buffer[n_read:])
+        if not n_bytes:
+            break
+        n_read += n_bytes
+    return n_read
 
 
 class BasePathHandler(ABC):
+    PATH_TYPE: ClassVar[PathType]
+    # Whether iter_file_stats lists only the keys after start_after, instead of filtering a full listing
+    SUPPORTS_START_AFTER: ClassVar[bool] = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every handler reports its operations to the metrics sinks, see anypathlib.metrics
+        instrument_handler(cls, cls.PATH_TYPE)
+
     @classmethod
     @abstractmethod
-    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True) -> Path:
+    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True,
+                      transfer_options: Optional[TransferOptions] = None) -> Path:
         pass
 
 
@@ -17,40 +44,102 @@ class BasePathHandler(ABC):
 
     @classmethod
     @abstractmethod
-    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path,
-                           verbose: bool) -> Optional[Tuple[Path, List[Path]]]:
+    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path, verbose: bool,
+                           transfer_options: Optional[TransferOptions] = None) -> Optional[Tuple[Path, List[Path]]]:
+        """
+        Downloads all the files under url into target_dir, transfer_options.max_workers files at a time.
+        Returns target_dir and the downloaded files, or None if there is nothing to download
+        """
         pass
 
     @classmethod
     @abstractmethod
-    def upload_file(cls, local_path: str, target_url: str):
+    def upload_file(cls, local_path: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
         pass
 
     @classmethod
     @abstractmethod
-    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool):
+    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool,
+                         transfer_options: Optional[TransferOptions] = None):
+        """
+        Uploads the files of local_dir, transfer_options.max_workers files at a time, raising a TransferError once done
+        if some of them failed
+        """
         pass
 
     @classmethod
     @abstractmethod
-    def copy(cls, source_url: str, target_url: str):
+    def open_read_stream(cls, url: str,
+                         transfer_options: Optional[TransferOptions] = None) -> ContextManager[BinaryIO]:
+        """
+        Opens the file for sequential reads, fetching it from the backend as it is read
+        """
         pass
 
     @classmethod
     @abstractmethod
-    def is_dir(cls, url: str) -> bool:
+    def read_range(cls, url: str, offset: int, length: int,
+                   transfer_options: Optional[TransferOptions] = None) -> bytes:
+        """
+        Reads length bytes of the file starting at offset with a single ranged request, fewer at the end of the file
+        """
         pass
 
     @classmethod
     @abstractmethod
-    def is_file(cls, url: str) -> bool:
+    def read_range_into(cls, url: str, offset: int, buffer: memoryview,
+                        transfer_options: Optional[TransferOptions] = None) -> int:
+        """
+        Reads the file starting at offset straight into buffer with a single ranged request, until buffer is full or
+        the file ends. Returns the number of bytes read
+        """
         pass
 
     @classmethod
     @abstractmethod
-    def exists(cls, url: str) -> bool:
+    def upload_stream(cls, stream: BinaryIO, target_url: str, size: Optional[int] = None,
+                      transfer_options: Optional[TransferOptions] = None):
+        """
+        Uploads everything read from stream, holding about part_size * max_concurrency bytes in memory at most
+        """
         pass
 
+    @classmethod
+    @abstractmethod
+    def copy(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
+        pass
+
+    @classmethod
+    @abstractmethod
+    def copy_file(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
+        """
+        Copies a single file within the same backend, without listing the source
+        """
+        pass
+
+    @classmethod
+    @abstractmethod
+    def stat(cls, url: str) -> Optional[PathStat]:
+        """
+        Returns the kind, size, last-modified time and etag of the path using a single bounded request,
+        or None if the path does not exist
+        """
+        pass
+
+    @classmethod
+    def is_dir(cls, url: str) -> bool:
+        path_stat = cls.stat(url)
+        return path_stat is not None and path_stat.is_dir
+
+    @classmethod
+    def is_file(cls, url: str) -> bool:
+        path_stat = cls.stat(url)
+        return path_stat is not None and path_stat.is_file
+
+    @classmethod
+    def exists(cls, url: str) -> bool:
+        return cls.stat(url) is not None
+
     @classmethod
     @abstractmethod
     def relative_path(cls, url: str) -> str:
@@ -71,26 +160,63 @@ class BasePathHandler(ABC):
     def stem(cls, url: str) -> str:
         pass
 
+    @classmethod
+    def iterdir_stats(cls, url: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        """
+        Lazily lists the paths directly under the given directory, page by page, paired with the PathStat of each path
+        when the listing provides it for free (None otherwise)
+        """
+        return cls.glob_stats(url, pattern='*')
+
     @classmethod
     @abstractmethod
-    def iterdir(cls, url: str) -> List[str]:
+    def glob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
         """
-        Lists all files and directories directly under the given directory
+        Lazy version of glob, pairing each path with its PathStat when the listing provides it for free (None otherwise)
         """
         pass
 
     @classmethod
     @abstractmethod
+    def rglob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        """
+        Lazy version of rglob, pairing each path with its PathStat when the listing provides it for free (None otherwise)
+        """
+        pass
+
+    @classmethod
+    def iter_file_stats(cls, url: str, start_after: Optional[str] = None) -> Iterator[Tuple[str, PathStat]]:
+        """
+        Lazily lists the files under the given directory at any depth, with their PathStat. With start_after, only the
+        files whose path relative to url sorts after it
+        """
+        base_url = url.rstrip('/')
+        for path, path_stat in cls.rglob_stats(url, '*'):
+            if path_stat is not None and path_stat.is_dir:
+                continue
+            if start_after is not None and path[len(base_url) + 1:] <= start_after:
+                continue
+            path_stat = path_stat if path_stat is not None else cls.stat(path)
+            if path_stat is not None and path_stat.is_file:
+                yield path, path_stat
+
+    @classmethod
+    def iterdir(cls, url: str) -> List[str]:
+        """
+        Lists all files and directories directly under the given directory
+        """
+        return [path for path, _ in cls.iterdir_stats(url)]
+
+    @classmethod
     def glob(cls, url: str, pattern: str) -> List[str]:
         """
         Finds all the paths matching a specific pattern, which can include wildcards, but does not search recursively
         """
-        pass
+        return [path for path, _ in cls.glob_stats(url, pattern)]
 
     @classmethod
-    @abstractmethod
     def rglob(cls, url: str, pattern: str) -> List[str]:
         """
         Finds all the paths matching a specific pattern, including wildcards, and searches recursively in all subdirectories
         """
-        pass
+        return [path for path, _ in cls.rglob_stats(url, pattern)]
@@ -0,0 +1,101 @@
+import functools
+import re
+from typing import Tuple
+
+
+def pattern_literal_prefix(pattern: str) -> str:
+    """
+    Returns the part of the pattern before its first wildcard, e.g. '2024-05-' for '2024-05-*.json'
+    """
+    for index, char in enumerate(pattern):
+        if char in '*?[':
+            return pattern[:index]
+    return pattern
+
+
+def _translate_char_class(segment: str, index: int) -> Tuple[str, int]:
+    """
+    Regex of the '[...]' character class whose '[' is right before index, and the index after its ']'. A '[' that is
+    never closed is a literal
+    """
+    end = index
+    if end < len(segment) and segment[end] == '!':
+        end += 1
+    if end < len(segment) and segment[end] == ']':
+        end += 1
+    end = segment.find(']', end)
+    if end == -1:
+        return '\\[', index
+    char_class = segment[index:end].replace('\\', '\\\\').replace('[', '\\[')
+    if char_class.startswith('!'):
+        char_class = '^' + char_class[1:]
+    elif char_class.startswith('^'):
+        char_class = '\\' + char_class
+    return f'(?!/)[{char_class}]', end + 1
+
+
+def _translate_segment(segment: str) -> str:
+    regex = []
+    index = 0
+    while index < len(segment):
+        char = segment[index]
+        index += 1
+        if char == '*':
+            # consecutive stars inside a segment are a single star
+            if not regex or regex[-1] != '[^/]*':
+                regex.append('[^/]*')
+        elif char == '?':
+            regex.append('[^/]')
+        elif char == '[':
+            char_class_regex, index = _translate_char_class(segment, index)
+            regex.append(char_class_regex)
+        else:
+            regex.append(re.escape(char))
+    return ''.join(regex)
+
+
+def translate(pattern: str) -> str:
+    """
+    Regex of a glob pattern with pathlib semantics: '*', '?' and '[...]' match within a single path segment, and a
+    '**' segment matches any number of segments, including none
+    """
+    segments = pattern.split('/')
+    regex = []
+    for index, segment in enumerate(segments):
+        is_last = index == len(segments) - 1
+        if segment == '**':
+            regex.append('.*' if is_last else '(?:[^/]+/)*')
+        else:
+            regex.append(_translate_segment(segment) + ('' if is_last else '/'))
+    return ''.join(regex)
+
+
+class GlobPattern:
+    """
+    A glob pattern compiled once, matched against paths relative to the globbed directory
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.literal_prefix = pattern_literal_prefix(pattern)
+        # Patterns that can match below the top level need a recursive listing
+        self.is_recursive = '/' in pattern or pattern == '**'
+        self._fullmatch = re.compile(translate(pattern), re.DOTALL).fullmatch
+
+    def match(self, relative_path: str) -> bool:
+        return self._fullmatch(relative_path) is not None
+
+    def __repr__(self) -> str:
+        return f'GlobPattern({self.pattern!r})'
+
+
+@functools.lru_cache(maxsize=256)
+def compile_glob(pattern: str) -> GlobPattern:
+    return GlobPattern(pattern)
+
+
+def compile_rglob(pattern: str) -> GlobPattern:
+    """
+    rglob(pattern) matches as glob('**/' + pattern), as in pathlib
+    """
+    return compile_glob(f'**/{pattern}')
@@ -1,23 +1,29 @@
+import os
 import shutil
+import stat
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Iterator, BinaryIO
 
-from anypathlib.path_handlers.base_path_handler import BasePathHandler
+from anypathlib.path_handlers.base_path_handler import BasePathHandler, readinto_fully
+from anypathlib.path_handlers.path_types import PathStat, PathKind, PathType
+from anypathlib.path_handlers.transfer_options import TransferOptions
 
 
 class LocalPathHandler(BasePathHandler):
+    PATH_TYPE = PathType.local
 
     @classmethod
-    def is_dir(cls, url: str) -> bool:
-        return Path(url).is_dir()
-
-    @classmethod
-    def is_file(cls, url: str) -> bool:
-        return Path(url).is_file()
-
-    @classmethod
-    def exists(cls, url: str) -> bool:
-        return Path(url).exists()
+    def stat(cls, url: str) -> Optional[PathStat]:
+        try:
+            stat_result = os.stat(url)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+        if stat.S_ISDIR(stat_result.st_mode):
+            return PathStat(kind=PathKind.directory, last_modified=last_modified)
+        return PathStat(kind=PathKind.file, size=stat_result.st_size, last_modified=last_modified)
 
     @classmethod
     def remove(cls, url: str):
@@ -28,17 +34,90 @@ class LocalPathHandler(BasePathHandler):
             shutil.rmtree(local_path)
 
     @classmethod
-    def upload_file(cls, local_path: str, target_url: str):
+    def upload_file(cls, local_path: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
         cls.copy_path(url=Path(local_path).absolute().as_posix(), target_path=Path(target_url), force_overwrite=True)
 
     @classmethod
-    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool):
+    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool,
+                         transfer_options: Optional[TransferOptions] = None):
         cls.copy_path(url=local_dir.absolute().as_posix(), target_path=Path(target_url), force_overwrite=True)
 
     @classmethod
-    def copy(cls, source_url: str, target_url: str):
+    def copy(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
         cls.copy_path(url=source_url, target_path=Path(target_url), force_overwrite=True)
 
+    @classmethod
+    def copy_file(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
+        Path(target_url).parent.mkdir(exist_ok=True, parents=True)
+        shutil.copy(source_url, target_url)
+
+    @classmethod
+    def open_read_stream(cls, url: str, transfer_options: Optional[TransferOptions] = None) -> BinaryIO:
+        return open(url, 'rb')
+
+    @classmethod
+    def read_range(cls, url: str, offset: int, length: int,
+                   transfer_options: Optional[TransferOptions] = None) -> bytes:
+        with open(url, 'rb') as f:
+            if hasattr(os, 'pread'):
+                return os.pread(f.fileno(), length, offset)
+            f.seek(offset)
+            return f.read(length)
+
+    @classmethod
+    def pread_into(cls, fd: int, offset: int, buffer: memoryview) -> int:
+        """
+        Positional reads of fd starting at offset into buffer (os.preadv, or os.pread and a copy), until buffer is full
+        or the file ends. They do not move the file position, so threads can share fd
+        """
+        n_read = 0
+        while n_read < len(buffer):
+            if hasattr(os, 'preadv'):
+                n_bytes = os.preadv(fd, [buffer[n_read:]], offset + n_read)
+            else:
+                data = os.pread(fd, len(buffer) - n_read, offset + n_read)
+                n_bytes = len(data)
+                buffer[n_read:n_read + n_bytes] = data
+            if not n_bytes:
+                break
+            n_read += n_bytes
+        return n_read
+
+    @classmethod
+    @contextmanager
+    def open_for_ranges(cls, url: str) -> Iterator[Optional[int]]:
+        """
+        Opens url once for the read_range_into(fd=...) calls of a batch of ranges. Yields None where positional reads
+        are not available, in which case every read opens the file itself
+        """
+        if not hasattr(os, 'pread'):
+            yield None
+            return
+        fd = os.open(url, os.O_RDONLY)
+        try:
+            yield fd
+        finally:
+            os.close(fd)
+
+    @classmethod
+    def read_range_into(cls, url: str, offset: int, buffer: memoryview,
+                        transfer_options: Optional[TransferOptions] = None, fd: Optional[int] = None) -> int:
+        if hasattr(os, 'pread'):
+            if fd is not None:
+                return cls.pread_into(fd, offset, buffer)
+            with open(url, 'rb', buffering=0) as f:
+                return cls.pread_into(f.fileno(), offset, buffer)
+        with open(url, 'rb', buffering=0) as f:
+            f.seek(offset)
+            return readinto_fully(f, buffer)
+
+    @classmethod
+    def upload_stream(cls, stream: BinaryIO, target_url: str, size: Optional[int] = None,
+                      transfer_options: Optional[TransferOptions] = None):
+        Path(target_url).parent.mkdir(exist_ok=True, parents=True)
+        with open(target_url, 'wb') as f:
+            shutil.copyfileobj(stream, f, TransferOptions.resolve(transfer_options).part_size)
+
     @classmethod
     def copy_path(cls, url: str, target_path: Path, force_overwrite: bool = True) -> Path:
         if target_path.exists() and not force_overwrite:
@@ -52,13 +131,14 @@ class LocalPathHandler(BasePathHandler):
             shutil.copy(local_path, target_path)
 
     @classmethod
-    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path, verbose: bool) -> \
-            Optional[Tuple[Path, List[Path]]]:
+    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path, verbose: bool,
+                           transfer_options: Optional[TransferOptions] = None) -> Optional[Tuple[Path, List[Path]]]:
         cls.copy_path(url=url, target_path=target_dir, force_overwrite=force_overwrite)
         return target_dir, [p for p in target_dir.rglob('*')]
 
     @classmethod
-    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True) -> Path:
+    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True,
+                      transfer_options: Optional[TransferOptions] = None) -> Path:
         return cls.copy_path(url=url, target_path=target_path, force_overwrite=force_overwrite)
 
     @classmethod
@@ -78,13 +158,15 @@ class LocalPathHandler(BasePathHandler):
         return Path(url).name
 
     @classmethod
-    def iterdir(cls, url: str) -> List[str]:
-        return [str(p) for p in Path(url).iterdir()]
+    def iterdir_stats(cls, url: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        with os.scandir(url) as entries:
+            for entry in entries:
+                yield entry.path, None
 
     @classmethod
-    def glob(cls, url: str, pattern: str) -> List[str]:
-        return [str(p) for p in Path(url).glob(pattern)]
+    def glob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        return ((str(p), None) for p in Path(url).glob(pattern))
 
     @classmethod
-    def rglob(cls, url: str, pattern: str) -> List[str]:
-        return [str(p) for p in Path(url).rglob(pattern)]
+    def rglob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        return ((str(p), None) for p in Path(url).rglob(pattern))
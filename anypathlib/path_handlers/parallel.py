@@ -0,0 +1,78 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from loguru import logger
+from tqdm import tqdm
+
+from anypathlib.path_handlers.retry import RetryPolicy, AdaptiveConcurrencyLimiter, call_with_retry
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class TransferError(Exception):
+    """
+    Raised once a parallel batch is done, if some of its items failed
+    """
+
+    def __init__(self, message: str, failures: List[Tuple[object, Exception]]):
+        self.failures = failures
+        super().__init__(f'{message}: {len(failures)} failed, e.g. {failures[0][0]}: {failures[0][1]}')
+
+
+def run_in_parallel(func: Callable[[T], R], items: Sequence[T], max_workers: Optional[int] = None,
+                    verbose: bool = False, desc: Optional[str] = None,
+                    retry_policy: Optional[RetryPolicy] = None) -> Tuple[List[R], List[Tuple[T, Exception]]]:
+    """
+    Runs func on every item with a pool of max_workers threads. A failing item does not stop the batch.
+    Throttled and transient failures are retried according to retry_policy (RetryPolicy() by default), which also
+    adapts the number of items in flight to throttling.
+    Returns the results of the successful items and the (item, exception) failures, both in the order of items.
+    """
+    retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+    # The default size of a ThreadPoolExecutor
+    max_workers = max_workers if max_workers is not None else min(32, (os.cpu_count() or 1) + 4)
+    limiter = AdaptiveConcurrencyLimiter(max_limit=max_workers) if retry_policy.adaptive else None
+    results: List[Optional[R]] = [None] * len(items)
+    errors: List[Optional[Exception]] = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_index = {executor.submit(call_with_retry, func, item, retry_policy, limiter): index
+                           for index, item in enumerate(items)}
+        with tqdm(total=len(items), desc=desc, disable=not verbose) as pbar:
+            for future in as_completed(future_to_index):
+                index = future_to_index[future]
+                try:
+                    results[index] = future.result()
+                except Exception as exc:
+                    logger.error(f'{items[index]} generated an exception: {exc}')
+                    errors[index] = exc
+                pbar.update(1)
+    succeeded = [result for result, error in zip(results, errors) if error is None]
+    failures = [(item, error) for item, error in zip(items, errors) if error is not None]
+    return succeeded, failures
+
+
+async def run_concurrently(func: Callable[[T], Awaitable[R]], items: Sequence[T],
+                           max_concurrency: int) -> Tuple[List[R], List[Tuple[T, Exception]]]:
+    """
+    Async version of run_in_parallel, awaiting func on at most max_concurrency items at a time
+    """
+    results: List[Optional[R]] = [None] * len(items)
+    errors: List[Optional[Exception]] = [None] * len(items)
+    indices = iter(range(len(items)))
+
+    async def worker():
+        # The workers share the iterator, so each item is taken by exactly one of them
+        for index in indices:
+            try:
+                results[index] = await func(items[index])
+            except Exception as exc:
+                logger.error(f'{items[index]} generated an exception: {exc}')
+                errors[index] = exc
+
+    await asyncio.gather(*[worker() for _ in range(min(max_concurrency, len(items)))])
+    succeeded = [result for result, error in zip(results, errors) if error is None]
+    failures = [(item, error) for item, error in zip(items, errors) if error is not None]
+    return succeeded, failures
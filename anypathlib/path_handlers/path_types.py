@@ -1,7 +1,33 @@
+from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
+from typing import Optional
 
 
 class PathType(Enum):
     local = 'local'
     s3 = 's3'
     azure = 'azure'
+
+
+class PathKind(Enum):
+    file = 'file'
+    directory = 'directory'
+
+
+@dataclass(frozen=True)
+class PathStat:
+    kind: PathKind
+    size: Optional[int] = None
+    last_modified: Optional[datetime] = None
+    etag: Optional[str] = None
+    # Hex MD5 of the content, when the backend exposes it in its listings
+    content_md5: Optional[str] = None
+
+    @property
+    def is_file(self) -> bool:
+        return self.kind == PathKind.file
+
+    @property
+    def is_dir(self) -> bool:
+        return self.kind == PathKind.directory
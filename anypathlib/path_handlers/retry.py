@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, TypeVar
+
+from loguru import logger
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+
+# S3 error codes, Azure error codes and HTTP statuses of requests the backend refused because of load
+THROTTLING_ERROR_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+                          'TooManyRequestsException', 'ServiceUnavailable', 'ServerBusy', 'IngressOverAccountLimit',
+                          'EgressOverAccountLimit'}
+THROTTLING_STATUS_CODES = {429, 503}
+TRANSIENT_ERROR_CODES = {'RequestTimeout', 'InternalError', 'OperationTimedOut'}
+TRANSIENT_STATUS_CODES = {408, 500, 502, 504}
+# Connection and timeout errors of botocore, urllib3, requests and azure-core, matched by name to avoid importing them
+TRANSIENT_ERROR_TYPES = {'EndpointConnectionError', 'ConnectionClosedError', 'ReadTimeoutError',
+                         'ConnectTimeoutError', 'ResponseStreamingError', 'IncompleteReadError',
+                         'ServiceRequestError', 'ServiceResponseError', 'ConnectionError', 'ChunkedEncodingError'}
+
+
+def classify_error(exc: BaseException) -> Optional[str]:
+    """
+    THROTTLED for errors of an overloaded backend, TRANSIENT for other errors worth retrying, None otherwise
+    """
+    error_code, status_code = None, None
+    response = getattr(exc, 'response', None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        error_code = response.get('Error', {}).get('Code')
+        status_code = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    else:
+        # azure-core HttpResponseError
+        error_code = getattr(exc, 'error_code', None)
+        status_code = getattr(exc, 'status_code', None)
+    if error_code in THROTTLING_ERROR_CODES or status_code in THROTTLING_STATUS_CODES:
+        return THROTTLED
+    if error_code in TRANSIENT_ERROR_CODES or status_code in TRANSIENT_STATUS_CODES:
+        return TRANSIENT
+    if isinstance(exc, (ConnectionError, TimeoutError)) or any(
+            error_type.__name__ in TRANSIENT_ERROR_TYPES for error_type in type(exc).__mro__):
+        return TRANSIENT
+    return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retries of throttled and transient failures, on top of the SDKs' own retries.
+    Attempt n waits a random time up to min(max_delay, base_delay * 2 ** n) ("full jitter").
+    With adaptive, the number of items in flight is lowered when the backend throttles and raised again while it
+    does not, see AdaptiveConcurrencyLimiter
+    """
+    max_attempts: int = 5
+    base_delay: float = 0.2
+    max_delay: float = 20.0
+    adaptive: bool = True
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit of the number of concurrent calls: halved when a call is throttled, at most once per limit calls,
+    and increased by one after limit consecutive successful calls, up to max_limit
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self._in_flight = 0
+        self._successes = 0
+        # Calls that completed since the last decrease, throttled calls that were already in flight then do not
+        # decrease the limit again
+        self._completed_since_decrease = max_limit
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._completed_since_decrease += 1
+                self._condition.notify()
+
+    def on_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+    def on_throttled(self):
+        with self._condition:
+            self._successes = 0
+            if self._completed_since_decrease >= self.limit:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._completed_since_decrease = 0
+                logger.debug(f'Throttled, lowering the concurrency to {self.limit}')
+
+
+def call_with_retry(func: Callable[[T], R], item: T, retry_policy: RetryPolicy,
+                    limiter: Optional[AdaptiveConcurrencyLimiter] = None) -> R:
+    attempt = 1
+    while True:
+        with limiter.slot() if limiter is not None else _no_slot():
+            try:
+                result = func(item)
+            except Exception as exc:
+                error, error_kind = exc, classify_error(exc)
+                if error_kind == THROTTLED and limiter is not None:
+                    limiter.on_throttled()
+                if error_kind is None or attempt >= retry_policy.max_attempts:
+                    raise
+            else:
+                if limiter is not None:
+                    limiter.on_success()
+                return result
+        delay = retry_policy.delay(attempt)
+        logger.debug(f'{item}: {error_kind} error ({error}), attempt {attempt + 1} in {delay:.2f}s')
+        time.sleep(delay)
+        attempt += 1
+
+
+@contextmanager
+def _no_slot() -> Iterator[None]:
+    yield
@@ -1,30 +1,67 @@
-import fnmatch
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Tuple, Optional, ClassVar
+from typing import List, Tuple, Optional, ClassVar, Iterator, Dict, BinaryIO
 from urllib.parse import urlparse
 
 import boto3 as boto3
 import botocore
-from tqdm import tqdm
+from boto3.s3.transfer import TransferConfig
 
-from anypathlib.path_handlers.base_path_handler import BasePathHandler
+from anypathlib.metrics import instrument_boto3_client
+from anypathlib.path_handlers.base_path_handler import BasePathHandler, readinto_fully
+from anypathlib.path_handlers.glob_pattern import compile_glob, compile_rglob
+from anypathlib.path_handlers.parallel import run_in_parallel, TransferError
+from anypathlib.path_handlers.path_types import PathStat, PathKind, PathType
+from anypathlib.path_handlers.transfer_options import TransferOptions
 
 
 class S3Handler(BasePathHandler):
+    PATH_TYPE = PathType.s3
+    SUPPORTS_START_AFTER = True
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID', None)
-    MAX_POOL_CONNECTIONS = 50
-    # Create a boto3 S3 client
-    s3_client: ClassVar[boto3.client] = boto3.client('s3', config=botocore.config.Config(
-        max_pool_connections=MAX_POOL_CONNECTIONS))
+    # Clients per connection pool size, built on the first request that needs them
+    _transfer_clients: ClassVar[Dict[int, boto3.client]] = {}
+    _transfer_clients_lock: ClassVar[threading.Lock] = threading.Lock()
+    # The resource API, built on first use as well
+    _resource: ClassVar[Optional['boto3.resources.base.ServiceResource']] = None
 
     @classmethod
     def refresh_credentials(cls):
         if cls.AWS_ACCESS_KEY_ID is None:
             cls.AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID', None)
-            cls.s3_client = boto3.client('s3',
-                                         config=botocore.config.Config(max_pool_connections=cls.MAX_POOL_CONNECTIONS))
+            with cls._transfer_clients_lock:
+                cls._transfer_clients.clear()
+                cls._resource = None
+
+    @classmethod
+    def get_transfer_client(cls, transfer_options: Optional[TransferOptions] = None) -> boto3.client:
+        max_pool_connections = TransferOptions.resolve(transfer_options).max_pool_connections
+        with cls._transfer_clients_lock:
+            if max_pool_connections not in cls._transfer_clients:
+                cls._transfer_clients[max_pool_connections] = instrument_boto3_client(boto3.client(
+                    's3', config=botocore.config.Config(max_pool_connections=max_pool_connections)))
+            return cls._transfer_clients[max_pool_connections]
+
+    @classmethod
+    def get_resource(cls):
+        with cls._transfer_clients_lock:
+            if cls._resource is None:
+                # The resource API has a client of its own, which reports its requests as well. Only Bucket objects
+                # and collections are built from it, per call, so that it is shared across threads as the clients are
+                s3_resource = boto3.resource('s3')
+                instrument_boto3_client(s3_resource.meta.client)
+                cls._resource = s3_resource
+            return cls._resource
+
+    @classmethod
+    def get_transfer_config(cls, transfer_options: Optional[TransferOptions] = None) -> TransferConfig:
+        transfer_options = TransferOptions.resolve(transfer_options)
+        return TransferConfig(multipart_threshold=transfer_options.multipart_threshold,
+                              multipart_chunksize=transfer_options.part_size,
+                              max_concurrency=transfer_options.max_concurrency,
+                              use_threads=transfer_options.max_concurrency > 1)
 
     @classmethod
     def relative_path(cls, url: str) -> str:
@@ -32,17 +69,31 @@ class S3Handler(BasePathHandler):
         return f'{bucket}/{key}'
 
     @classmethod
-    def is_dir(cls, url: str) -> bool:
-        return cls.exists(url) and not cls.is_file(url)
+    def _list_first_object(cls, bucket: str, prefix: str) -> Optional[dict]:
+        s3_client = cls.get_transfer_client()
+        try:
+            resp = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=1)
+        except s3_client.exceptions.NoSuchBucket:
+            return None
+        contents = resp.get('Contents', [])
+        return contents[0] if contents else None
 
     @classmethod
-    def is_file(cls, url: str) -> bool:
-        bucket_name, object_key = cls.get_bucket_and_key_from_uri(url)
-        try:
-            cls.s3_client.head_object(Bucket=bucket_name, Key=object_key)
-            return True  # If the head object doesn't raise an error, it's a file
-        except (cls.s3_client.exceptions.NoSuchKey, cls.s3_client.exceptions.ClientError):
-            return False  # If a NoSuchKey error is raised, it's not a file
+    def stat(cls, url: str) -> Optional[PathStat]:
+        bucket, key = cls.get_bucket_and_key_from_uri(url)
+        dir_prefix = key.rstrip('/') + '/' if key.rstrip('/') else ''
+        if key and not key.endswith('/'):
+            first_object = cls._list_first_object(bucket=bucket, prefix=key)
+            if first_object is None:
+                return None
+            if first_object['Key'] == key:
+                return cls._object_to_stat(first_object)
+            if first_object['Key'].startswith(dir_prefix):
+                return PathStat(kind=PathKind.directory)
+            # A sibling sharing the prefix (e.g. "key.txt" for "key") sorts before "key/", so look under it explicitly
+        if cls._list_first_object(bucket=bucket, prefix=dir_prefix) is None:
+            return None
+        return PathStat(kind=PathKind.directory)
 
     @classmethod
     def parent(cls, url: str) -> str:
@@ -59,15 +110,6 @@ class S3Handler(BasePathHandler):
         bucket, key = cls.get_bucket_and_key_from_uri(url)
         return Path(key).name
 
-    @classmethod
-    def exists(cls, url: str) -> bool:
-        bucket, key = cls.get_bucket_and_key_from_uri(url)
-        try:
-            resp = cls.s3_client.list_objects(Bucket=bucket, Prefix=key, Delimiter='/', MaxKeys=1)
-            return 'Contents' in resp or 'CommonPrefixes' in resp
-        except cls.s3_client.exceptions.NoSuchKey:
-            return False
-
     @classmethod
     def get_bucket_and_key_from_uri(cls, s3_uri: str) -> Tuple[str, str]:
         parsed_uri = urlparse(s3_uri)
@@ -82,7 +124,8 @@ class S3Handler(BasePathHandler):
         return f's3://{bucket}/{key}'
 
     @classmethod
-    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True) -> Path:
+    def download_file(cls, url: str, target_path: Path, force_overwrite: bool = True,
+                      transfer_options: Optional[TransferOptions] = None) -> Path:
         # Convert the local path to a Path object
         local_file_path = Path(target_path)
         if not force_overwrite and local_file_path.exists():
@@ -93,155 +136,232 @@ class S3Handler(BasePathHandler):
         # Ensure the local directory exists
         local_file_path.parent.mkdir(parents=True, exist_ok=True)
         # Download the file
-        cls.s3_client.download_file(Bucket=bucket, Key=key, Filename=local_file_path.absolute().as_posix())
+        cls.get_transfer_client(transfer_options).download_file(Bucket=bucket, Key=key,
+                                                                Filename=local_file_path.absolute().as_posix(),
+                                                                Config=cls.get_transfer_config(transfer_options))
         return local_file_path
 
     @classmethod
     def remove(cls, url: str):
         bucket, key = cls.get_bucket_and_key_from_uri(url)
-        s3_resource = boto3.resource('s3')
+        s3_resource = cls.get_resource()
         bucket = s3_resource.Bucket(bucket)
-        bucket.objects.filter(Prefix=key).delete()
+        # Remove the object itself and everything under it as a directory, but not siblings sharing its prefix
+        if key and not key.endswith('/'):
+            bucket.Object(key).delete()
+        bucket.objects.filter(Prefix=key.rstrip('/') + '/' if key.rstrip('/') else '').delete()
 
     @classmethod
-    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path, verbose: bool) -> \
-            Optional[Tuple[Path, List[Path]]]:
+    def download_directory(cls, url: str, force_overwrite: bool, target_dir: Path, verbose: bool,
+                           transfer_options: Optional[TransferOptions] = None) -> Optional[Tuple[Path, List[Path]]]:
+        transfer_options = TransferOptions.resolve(transfer_options)
 
-        s3_resource = boto3.resource('s3')
+        s3_resource = cls.get_resource()
 
         bucket, source_key = cls.get_bucket_and_key_from_uri(url)
         bucket = s3_resource.Bucket(bucket)
-        all_files = []
+        dir_prefix = source_key.rstrip('/') + '/' if source_key.rstrip('/') else ''
 
-        # Prepare the list of s3_paths to download
+        # Prepare the list of s3_paths to download, without the directory marker and the siblings sharing its prefix
         s3_paths: List[str] = [cls.get_full_path(bucket=bucket.name, key=obj.key) for obj in
-                               bucket.objects.filter(Prefix=source_key)]
-        s3_paths = [s3_path for s3_path in s3_paths if s3_path.rstrip('/') != url]
+                               bucket.objects.filter(Prefix=dir_prefix) if obj.key != dir_prefix]
 
-        def s3_path_to_local_file_path(s3_path: str, local_base_path: Path) -> Path:
+        def download_file_wrapper(s3_path: str) -> Path:
             _, key = cls.get_bucket_and_key_from_uri(s3_path)
-            local_file_relative_path = Path(key).relative_to(source_key)
-            return local_base_path / local_file_relative_path
-
-        # Download in parallel
-        with ThreadPoolExecutor() as executor:
-            future_to_s3_path = {executor.submit(cls.download_file,
-                                                 url=s3_path,
-                                                 target_path=s3_path_to_local_file_path(s3_path=s3_path,
-                                                                                        local_base_path=target_dir),
-                                                 force_overwrite=force_overwrite): s3_path for s3_path in s3_paths}
-
-            def process_futures():
-                for future in as_completed(future_to_s3_path):
-                    s3_path = future_to_s3_path[future]
-                    try:
-                        local_path = future.result()
-                        if local_path:
-                            all_files.append(local_path)
-                    except Exception as exc:
-                        print(f'{s3_path} generated an exception: {exc}')
-
-                    yield None
-
-            if verbose:
-                with tqdm(total=len(s3_paths), desc='Downloading directory') as pbar:
-                    for _ in process_futures():
-                        pbar.update(1)
-            else:
-                for _ in process_futures():
-                    pass
-
+            return cls.download_file(url=s3_path, target_path=target_dir / key[len(dir_prefix):],
+                                     force_overwrite=force_overwrite, transfer_options=transfer_options)
+
+        all_files, failures = run_in_parallel(download_file_wrapper, s3_paths, max_workers=transfer_options.max_workers,
+                                              verbose=verbose, desc='Downloading directory',
+                                              retry_policy=transfer_options.retry_policy)
+        if failures:
+            raise TransferError(f'Failed downloading {url} to {target_dir}', failures=failures)
         return target_dir, all_files
 
     @classmethod
-    def upload_file(cls, local_path: str, target_url: str):
+    def upload_file(cls, local_path: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
         bucket, key = cls.get_bucket_and_key_from_uri(target_url)
-        cls.s3_client.upload_file(local_path, bucket, key)
+        cls.get_transfer_client(transfer_options).upload_file(local_path, bucket, key,
+                                                              Config=cls.get_transfer_config(transfer_options))
 
     @classmethod
-    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool = False):
-        bucket, key = cls.get_bucket_and_key_from_uri(target_url)
+    @contextmanager
+    def open_read_stream(cls, url: str, transfer_options: Optional[TransferOptions] = None) -> Iterator[BinaryIO]:
+        bucket, key = cls.get_bucket_and_key_from_uri(url)
+        body = cls.get_transfer_client(transfer_options).get_object(Bucket=bucket, Key=key)['Body']
+        try:
+            yield body
+        finally:
+            body.close()
 
-        total_files = 0
-        if verbose:
-            for root, dirs, files in os.walk(local_dir):
-                total_files += len(files)
+    @classmethod
+    def read_range(cls, url: str, offset: int, length: int,
+                   transfer_options: Optional[TransferOptions] = None) -> bytes:
+        bucket, key = cls.get_bucket_and_key_from_uri(url)
+        byte_range = f'bytes={offset}-{offset + length - 1}'
+        body = cls.get_transfer_client(transfer_options).get_object(Bucket=bucket, Key=key, Range=byte_range)['Body']
+        with body:
+            return body.read()
 
-        if verbose:
-            progress_bar = tqdm(os.walk(local_dir), desc='Uploading directory', total=total_files)
-        else:
-            progress_bar = os.walk(local_dir)
+    @classmethod
+    def read_range_into(cls, url: str, offset: int, buffer: memoryview,
+                        transfer_options: Optional[TransferOptions] = None) -> int:
+        bucket, key = cls.get_bucket_and_key_from_uri(url)
+        byte_range = f'bytes={offset}-{offset + len(buffer) - 1}'
+        body = cls.get_transfer_client(transfer_options).get_object(Bucket=bucket, Key=key, Range=byte_range)['Body']
+        with body:
+            return readinto_fully(body, buffer)
+
+    @classmethod
+    def upload_stream(cls, stream: BinaryIO, target_url: str, size: Optional[int] = None,
+                      transfer_options: Optional[TransferOptions] = None):
+        bucket, key = cls.get_bucket_and_key_from_uri(target_url)
+        # A non-seekable stream is read part by part into the multipart upload
+        cls.get_transfer_client(transfer_options).upload_fileobj(stream, bucket, key,
+                                                                 Config=cls.get_transfer_config(transfer_options))
 
-        for root, dirs, files in progress_bar:
+    @classmethod
+    def upload_directory(cls, local_dir: Path, target_url: str, verbose: bool = False,
+                         transfer_options: Optional[TransferOptions] = None):
+        transfer_options = TransferOptions.resolve(transfer_options)
+        bucket, key = cls.get_bucket_and_key_from_uri(target_url)
+
+        files_to_upload = []
+        for root, dirs, files in os.walk(local_dir):
             for file in files:
                 local_path = Path(root) / file
                 s3_key = f'{key.rstrip("/")}/{local_path.relative_to(local_dir).as_posix()}'
-                cls.s3_client.upload_file(local_path, bucket, s3_key)
+                files_to_upload.append((local_path, s3_key))
+
+        def upload_file_wrapper(file_to_upload: Tuple[Path, str]):
+            local_path, s3_key = file_to_upload
+            cls.upload_file(local_path=str(local_path), target_url=cls.get_full_path(bucket=bucket, key=s3_key),
+                            transfer_options=transfer_options)
 
-            if verbose:
-                progress_bar.update(len(files))
+        _, failures = run_in_parallel(upload_file_wrapper, files_to_upload, max_workers=transfer_options.max_workers,
+                                      verbose=verbose, desc='Uploading directory',
+                                      retry_policy=transfer_options.retry_policy)
+        if failures:
+            raise TransferError(f'Failed uploading {local_dir} to {target_url}', failures=failures)
 
     @classmethod
-    def copy(cls, source_url: str, target_url: str):
-        s3_resource = boto3.resource('s3')
+    def copy(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
+        transfer_options = TransferOptions.resolve(transfer_options)
+        transfer_client = cls.get_transfer_client(transfer_options)
+        transfer_config = cls.get_transfer_config(transfer_options)
+        s3_resource = cls.get_resource()
         source_bucket_name, source_key = cls.get_bucket_and_key_from_uri(source_url)
         target_bucket_name, target_key = cls.get_bucket_and_key_from_uri(target_url)
+        source_dir_prefix = source_key.rstrip('/') + '/' if source_key.rstrip('/') else ''
 
         source_bucket = s3_resource.Bucket(source_bucket_name)
-        objects = list(source_bucket.objects.filter(Prefix=source_key))
+        # The object named as the source itself and the objects under it, but not its siblings sharing its prefix
+        source_keys = [obj.key for obj in source_bucket.objects.filter(Prefix=source_key) if
+                       obj.key == source_key or obj.key.startswith(source_dir_prefix)]
 
-        def copy_and_delete(obj):
-            new_key = obj.key.replace(source_key, target_key, 1)
+        def copy_object(key: str):
             copy_source = {
                 'Bucket': source_bucket_name,
-                'Key': obj.key
+                'Key': key
             }
-            # Copy object to the new location
-            s3_resource.meta.client.copy(copy_source, target_bucket_name, new_key)
+            transfer_client.copy(copy_source, target_bucket_name, target_key + key[len(source_key):],
+                                 Config=transfer_config)
 
-        # Use ThreadPoolExecutor to parallelize the operation
-        with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(copy_and_delete, obj) for obj in objects]
+        _, failures = run_in_parallel(copy_object, source_keys, max_workers=transfer_options.max_workers,
+                                      desc='Copying objects', retry_policy=transfer_options.retry_policy)
+        if failures:
+            raise TransferError(f'Failed copying {source_url} to {target_url}', failures=failures)
 
-            for future in as_completed(futures):
-                try:
-                    future.result()  # If needed, handle result or exceptions here
-                except Exception as exc:
-                    print(f'Operation generated an exception: {exc}')
+    @classmethod
+    def copy_file(cls, source_url: str, target_url: str, transfer_options: Optional[TransferOptions] = None):
+        transfer_options = TransferOptions.resolve(transfer_options)
+        source_bucket, source_key = cls.get_bucket_and_key_from_uri(source_url)
+        target_bucket, target_key = cls.get_bucket_and_key_from_uri(target_url)
+        cls.get_transfer_client(transfer_options).copy({'Bucket': source_bucket, 'Key': source_key}, target_bucket,
+                                                       target_key, Config=cls.get_transfer_config(transfer_options))
 
     @classmethod
-    def _get_bucket_objects(cls, url: str) -> List[str]:
-        bucket, key = cls.get_bucket_and_key_from_uri(url)
-        s3_resource = boto3.resource('s3')
-        bucket_obj = s3_resource.Bucket(bucket)
-        return [cls.get_full_path(bucket=bucket, key=obj.key) for obj in bucket_obj.objects.filter(Prefix=key)]
+    def _object_to_stat(cls, obj: dict) -> PathStat:
+        etag = obj['ETag'].strip('"')
+        # The etag of a single-part upload is the MD5 of the content, a multipart etag ends with "-<number of parts>"
+        content_md5 = etag if '-' not in etag else None
+        return PathStat(kind=PathKind.file, size=obj['Size'], last_modified=obj['LastModified'], etag=etag,
+                        content_md5=content_md5)
 
     @classmethod
-    def iterdir(cls, url: str) -> List[str]:
-        return cls.glob(url, pattern='*')
+    def _iter_list_pages(cls, bucket: str, prefix: str, delimiter: Optional[str] = None,
+                         start_after: Optional[str] = None) -> Iterator[dict]:
+        paginator = cls.get_transfer_client().get_paginator('list_objects_v2')
+        pagination_kwargs = {'Bucket': bucket, 'Prefix': prefix}
+        if delimiter is not None:
+            pagination_kwargs['Delimiter'] = delimiter
+        if start_after is not None:
+            pagination_kwargs['StartAfter'] = start_after
+        # The paginator fetches the listing lazily, one page at a time
+        yield from paginator.paginate(**pagination_kwargs)
 
     @classmethod
-    def _get_dirs_under_url(cls, base_url: str, url_list: List[str]) -> List[str]:
-        all_dirs = list(set([cls.parent(url) for url in url_list]))
-        dirs_under_url = [dir.rstrip('/') for dir in all_dirs if dir.startswith(base_url) and dir != base_url]
-        return dirs_under_url
+    def glob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
+        """
+        Matches the pattern against the paths relative to url. The literal prefix of the pattern is pushed down to the
+        listing, and only the top level of the directory is listed (Delimiter='/') unless the pattern can match deeper
+        """
+        bucket, key = cls.get_bucket_and_key_from_uri(url)
+        dir_prefix = key.rstrip('/') + '/' if key.rstrip('/') else ''
+        glob_pattern = compile_glob(pattern)
+        list_prefix = dir_prefix + glob_pattern.literal_prefix
+        if glob_pattern.is_recursive:
+            for page in cls._iter_list_pages(bucket=bucket, prefix=list_prefix):
+                for obj in page.get('Contents', []):
+                    relative_key = obj['Key'][len(dir_prefix):]
+                    if relative_key and glob_pattern.match(relative_key):
+                        yield cls.get_full_path(bucket=bucket, key=obj['Key']), cls._object_to_stat(obj)
+            return
+        for page in cls._iter_list_pages(bucket=bucket, prefix=list_prefix, delimiter='/'):
+            for common_prefix in page.get('CommonPrefixes', []):
+                dir_key = common_prefix['Prefix'].rstrip('/')
+                if glob_pattern.match(dir_key[len(dir_prefix):]):
+                    yield cls.get_full_path(bucket=bucket, key=dir_key), PathStat(kind=PathKind.directory)
+            for obj in page.get('Contents', []):
+                relative_key = obj['Key'][len(dir_prefix):]
+                # skip the directory marker of url itself
+                if relative_key and glob_pattern.match(relative_key):
+                    yield cls.get_full_path(bucket=bucket, key=obj['Key']), cls._object_to_stat(obj)
 
     @classmethod
-    def glob(cls, url: str, pattern: str) -> List[str]:
-        objects = cls._get_bucket_objects(url)
-        matched_objects = [obj for obj in objects if fnmatch.fnmatch(obj, pattern)]
-        # return only top level matched objects
-        top_level_objects = [obj for obj in matched_objects if obj.count('/') == url.rstrip('/').count('/') + 1]
-        all_subdirs = cls._get_dirs_under_url(base_url=url, url_list=matched_objects)
-        subdirs_in_top_level = [dir for dir in all_subdirs if dir.count('/') == url.rstrip('/').count('/') + 1]
-        return top_level_objects + subdirs_in_top_level
+    def iter_file_stats(cls, url: str, start_after: Optional[str] = None) -> Iterator[Tuple[str, PathStat]]:
+        """
+        Lists the objects under url, starting the listing after start_after (StartAfter) rather than filtering it
+        """
+        bucket, key = cls.get_bucket_and_key_from_uri(url)
+        dir_prefix = key.rstrip('/') + '/' if key.rstrip('/') else ''
+        for page in cls._iter_list_pages(bucket=bucket, prefix=dir_prefix,
+                                         start_after=dir_prefix + start_after if start_after is not None else None):
+            for obj in page.get('Contents', []):
+                # skip directory markers
+                if not obj['Key'].endswith('/'):
+                    yield cls.get_full_path(bucket=bucket, key=obj['Key']), cls._object_to_stat(obj)
 
     @classmethod
-    def rglob(cls, url: str, pattern: str) -> List[str]:
+    def rglob_stats(cls, url: str, pattern: str) -> Iterator[Tuple[str, Optional[PathStat]]]:
         """
-        Finds all the paths matching a specific pattern, including wildcards, and searches recursively in all subdirectories
+        Matches the pattern against the keys relative to url at any depth. The directories containing matched objects
+        are returned as well
         """
-        objects = cls._get_bucket_objects(url)
-        matched_objects = [obj for obj in objects if fnmatch.fnmatch(obj, pattern)]
-        dirs = cls._get_dirs_under_url(base_url=url, url_list=matched_objects)
-        return matched_objects + dirs
+        bucket, key = cls.get_bucket_and_key_from_uri(url)
+        dir_prefix = key.rstrip('/') + '/' if key.rstrip('/') else ''
+        base_url = cls.get_full_path(bucket=bucket, key=dir_prefix).rstrip('/')
+        glob_pattern = compile_rglob(pattern)
+        seen_dirs = set()
+        for page in cls._iter_list_pages(bucket=bucket, prefix=dir_prefix):
+            for obj in page.get('Contents', []):
+                relative_key = obj['Key'][len(dir_prefix):]
+                if not relative_key or not glob_pattern.match(relative_key):
+                    continue
+                yield cls.get_full_path(bucket=bucket, key=obj['Key']), cls._object_to_stat(obj)
+                if '/' not in relative_key.rstrip('/'):
+                    continue
+                dir = f"{base_url}/{relative_key.rstrip('/').rsplit('/', 1)[0]}"
+                if dir not in seen_dirs:
+                    seen_dirs.add(dir)
+                    yield dir, PathStat(kind=PathKind.directory)
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from typing import ClassVar, Optional
+
+from anypathlib.path_handlers.retry import RetryPolicy
+
+MB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class TransferOptions:
+    """
+    Tuning of large transfers, mapped by each handler to its native settings
+    (boto3 TransferConfig and client Config for S3, client and upload/download settings for Azure).
+
+    multipart_threshold: files larger than this are transferred in parts (S3 multipart, Azure blocks/ranges)
+    part_size: size of each part (S3 part, Azure block or download chunk)
+    max_concurrency: number of parts of a single file transferred in parallel
+    max_pool_connections: size of the HTTP connection pool of the clients, shared by all files and parts
+    max_workers: number of files transferred in parallel when transferring a directory (None for the pool default)
+    stage_on_disk: copies between S3 and Azure download each file to a temp file before uploading it, instead of
+        streaming it from the source straight into the upload
+    retry_policy: retries (with jittered exponential backoff) of the throttled and transient failures of the files of
+        a directory transfer, and adaptive concurrency under throttling
+
+    The memory used by a single file transfer is bounded by about part_size * max_concurrency.
+    """
+    multipart_threshold: int = 8 * MB
+    part_size: int = 8 * MB
+    max_concurrency: int = 4
+    max_pool_connections: int = 50
+    max_workers: Optional[int] = None
+    stage_on_disk: bool = False
+    retry_policy: RetryPolicy = RetryPolicy()
+
+    _default: ClassVar[Optional['TransferOptions']] = None
+
+    @classmethod
+    def get_default(cls) -> 'TransferOptions':
+        if cls._default is None:
+            cls._default = TransferOptions()
+        return cls._default
+
+    @classmethod
+    def set_default(cls, transfer_options: 'TransferOptions'):
+        """
+        Sets the options used by every transfer that is not given explicit options
+        """
+        TransferOptions._default = transfer_options
+
+    @classmethod
+    def resolve(cls, transfer_options: Optional['TransferOptions']) -> 'TransferOptions':
+        return cls.get_default() if transfer_options is None else transfer_options
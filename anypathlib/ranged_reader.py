@@ -0,0 +1,193 @@
+import bisect
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from anypathlib.path_handlers.base_path_handler import BasePathHandler
+from anypathlib.path_handlers.parallel import run_in_parallel, TransferError
+from anypathlib.path_handlers.retry import RetryPolicy
+from anypathlib.path_handlers.transfer_options import TransferOptions, MB
+
+
+class RangedReader(io.RawIOBase):
+    """
+    Seekable read-only file object over a remote file, fetched in blocks of block_size bytes with ranged requests.
+    The max_blocks most recently used blocks are kept in memory. Once two consecutive blocks are read, the next
+    read_ahead blocks are fetched in the background, and dropped if the next read is elsewhere
+    """
+
+    def __init__(self, url: str, size: int, path_handler: Type[BasePathHandler], block_size: int = 4 * MB,
+                 max_blocks: int = 16, read_ahead: int = 2, transfer_options: Optional[TransferOptions] = None):
+        if block_size <= 0 or max_blocks <= read_ahead:
+            raise ValueError('block_size must be positive and max_blocks larger than read_ahead')
+        self.url = url
+        self.size = size
+        self.path_handler = path_handler
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.read_ahead = read_ahead
+        self.transfer_options = transfer_options
+        self._position = 0
+        self._last_block_index: Optional[int] = None
+        self._blocks: 'OrderedDict[int, bytes]' = OrderedDict()
+        self._pending_blocks: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=read_ahead) if read_ahead > 0 else None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f'invalid whence ({whence})')
+        if position < 0:
+            raise ValueError(f'negative seek position {position}')
+        self._position = position
+        return position
+
+    def _fetch_block(self, block_index: int) -> bytes:
+        offset = block_index * self.block_size
+        return self.path_handler.read_range(self.url, offset=offset, length=min(self.block_size, self.size - offset),
+                                            transfer_options=self.transfer_options)
+
+    def _get_block(self, block_index: int) -> bytes:
+        with self._lock:
+            block = self._blocks.get(block_index)
+            if block is not None:
+                self._blocks.move_to_end(block_index)
+                return block
+            pending_block = self._pending_blocks.pop(block_index, None)
+        block = pending_block.result() if pending_block is not None else self._fetch_block(block_index)
+        with self._lock:
+            self._blocks[block_index] = block
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return block
+
+    def _schedule_read_ahead(self, block_index: int):
+        # Sequential access is detected when a block follows the previously read one
+        sequential = self._last_block_index is not None and block_index == self._last_block_index + 1
+        self._last_block_index = block_index
+        if self._executor is None:
+            return
+        n_blocks = (self.size + self.block_size - 1) // self.block_size
+        read_ahead_blocks = range(block_index + 1, min(block_index + 1 + self.read_ahead, n_blocks)) if sequential \
+            else range(0)
+        with self._lock:
+            # Read-ahead that a seek made useless is dropped, so at most read_ahead + 1 blocks are pending
+            for pending_block_index in list(self._pending_blocks):
+                if pending_block_index != block_index and pending_block_index not in read_ahead_blocks:
+                    self._pending_blocks.pop(pending_block_index).cancel()
+            for next_block_index in read_ahead_blocks:
+                if next_block_index not in self._blocks and next_block_index not in self._pending_blocks:
+                    self._pending_blocks[next_block_index] = self._executor.submit(self._fetch_block,
+                                                                                   next_block_index)
+
+    def readinto(self, buffer) -> int:
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        view = memoryview(buffer).cast('B')
+        n_read = 0
+        while n_read < len(view) and self._position < self.size:
+            block_index, block_offset = divmod(self._position, self.block_size)
+            if block_index != self._last_block_index:
+                self._schedule_read_ahead(block_index)
+            block = self._get_block(block_index)
+            n_bytes = min(len(block) - block_offset, len(view) - n_read)
+            view[n_read:n_read + n_bytes] = block[block_offset:block_offset + n_bytes]
+            n_read += n_bytes
+            self._position += n_bytes
+        return n_read
+
+    def readall(self) -> bytes:
+        return self.read(max(self.size - self._position, 0))
+
+    def close(self):
+        if not self.closed and self._executor is not None:
+            for pending_block in self._pending_blocks.values():
+                pending_block.cancel()
+            self._executor.shutdown(wait=False)
+        self._blocks.clear()
+        self._pending_blocks.clear()
+        super().close()
+
+
+def coalesce_ranges(ranges: Sequence[Tuple[int, int]], max_gap: int,
+                    max_request_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Merges (offset, length) ranges that overlap or are at most max_gap bytes apart into sorted (start, end) requests,
+    not growing a request over max_request_size bytes
+    """
+    requests: List[Tuple[int, int]] = []
+    for offset, length in sorted((offset, length) for offset, length in ranges if length > 0):
+        if requests:
+            start, end = requests[-1]
+            merged_end = max(end, offset + length)
+            if offset <= end + max_gap and (max_request_size is None or merged_end - start <= max_request_size):
+                requests[-1] = (start, merged_end)
+                continue
+        requests.append((offset, offset + length))
+    return requests
+
+
+def read_ranges(read_range_into: Callable[[int, memoryview], int], ranges: Sequence[Tuple[int, int]], max_gap: int,
+                max_request_size: Optional[int] = None, max_workers: Optional[int] = None,
+                retry_policy: Optional[RetryPolicy] = None, size: Optional[int] = None) -> List[memoryview]:
+    """
+    Reads the (offset, length) ranges with read_range_into(offset, buffer), coalesced by coalesce_ranges and requested
+    in parallel. Returns memoryviews over a single buffer in the order of ranges, shorter than requested past the end
+    of the data. With the size of the data, requests are cut at its end, and not sent when they start past it
+    """
+    for offset, length in ranges:
+        if offset < 0 or length < 0:
+            raise ValueError(f'invalid range (offset={offset}, length={length})')
+    requests = coalesce_ranges(ranges, max_gap=max_gap, max_request_size=max_request_size)
+    request_positions = []
+    buffer_size = 0
+    for start, end in requests:
+        request_positions.append(buffer_size)
+        buffer_size += end - start
+    buffer = memoryview(bytearray(buffer_size))
+    request_lengths = [0] * len(requests)
+
+    def read_request(request_index: int):
+        start, end = requests[request_index]
+        if size is not None:
+            # Ranged requests starting past the end of the data fail on S3 (InvalidRange)
+            end = min(end, size)
+            if start >= end:
+                return
+        position = request_positions[request_index]
+        request_lengths[request_index] = read_range_into(start, buffer[position:position + end - start])
+
+    _, failures = run_in_parallel(read_request, list(range(len(requests))), max_workers=max_workers,
+                                  retry_policy=retry_policy)
+    if failures:
+        raise TransferError('Failed reading ranges', [(requests[index], error) for index, error in failures])
+
+    request_starts = [start for start, _ in requests]
+    views = []
+    for offset, length in ranges:
+        if length == 0:
+            views.append(buffer[0:0])
+            continue
+        request_index = bisect.bisect_right(request_starts, offset) - 1
+        start = request_starts[request_index]
+        position = request_positions[request_index]
+        data_end = position + request_lengths[request_index]
+        views.append(buffer[min(position + offset - start, data_end):min(position + offset - start + length, data_end)])
+    return views
@@ -0,0 +1,47 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from anypathlib.path_handlers.path_types import PathStat
+
+SYNC_COMPARE_MODES = ('size', 'etag', 'mtime', 'checksum')
+MD5_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class SyncResult:
+    """
+    Summary of AnyPath.sync, with the paths relative to the synced directories
+    """
+    copied: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    bytes_copied: int = 0
+
+
+def local_md5(local_path: str) -> str:
+    md5 = hashlib.md5()
+    with open(local_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(MD5_CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def needs_transfer(source_stat: PathStat, target_stat: Optional[PathStat], compare: str,
+                   source_md5: Optional[str] = None, target_md5: Optional[str] = None) -> bool:
+    """
+    Whether the source file has to be transferred over the target file. With compare='checksum', a file whose MD5 is
+    unknown on either side is considered changed
+    """
+    if target_stat is None or source_stat.size != target_stat.size:
+        return True
+    if compare == 'size':
+        return False
+    if compare == 'etag':
+        return source_stat.etag != target_stat.etag
+    if compare == 'mtime':
+        # S3 and Azure keep whole seconds only
+        return source_stat.last_modified.replace(microsecond=0) > target_stat.last_modified.replace(microsecond=0)
+    if compare == 'checksum':
+        return source_md5 is None or source_md5 != target_md5
+    raise ValueError(f'compare must be one of {SYNC_COMPARE_MODES}, got {compare}')
@@ -0,0 +1,272 @@
+"""
+Offline benchmarks of AnyPath against moto server mode for S3, Azurite for Azure and the local filesystem.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --backends s3,local --listing-sizes 1000,100000 --output results.json
+    python benchmarks/run_benchmarks.py --backends import
+    python benchmarks/run_benchmarks.py --compare baseline.json results.json
+
+The import backend times fresh interpreters importing anypathlib and using a local path, and fails if that loads a
+cloud SDK. S3 runs against an in-process moto server unless --s3-endpoint-url is given. Azure runs only with --azurite (the
+default Azurite account on 127.0.0.1:10000) or --azure-connection-string.
+Requires anypathlib to be installed (pip install -e .), and moto[server] for the in-process S3 server.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+MB = 1024 * 1024
+AZURITE_CONNECTION_STRING = (
+    'DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;'
+    'AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;'
+    'BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;')
+BENCHMARK_BUCKET = 'anypath-bench'
+CLOUD_SDK_MODULES = ('boto3', 'botocore', 'azure', 'aiobotocore')
+IMPORT_SCRIPTS = {
+    'import_anypathlib': 'import anypathlib',
+    'import_and_use_local_path': 'import tempfile\nfrom anypathlib import AnyPath\n'
+                                 'AnyPath(tempfile.gettempdir()).iterdir()',
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def setup_s3(endpoint_url: Optional[str]) -> str:
+    # boto3 reads the endpoint when anypathlib creates its clients, so this runs before anypathlib is imported
+    if endpoint_url is None:
+        from moto.server import ThreadedMotoServer
+        port = free_port()
+        ThreadedMotoServer(port=port, verbose=False).start()
+        endpoint_url = f'http://127.0.0.1:{port}'
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ['AWS_ENDPOINT_URL'] = endpoint_url
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    import boto3
+    s3_client = boto3.client('s3')
+    if BENCHMARK_BUCKET not in [bucket['Name'] for bucket in s3_client.list_buckets().get('Buckets', [])]:
+        s3_client.create_bucket(Bucket=BENCHMARK_BUCKET)
+    return f's3://{BENCHMARK_BUCKET}'
+
+
+def setup_azure(connection_string: str) -> str:
+    from anypathlib.path_handlers.azure_handler import AzureHandler
+    storage_account = dict(part.split('=', 1) for part in connection_string.split(';') if part)['AccountName']
+    AzureHandler.client_cache.set_connection_string(storage_account, connection_string)
+    return f'https://{storage_account}.{AzureHandler.AZURE_URL_SUFFIX}/{BENCHMARK_BUCKET}'
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class BenchmarkRunner:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: List[dict] = []
+
+    def measure(self, backend: str, benchmark: str, func: Callable[[], None], params: Dict[str, object],
+                n_bytes: Optional[int] = None, n_ops: int = 1, setup: Optional[Callable[[], None]] = None):
+        """
+        Runs func repeat times (after setup, which is not timed) and records the durations
+        """
+        durations = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start_time = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start_time)
+        median_seconds = statistics.median(durations)
+        result = {'backend': backend, 'benchmark': benchmark, 'params': params, 'seconds': durations,
+                  'median_seconds': median_seconds, 'min_seconds': min(durations)}
+        if n_ops > 1:
+            result['median_seconds_per_op'] = median_seconds / n_ops
+        if n_bytes is not None:
+            result['throughput_mb_s'] = n_bytes / MB / median_seconds if median_seconds else None
+        self.results.append(result)
+        print(f'{backend:>6} {benchmark:<28} {json.dumps(params):<40} median {median_seconds:.4f}s'
+              + (f' ({result["throughput_mb_s"]:.1f} MB/s)' if n_bytes else ''))
+
+
+def populate(base, n_files: int, file_size: int, prefix: str = 'file'):
+    from anypathlib.path_handlers.parallel import run_in_parallel
+    data = os.urandom(file_size)
+    _, failures = run_in_parallel(lambda i: (base / f'{prefix}_{i:07d}.bin').write_bytes(data), list(range(n_files)),
+                                  max_workers=64)
+    if failures:
+        raise RuntimeError(f'Failed writing {len(failures)} files under {base}')
+
+
+def run_backend(runner: BenchmarkRunner, backend: str, base_url: str, args: argparse.Namespace, work_dir: Path):
+    from anypathlib import AnyPath
+
+    base = AnyPath(base_url)
+    # Listings
+    for n_keys in args.listing_sizes:
+        listing_dir = base / f'listing_{n_keys}'
+        populate(listing_dir, n_keys, file_size=0)
+        params = {'keys': n_keys}
+        runner.measure(backend, 'iterdir', lambda: listing_dir.iterdir(), params)
+        runner.measure(backend, 'glob', lambda: listing_dir.glob('*.bin'), params)
+        runner.measure(backend, 'rglob', lambda: listing_dir.rglob('*.bin'), params)
+        runner.measure(backend, 'glob_prefix', lambda: listing_dir.glob('file_00001*.bin'), params)
+
+    # Metadata probes
+    probe_file = base / 'probe' / 'file.bin'
+    probe_file.write_bytes(b'probe')
+    missing_file = base / 'probe' / 'missing.bin'
+    n_probes = args.probes
+    params = {'probes': n_probes}
+    runner.measure(backend, 'exists', lambda: [probe_file.exists() for _ in range(n_probes)], params, n_ops=n_probes)
+    runner.measure(backend, 'exists_missing', lambda: [missing_file.exists() for _ in range(n_probes)], params,
+                   n_ops=n_probes)
+    runner.measure(backend, 'is_dir', lambda: [probe_file.parent.is_dir() for _ in range(n_probes)], params,
+                   n_ops=n_probes)
+    runner.measure(backend, 'stat', lambda: [probe_file.stat() for _ in range(n_probes)], params, n_ops=n_probes)
+
+    # Single large file, both directions
+    large_size = args.large_file_mb * MB
+    local_large_file = work_dir / f'{backend}_large.bin'
+    with open(local_large_file, 'wb') as f:
+        for _ in range(args.large_file_mb):
+            f.write(os.urandom(MB))
+    remote_large_file = base / 'large' / 'large.bin'
+    downloaded_large_file = work_dir / f'{backend}_large_downloaded.bin'
+    params = {'mb': args.large_file_mb}
+    runner.measure(backend, 'upload_large_file', lambda: AnyPath(local_large_file).copy(remote_large_file),
+                   params, n_bytes=large_size)
+    runner.measure(backend, 'download_large_file', lambda: remote_large_file.copy(downloaded_large_file), params,
+                   n_bytes=large_size, setup=lambda: downloaded_large_file.exists() and downloaded_large_file.unlink())
+    runner.measure(backend, 'read_into_large_file', lambda: remote_large_file.read_into(bytearray(large_size)),
+                   params, n_bytes=large_size)
+
+    # Many small files, both directions
+    small_size = args.small_file_kb * 1024
+    local_small_dir = work_dir / f'{backend}_small'
+    populate(AnyPath(local_small_dir), args.small_files, file_size=small_size)
+    remote_small_dir = base / 'small'
+    downloaded_small_dir = work_dir / f'{backend}_small_downloaded'
+    params = {'files': args.small_files, 'kb': args.small_file_kb}
+    n_bytes = args.small_files * small_size
+    runner.measure(backend, 'upload_small_files', lambda: AnyPath(local_small_dir).copy(remote_small_dir), params,
+                   n_bytes=n_bytes, n_ops=args.small_files)
+    runner.measure(backend, 'download_small_files', lambda: remote_small_dir.copy(downloaded_small_dir), params,
+                   n_bytes=n_bytes, n_ops=args.small_files,
+                   setup=lambda: shutil.rmtree(downloaded_small_dir, ignore_errors=True))
+
+
+def run_import_benchmark(runner: BenchmarkRunner):
+    for benchmark, script in IMPORT_SCRIPTS.items():
+        loaded_modules = subprocess.run(
+            [sys.executable, '-c', f'{script}\nimport sys\nprint(" ".join(sys.modules))'], capture_output=True,
+            text=True, check=True).stdout.split()
+        loaded_sdks = sorted({module.split('.')[0] for module in loaded_modules
+                              if module.split('.')[0] in CLOUD_SDK_MODULES})
+        if loaded_sdks:
+            raise RuntimeError(f'{benchmark} loaded {", ".join(loaded_sdks)}')
+        # includes the startup of the interpreter, measured on its own as python_startup
+        runner.measure('import', benchmark, lambda: subprocess.run([sys.executable, '-c', script], check=True), {})
+    runner.measure('import', 'python_startup', lambda: subprocess.run([sys.executable, '-c', 'pass'], check=True), {})
+
+
+def compare(baseline_path: str, results_path: str):
+    """
+    Prints the ratio of the median durations of results to those of baseline, per benchmark
+    """
+    baseline = json.loads(Path(baseline_path).read_text())
+    results = json.loads(Path(results_path).read_text())
+
+    def key(result: dict) -> str:
+        return f'{result["backend"]} {result["benchmark"]} {json.dumps(result["params"], sort_keys=True)}'
+
+    baseline_medians = {key(result): result['median_seconds'] for result in baseline['results']}
+    print(f'baseline {baseline["meta"].get("commit")}, results {results["meta"].get("commit")}')
+    for result in results['results']:
+        baseline_median = baseline_medians.get(key(result))
+        if baseline_median:
+            print(f'{key(result):<70} {baseline_median:.4f}s -> {result["median_seconds"]:.4f}s '
+                  f'({result["median_seconds"] / baseline_median:.2f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', default='import,s3,azure,local', help='Comma separated backends')
+    parser.add_argument('--listing-sizes', default='1000,10000', help='Comma separated numbers of listed keys')
+    parser.add_argument('--probes', type=int, default=100, help='Metadata probes per measurement')
+    parser.add_argument('--large-file-mb', type=int, default=64)
+    parser.add_argument('--small-files', type=int, default=500)
+    parser.add_argument('--small-file-kb', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--s3-endpoint-url', default=None, help='S3 endpoint, instead of an in-process moto server')
+    parser.add_argument('--azurite', action='store_true', help='Run Azure against Azurite on 127.0.0.1:10000')
+    parser.add_argument('--azure-connection-string', default=None)
+    parser.add_argument('--output', default=None, help='JSON file of the results')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'RESULTS'),
+                        help='Compare two result files instead of running')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    args.listing_sizes = [int(n) for n in args.listing_sizes.split(',') if n]
+    backends = [backend for backend in args.backends.split(',') if backend]
+
+    base_urls = {}
+    run_id = uuid.uuid4().hex[:8]
+    if 's3' in backends:
+        base_urls['s3'] = f'{setup_s3(args.s3_endpoint_url)}/{run_id}'
+    azure_connection_string = args.azure_connection_string or (AZURITE_CONNECTION_STRING if args.azurite else None)
+    if 'azure' in backends:
+        if azure_connection_string is None:
+            print('Skipping azure, run with --azurite or --azure-connection-string')
+        else:
+            base_urls['azure'] = f'{setup_azure(azure_connection_string)}/{run_id}'
+    work_dir = Path(tempfile.mkdtemp(prefix='anypath_bench_'))
+    if 'local' in backends:
+        base_urls['local'] = (work_dir / 'local_backend').as_posix()
+
+    from anypathlib import AnyPath
+    runner = BenchmarkRunner(repeat=args.repeat)
+    if 'import' in backends:
+        run_import_benchmark(runner)
+    try:
+        for backend, base_url in base_urls.items():
+            try:
+                run_backend(runner, backend, base_url, args, work_dir)
+            finally:
+                if AnyPath(base_url).exists():
+                    AnyPath(base_url).remove()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = {'meta': {'commit': git_commit(), 'python': sys.version.split()[0], 'platform': platform.platform(),
+                       'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                       'args': {k: v for k, v in vars(args).items() if k != 'azure_connection_string'}},
+              'results': runner.results}
+    if args.output is not None:
+        Path(args.output).write_text(json.dumps(output, indent=2))
+        print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
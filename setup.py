@@ -42,10 +42,12 @@ setuptools.setup(
         "azure-identity>=1.15.0",
         "azure-mgmt-storage>=21.1.0",
         "boto3>=1.34.23",
+        "requests",
         "loguru",
         "tqdm",
         'Click'
     ],
+    extras_require={"async": ["aiobotocore", "aiohttp"]},
     setup_requires=["pre-commit"],
     py_modules=["anypathlib"],
     entry_points={"console_scripts": ["anypathlib = anypathlib.cli:cli"]}
@@ -1,4 +1,5 @@
 import random
+import socket
 import string
 
 import pytest
@@ -8,6 +9,7 @@ import tempfile
 from click.testing import CliRunner
 
 from anypathlib import PathType
+from anypathlib.path_handlers.s3_handler import S3Handler
 
 from tests.tests_urls import PATH_TYPE_TO_BASE_TEST_PATH, PATH_TYPE_TO_HANDLER
 
@@ -61,3 +63,40 @@ def clean_remote_dir(request, path_type: PathType):
 @pytest.fixture
 def cli_runner():
     return CliRunner()
+
+
+MOTO_TEST_BUCKET = 'anypathlib-test'
+
+
+@pytest.fixture(scope='session')
+def moto_server_url():
+    moto_server = pytest.importorskip('moto.server')
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = moto_server.ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    yield f'http://127.0.0.1:{port}'
+    server.stop()
+
+
+@pytest.fixture
+def moto_s3_dir(request, moto_server_url, monkeypatch):
+    """
+    An S3 directory on an in-process moto server, which boto3 and aiobotocore reach through AWS_ENDPOINT_URL
+    """
+    import boto3
+    monkeypatch.setenv('AWS_ENDPOINT_URL', moto_server_url)
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    for env_var in ('AWS_PROFILE', 'AWS_SESSION_TOKEN'):
+        monkeypatch.delenv(env_var, raising=False)
+    # The cached clients and the default session were created for the real endpoint and credentials
+    monkeypatch.setattr(S3Handler, '_transfer_clients', {})
+    monkeypatch.setattr(S3Handler, '_resource', None)
+    monkeypatch.setattr(boto3, 'DEFAULT_SESSION', None)
+    boto3.client('s3').create_bucket(Bucket=MOTO_TEST_BUCKET)
+    remote_dir = f's3://{MOTO_TEST_BUCKET}/{request.node.name}/'
+    yield remote_dir
+    S3Handler.remove(remote_dir)
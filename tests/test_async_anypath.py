@@ -0,0 +1,103 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from anypathlib import PathType, AnyPath, AsyncAnyPath, TransferOptions
+from anypathlib.path_handlers.transfer_options import MB
+from fixtures_anypath import temp_nested_dir, temp_local_dir, clean_remote_dir, moto_server_url, moto_s3_dir
+
+
+def run_async_anypath_flow(remote_base_dir: str, temp_nested_dir, temp_local_dir):
+    local_dir_path, top_level_files, nested_files = temp_nested_dir
+    local_files = sorted(p.relative_to(local_dir_path).as_posix() for p in local_dir_path.rglob('*') if p.is_file())
+
+    async def flow():
+        remote_dir = AsyncAnyPath(remote_base_dir, max_concurrency=4) / 'async'
+        assert not await remote_dir.exists()
+        copied_dir = await AsyncAnyPath(local_dir_path).copy(remote_dir)
+        assert await copied_dir.is_dir()
+        rglob_files = [p.base_path for p in await remote_dir.rglob('*') if await p.is_file()]
+        assert sorted(rglob_files) == sorted((remote_dir / f).base_path for f in local_files)
+        assert sorted(p.name for p in await remote_dir.iterdir()) == sorted(p.name for p in top_level_files)
+        assert sorted(p.name for p in await remote_dir.glob('*.txt')) == sorted(
+            p.name for p in top_level_files if p.is_file())
+
+        remote_file = remote_dir / 'written.bin'
+        await remote_file.write_bytes(b'async content')
+        assert (await remote_file.stat()).size == len(b'async content')
+        assert await remote_file.read_bytes() == b'async content'
+        assert AnyPath(remote_file.base_path).read_bytes() == b'async content'
+
+        downloaded_dir = await remote_dir.copy(temp_local_dir / 'downloaded')
+        assert sorted(p.relative_to(downloaded_dir.base_path).as_posix() for p in
+                      (temp_local_dir / 'downloaded').rglob('*') if p.is_file()) == sorted(local_files + ['written.bin'])
+
+        await remote_dir.remove()
+        assert not await remote_dir.exists()
+        assert not await remote_file.exists()
+
+        async_handler = remote_dir.async_handler
+        if async_handler is not None:
+            # All the operations of the flow shared a single client
+            assert len(async_handler._clients[asyncio.get_running_loop()]) == 1
+        await AsyncAnyPath.close_clients()
+        if async_handler is not None:
+            assert asyncio.get_running_loop() not in async_handler._clients
+
+    asyncio.run(flow())
+
+
+@pytest.mark.usefixtures("temp_nested_dir", "temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_async_anypath_flow(path_type: PathType, temp_nested_dir, temp_local_dir, clean_remote_dir):
+    run_async_anypath_flow(clean_remote_dir, temp_nested_dir, temp_local_dir)
+
+
+def test_async_s3_flow_on_moto_server(temp_nested_dir, temp_local_dir, moto_s3_dir):
+    pytest.importorskip('aiobotocore')
+    run_async_anypath_flow(moto_s3_dir, temp_nested_dir, temp_local_dir)
+
+
+@pytest.mark.usefixtures("clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure])
+def test_async_azure_remove_missing(path_type: PathType, clean_remote_dir):
+    from azure.core.exceptions import ResourceNotFoundError
+
+    async def flow():
+        # As AzureHandler.remove, a missing blob is an error but a missing directory url ending with a '/' is not
+        with pytest.raises(ResourceNotFoundError):
+            await (AsyncAnyPath(clean_remote_dir) / 'missing.txt').remove()
+        await AsyncAnyPath(clean_remote_dir).remove()
+        await AsyncAnyPath.close_clients()
+
+    asyncio.run(flow())
+
+
+def run_async_copy_large_file(remote_base_dir: str, temp_local_dir):
+    transfer_options = TransferOptions(multipart_threshold=5 * MB, part_size=5 * MB, max_concurrency=2)
+    local_file = temp_local_dir / 'large_file.bin'
+    local_file.write_bytes(os.urandom(11 * MB))
+
+    async def flow():
+        remote_file = await AsyncAnyPath(local_file).copy(AsyncAnyPath(remote_base_dir) / local_file.name,
+                                                          transfer_options=transfer_options)
+        if remote_file.path_type == PathType.s3:
+            assert (await remote_file.stat()).etag.endswith('-3')
+        downloaded_file = await remote_file.copy(temp_local_dir / 'downloaded.bin', transfer_options=transfer_options)
+        assert Path(downloaded_file.base_path).read_bytes() == local_file.read_bytes()
+        await AsyncAnyPath.close_clients()
+
+    asyncio.run(flow())
+
+
+@pytest.mark.usefixtures("temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3])
+def test_async_copy_large_file(path_type: PathType, temp_local_dir, clean_remote_dir):
+    run_async_copy_large_file(clean_remote_dir, temp_local_dir)
+
+
+def test_async_s3_copy_large_file_on_moto_server(temp_local_dir, moto_s3_dir):
+    pytest.importorskip('aiobotocore')
+    run_async_copy_large_file(moto_s3_dir, temp_local_dir)
@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from anypathlib.path_handlers.azure_handler import AzureHandler, AzureClientCache
+
+FAKE_CONNECTION_STRING = ("DefaultEndpointsProtocol=https;AccountName={account};"
+                          "AccountKey=ZmFrZWtleQ==;EndpointSuffix=core.windows.net")
+
+
+def test_client_cache_looks_up_key_once_per_account(monkeypatch):
+    lookups = []
+    lock = threading.Lock()
+
+    def fake_get_connection_string(storage_account: str, *args, **kwargs) -> str:
+        with lock:
+            lookups.append(storage_account)
+        return FAKE_CONNECTION_STRING.format(account=storage_account)
+
+    monkeypatch.setattr(AzureHandler, 'get_connection_string', fake_get_connection_string)
+    cache = AzureClientCache(ttl_seconds=3600)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        container_clients = list(executor.map(lambda _: cache.get_container_client('account', 'container'), range(32)))
+    assert lookups == ['account']
+    assert all(container_client is container_clients[0] for container_client in container_clients)
+    assert cache.get_blob_service_client('account') is cache.get_blob_service_client('account')
+
+    cache.get_blob_service_client('other_account')
+    assert sorted(lookups) == ['account', 'other_account']
+
+    cache.invalidate('account')
+    cache.get_blob_service_client('account')
+    assert sorted(lookups) == ['account', 'account', 'other_account']
+
+
+def test_client_cache_refreshes_after_ttl(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(AzureHandler, 'get_connection_string',
+                        lambda storage_account, *args, **kwargs: lookups.append(storage_account) or
+                        FAKE_CONNECTION_STRING.format(account=storage_account))
+    cache = AzureClientCache(ttl_seconds=0)
+    first_client = cache.get_blob_service_client('account')
+    second_client = cache.get_blob_service_client('account')
+    assert len(lookups) == 2
+    assert first_client is not second_client
+
+
+def test_client_cache_pinned_connection_string(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(AzureHandler, 'get_connection_string',
+                        lambda storage_account, *args, **kwargs: lookups.append(storage_account))
+    cache = AzureClientCache(ttl_seconds=0)
+    cache.set_connection_string('account', FAKE_CONNECTION_STRING.format(account='account'))
+    cache.get_container_client('account', 'container')
+    cache.get_container_client('account', 'container')
+    assert lookups == []
+
+
+def test_blob_service_client_owns_its_session():
+    blob_service_client = AzureHandler.create_blob_service_client(FAKE_CONNECTION_STRING.format(account='account'))
+    transport = blob_service_client._pipeline._transport
+    session = transport.session
+    assert session is not None
+    blob_service_client.close()
+    # the session, and its connection pool, are closed with the client
+    assert transport.session is None
@@ -0,0 +1,101 @@
+import base64
+from types import SimpleNamespace
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+from anypathlib.path_handlers.azure_handler import AzureHandler, AzureStoragePath
+from anypathlib.path_handlers.parallel import TransferError
+
+
+class FakeBlobClient:
+    def __init__(self, container_client, blob_name):
+        self.container_client = container_client
+        self.blob_name = blob_name
+
+    def start_copy_from_url(self, source_url):
+        return self.container_client.start_copy(self.blob_name, source_url)
+
+    def get_blob_properties(self):
+        if self.blob_name not in self.container_client.copies:
+            raise ResourceNotFoundError('missing')
+        return SimpleNamespace(name=self.blob_name, copy=self.container_client.poll(self.blob_name))
+
+
+class FakeContainerClient:
+    """
+    Copies are pending for polls_until_done polls of the target, and blobs in failing_blob_names fail
+    """
+
+    def __init__(self, blob_names=(), failing_blob_names=(), polls_until_done=2):
+        self.blob_names = list(blob_names)
+        self.failing_blob_names = set(failing_blob_names)
+        self.polls_until_done = polls_until_done
+        self.copies = {}
+        self.n_listings = 0
+
+    def list_blob_names(self, name_starts_with):
+        return [blob_name for blob_name in self.blob_names if blob_name.startswith(name_starts_with)]
+
+    def get_blob_client(self, blob_name):
+        return FakeBlobClient(self, blob_name)
+
+    def start_copy(self, blob_name, source_url):
+        self.copies[blob_name] = {'source_url': source_url, 'id': f'copy-{blob_name}', 'polls': 0}
+        return {'copy_status': 'pending', 'copy_id': f'copy-{blob_name}'}
+
+    def poll(self, blob_name):
+        copy = self.copies[blob_name]
+        copy['polls'] += 1
+        status = 'pending'
+        if copy['polls'] >= self.polls_until_done:
+            status = 'failed' if blob_name in self.failing_blob_names else 'success'
+        return SimpleNamespace(id=copy['id'], status=status, status_description=None)
+
+    def list_blobs(self, name_starts_with, include):
+        self.n_listings += 1
+        return [SimpleNamespace(name=blob_name, copy=self.poll(blob_name)) for blob_name in self.copies if
+                blob_name.startswith(name_starts_with)]
+
+
+@pytest.fixture
+def fake_accounts(monkeypatch):
+    containers = {('source', 'container'): FakeContainerClient(
+        [f'dir/file_{i}.txt' for i in range(20)] + ['dir/sub/file.txt', 'dir_sibling.txt']),
+        ('target', 'container'): FakeContainerClient(failing_blob_names={'copied/file_7.txt'})}
+    account_key = base64.b64encode(b'key').decode()
+    monkeypatch.setattr(AzureStoragePath, 'container_client',
+                        property(lambda self: containers[(self.storage_account, self.container_name)]))
+    monkeypatch.setattr(AzureStoragePath, 'blob_service_client',
+                        property(lambda self: SimpleNamespace(credential=SimpleNamespace(account_key=account_key))))
+    monkeypatch.setattr(AzureHandler, 'COPY_POLL_INTERVAL_SECONDS', 0)
+    return containers
+
+
+def test_azure_copy_directory_waits_and_reports(fake_accounts):
+    target_container = fake_accounts[('target', 'container')]
+    with pytest.raises(TransferError) as transfer_error:
+        AzureHandler.copy('https://source.blob.core.windows.net/container/dir',
+                          'https://target.blob.core.windows.net/container/copied/')
+    assert sorted(target_container.copies) == sorted([f'copied/file_{i}.txt' for i in range(20)] +
+                                                     ['copied/sub/file.txt'])
+    # cross-account sources are read with a SAS
+    assert all('sig=' in copy['source_url'] for copy in target_container.copies.values())
+    # many pending copies are polled with listings rather than per blob
+    assert target_container.n_listings > 0
+    [(copy_status, _)] = transfer_error.value.failures
+    assert copy_status.target_url == 'https://target.blob.core.windows.net/container/copied/file_7.txt'
+    assert copy_status.status == 'failed'
+
+
+def test_azure_copy_without_waiting(fake_accounts):
+    copy_statuses = AzureHandler.copy('https://source.blob.core.windows.net/container/dir/sub/file.txt',
+                                      'https://source.blob.core.windows.net/container/file_copy.txt', wait=False)
+    assert [(copy_status.target_url, copy_status.status) for copy_status in copy_statuses] == [
+        ('https://source.blob.core.windows.net/container/file_copy.txt', 'pending')]
+    source_container = fake_accounts[('source', 'container')]
+    # no SAS within the same account
+    assert source_container.copies['file_copy.txt']['source_url'] == \
+           'https://source.blob.core.windows.net/container/dir/sub/file.txt'
+    AzureHandler.wait_for_copies(source_container, copy_statuses)
+    assert copy_statuses[0].status == 'success'
@@ -2,6 +2,7 @@ from pathlib import Path
 
 import pytest
 
+from anypathlib import AnyPath
 from anypathlib.cli import cli
 from tests.fixtures_anypath import temp_dir_with_files, cli_runner, temp_local_dir
 
@@ -84,3 +85,14 @@ def test_remove_command_non_existing_path(temp_dir_with_files, cli_runner):
 
     result = cli_runner.invoke(cli, ['remove', '-p', input_file])
     assert result.exit_code == 0
+
+
+@pytest.mark.usefixtures("temp_dir_with_files", 'cli_runner')
+def test_copy_directory_command_with_max_workers(temp_dir_with_files, cli_runner):
+    local_dir_path, local_dir_files = temp_dir_with_files
+    output_path = local_dir_path.parent / f'{local_dir_path.name}_{FOLDER_NAME}'
+
+    result = cli_runner.invoke(cli, ['copy', '-i', local_dir_path, '-o', output_path, '--max-workers', '2'])
+    assert result.exit_code == 0
+    assert sorted([fn.name for fn in output_path.iterdir()]) == sorted([fn.name for fn in local_dir_files])
+    AnyPath(output_path).remove()
@@ -1,8 +1,8 @@
 import pytest
 
-from anypathlib import PathType, AnyPath
+from anypathlib import PathType, AnyPath, TransferOptions
 from tests.tests_urls import PATH_TYPE_TO_HANDLER
-from fixtures_anypath import temp_local_dir, temp_dir_with_files, clean_remote_dir
+from fixtures_anypath import temp_local_dir, temp_dir_with_files, clean_remote_dir, temp_nested_dir
 
 
 @pytest.mark.usefixtures("temp_dir_with_files", "temp_local_dir", "clean_remote_dir")
@@ -17,3 +17,19 @@ def test_copy_to_local_from_cloud(path_type: PathType, temp_dir_with_files, temp
     remote_files = AnyPath(remote_dir).rglob('*')
     assert sorted([fn.name for fn in remote_files]) == sorted(
         [fn.name for fn in local_download_dir.rglob('*')])
+
+
+@pytest.mark.usefixtures("temp_nested_dir", "temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3])
+def test_download_nested_directory(path_type: PathType, temp_nested_dir, temp_local_dir, clean_remote_dir):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    local_dir_path, local_files_top_level, local_nested_files = temp_nested_dir
+    remote_dir = clean_remote_dir
+    cloud_handler.upload_directory(local_dir=local_dir_path, target_url=remote_dir, verbose=False)
+    target_dir, local_files = cloud_handler.download_directory(url=remote_dir, force_overwrite=True,
+                                                               target_dir=temp_local_dir, verbose=True,
+                                                               transfer_options=TransferOptions(max_workers=4))
+    assert target_dir == temp_local_dir
+    expected_files = sorted([local_file.relative_to(local_dir_path) for local_file in local_dir_path.rglob('*') if
+                             local_file.is_file()])
+    assert sorted([local_file.relative_to(temp_local_dir) for local_file in local_files]) == expected_files
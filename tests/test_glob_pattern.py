@@ -0,0 +1,38 @@
+import pytest
+
+from anypathlib.path_handlers.glob_pattern import compile_glob, compile_rglob
+
+
+@pytest.mark.parametrize("pattern, path, matches", [
+    ('*.txt', 'a.txt', True),
+    ('*.txt', 'dir/a.txt', False),
+    ('*', '.hidden', True),
+    ('dir/*.txt', 'dir/a.txt', True),
+    ('dir/*.txt', 'dir/sub/a.txt', False),
+    ('**/*.txt', 'a.txt', True),
+    ('**/*.txt', 'dir/sub/a.txt', True),
+    ('dir/**/a.txt', 'dir/a.txt', True),
+    ('dir/**/a.txt', 'dir/x/y/a.txt', True),
+    ('dir/**/a.txt', 'dira.txt', False),
+    ('**', 'dir/sub/a.txt', True),
+    ('file_?.bin', 'file_1.bin', True),
+    ('file_?.bin', 'file_10.bin', False),
+    ('[!a]*', 'b.txt', True),
+    ('[!a]*', 'a.txt', False),
+    ('a[!x]b', 'a/b', False),
+    ('[a-c].txt', 'b.txt', True),
+    ('x[', 'x[', True),
+    ('a+b(1).txt', 'a+b(1).txt', True),
+])
+def test_glob_pattern(pattern: str, path: str, matches: bool):
+    assert compile_glob(pattern).match(path) == matches
+
+
+def test_glob_pattern_listing_hints():
+    assert compile_glob('2024-05-*.json').literal_prefix == '2024-05-'
+    assert not compile_glob('*.json').is_recursive
+    assert compile_glob('dir/*.json').is_recursive
+    assert compile_glob('**').is_recursive
+    assert compile_rglob('*.txt').match('dir/sub/a.txt')
+    assert compile_rglob('sub/*.txt').match('dir/sub/a.txt')
+    assert not compile_rglob('sub/*.txt').match('dir/sub/x/a.txt')
@@ -1,7 +1,7 @@
 import pytest
 from anypathlib import PathType, AnyPath
 from tests.tests_urls import PATH_TYPE_TO_HANDLER
-from fixtures_anypath import temp_dir_with_files, clean_remote_dir, temp_nested_dir
+from fixtures_anypath import temp_dir_with_files, clean_remote_dir, temp_nested_dir, moto_server_url, moto_s3_dir
 
 
 @pytest.mark.usefixtures("temp_nested_dir", "clean_remote_dir")
@@ -19,3 +19,53 @@ def test_rglob_glob_iterdir(path_type: PathType, temp_nested_dir, clean_remote_d
     remote_files_top_level_iterdir = AnyPath(remote_dir).iterdir()
     assert sorted([fn.name for fn in remote_files_top_level_iterdir]) == sorted(
         [fn.name for fn in local_files_top_level])
+
+
+@pytest.mark.usefixtures("temp_nested_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.local, PathType.azure, PathType.s3])
+def test_lazy_rglob_glob_iterdir(path_type: PathType, temp_nested_dir, clean_remote_dir):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    local_dir_path, local_files_top_level, local_nested_files = temp_nested_dir
+    remote_dir = clean_remote_dir
+    cloud_handler.upload_directory(local_dir=local_dir_path, target_url=remote_dir, verbose=False)
+    remote_dir_any_path = AnyPath(remote_dir)
+    lazy_rglob = remote_dir_any_path.iter_rglob(pattern='*')
+    assert isinstance(next(lazy_rglob), AnyPath)
+    assert sorted([fn.name for fn in remote_dir_any_path.iter_rglob(pattern='*')]) == sorted(
+        [fn.name for fn in remote_dir_any_path.rglob(pattern='*')])
+    assert sorted([fn.name for fn in remote_dir_any_path.iter_glob(pattern='*')]) == sorted(
+        [fn.name for fn in local_files_top_level])
+    assert sorted([fn.name for fn in remote_dir_any_path.iter_dir()]) == sorted(
+        [fn.name for fn in local_files_top_level])
+
+
+@pytest.mark.usefixtures("temp_nested_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.local, PathType.azure, PathType.s3])
+def test_glob_rglob_relative_patterns(path_type: PathType, temp_nested_dir, clean_remote_dir):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    local_dir_path, local_files_top_level, local_nested_files = temp_nested_dir
+    remote_dir = clean_remote_dir
+    cloud_handler.upload_directory(local_dir=local_dir_path, target_url=remote_dir, verbose=False)
+    top_level_file = [fn for fn in local_files_top_level if fn.is_file()][0]
+    nested_dir_name = local_nested_files[0].parent.name
+
+    name_prefix_pattern = top_level_file.name[:4] + '*'
+    assert [fn.name for fn in AnyPath(remote_dir).glob(pattern=name_prefix_pattern)] == [top_level_file.name]
+    assert sorted([fn.name for fn in AnyPath(remote_dir).glob(pattern='*.txt')]) == sorted(
+        [fn.name for fn in local_files_top_level if fn.is_file()])
+    assert sorted([fn.name for fn in AnyPath(remote_dir).glob(pattern=f'{nested_dir_name}/*.txt')]) == sorted(
+        [fn.name for fn in local_nested_files])
+    remote_nested_files = [fn for fn in AnyPath(remote_dir).rglob(pattern=f'{nested_dir_name}/*.txt') if fn.is_file()]
+    assert sorted([fn.name for fn in remote_nested_files]) == sorted([fn.name for fn in local_nested_files])
+    all_txt_files = [fn for fn in local_files_top_level + local_nested_files if fn.is_file() and fn.suffix == '.txt']
+    assert sorted([fn.name for fn in AnyPath(remote_dir).glob(pattern='**/*.txt')]) == sorted(
+        [fn.name for fn in all_txt_files])
+
+
+def test_s3_rglob_literal_prefix_matches_nested_keys(moto_s3_dir):
+    remote_dir = AnyPath(moto_s3_dir)
+    for relative_key in ['a.txt', 'x/a.txt', 'x/b.txt', 'b/c.txt']:
+        (remote_dir / relative_key).write_bytes(b'content')
+    # The literal prefix of an rglob pattern applies to the name at any depth, not to the keys under the directory
+    assert sorted(p.base_path[len(remote_dir.base_path) + 1:] for p in remote_dir.rglob('a*')) == [
+        'a.txt', 'x', 'x/a.txt']
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+CLOUD_SDK_MODULES = ('boto3', 'botocore', 'azure', 'aiobotocore')
+
+
+def loaded_modules(script: str) -> set:
+    output = subprocess.run([sys.executable, '-c', f'{script}\nimport sys\nprint(" ".join(sys.modules))'],
+                            capture_output=True, text=True, check=True).stdout
+    return {module.split('.')[0] for module in output.split()}
+
+
+def test_local_paths_do_not_import_cloud_sdks(tmpdir):
+    modules = loaded_modules(f'from anypathlib import AnyPath, AsyncAnyPath\n'
+                             f'(AnyPath(r"{tmpdir}") / "file.txt").write_bytes(b"data")\n'
+                             f'AnyPath(r"{tmpdir}").rglob("*")')
+    assert 'anypathlib' in modules
+    assert not modules.intersection(CLOUD_SDK_MODULES)
+
+
+def test_handlers_are_imported_on_first_use():
+    modules = loaded_modules('from anypathlib import AnyPath\nAnyPath("s3://bucket/key").path_handler')
+    assert 'boto3' in modules
+    assert 'azure' not in modules
@@ -0,0 +1,159 @@
+import pytest
+
+from anypathlib import PathType, AnyPath
+from anypathlib.metrics import InMemoryMetrics, add_metrics_sink, remove_metrics_sink
+from tests.tests_urls import PATH_TYPE_TO_HANDLER
+from fixtures_anypath import temp_nested_dir, temp_local_dir, clean_remote_dir
+
+
+def listing_names(paths):
+    return sorted(path.base_path.rstrip('/') for path in paths)
+
+
+@pytest.mark.usefixtures("temp_nested_dir", "temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3])
+def test_listing_index(path_type: PathType, temp_nested_dir, temp_local_dir, clean_remote_dir):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    local_dir_path, local_files_top_level, local_nested_files = temp_nested_dir
+    cloud_handler.upload_directory(local_dir=local_dir_path, target_url=clean_remote_dir, verbose=False)
+    remote_dir = AnyPath(clean_remote_dir)
+    nested_dir = remote_dir / local_nested_files[0].parent.name
+    expected = {'rglob': listing_names(remote_dir.rglob('*')), 'glob': listing_names(remote_dir.glob('*.txt')),
+                'iterdir': listing_names(remote_dir.iterdir()), 'nested': listing_names(nested_dir.iterdir())}
+    remote_file = remote_dir / local_files_top_level[0].name
+    remote_file_stat = remote_file.stat()
+
+    db_path = temp_local_dir / 'index.sqlite'
+    listing_index = remote_dir.index(db_path=db_path)
+    try:
+        metrics = add_metrics_sink(InMemoryMetrics())
+        try:
+            assert listing_names(remote_dir.rglob('*')) == expected['rglob']
+            assert listing_names(remote_dir.glob('*.txt')) == expected['glob']
+            assert listing_names(remote_dir.iterdir()) == expected['iterdir']
+            assert listing_names(nested_dir.iterdir()) == expected['nested']
+            assert remote_file.stat() == remote_file_stat
+            assert nested_dir.is_dir() and not (remote_dir / 'missing.txt').exists()
+        finally:
+            remove_metrics_sink(metrics)
+        # a single listing built the index, everything else was answered from it
+        assert {operation for _, operation in metrics.snapshot()} == {'iter_file_stats'}
+
+        # writes through AnyPath are seen at once
+        (remote_dir / 'new.txt').write_bytes(b'new')
+        assert (remote_dir / 'new.txt').is_file()
+        (remote_dir / 'new.txt').remove()
+        assert not (remote_dir / 'new.txt').exists()
+
+        # changes made by others are seen after a refresh
+        local_file = temp_local_dir / 'other.txt'
+        local_file.write_bytes(b'other')
+        cloud_handler.upload_file(local_path=str(local_file), target_url=(remote_dir / 'other.txt').base_path)
+        assert not (remote_dir / 'other.txt').exists()
+        refresh_result = listing_index.refresh()
+        assert (refresh_result.added, refresh_result.changed, refresh_result.removed) == (1, 0, 0)
+        assert (remote_dir / 'other.txt').is_file()
+        n_indexed = len(listing_index)
+    finally:
+        remote_dir.remove_index()
+
+    # the index persists, and incremental refreshes list only the keys after the last indexed one
+    listing_index = remote_dir.index(db_path=db_path, max_age_seconds=0, refresh_mode='incremental')
+    try:
+        assert len(listing_index) == n_indexed
+        cloud_handler.upload_file(local_path=str(local_file), target_url=(remote_dir / 'zzz.txt').base_path)
+        assert (remote_dir / 'zzz.txt').is_file()
+        assert len(listing_index) == n_indexed + 1
+    finally:
+        remote_dir.remove_index()
+    assert not AnyPath.LISTING_INDEXES
+
+
+def test_listing_index_concurrent_full_refreshes(tmp_path):
+    from anypathlib.listing_index import ListingIndex
+    from anypathlib.path_handlers.path_types import PathStat, PathKind
+
+    root_url = 's3://bucket/data'
+    db_path = tmp_path / 'index.sqlite'
+    keys = [f'file_{i}.txt' for i in range(5)]
+    other_indexes = []
+
+    class FakeHandler:
+        SUPPORTS_START_AFTER = False
+
+        @classmethod
+        def iter_file_stats(cls, url, start_after=None):
+            for i, key in enumerate(keys):
+                if i == 2 and other_indexes:
+                    # another process sharing the index file refreshes while this listing is consumed
+                    assert other_indexes.pop().refresh().added == len(keys)
+                yield f'{url}/{key}', PathStat(kind=PathKind.file, size=i, etag=f'etag_{i}')
+
+    listing_index = ListingIndex(root_url, FakeHandler, db_path)
+    other_index = ListingIndex(root_url, FakeHandler, db_path)
+    try:
+        other_indexes.append(other_index)
+        refresh_result = listing_index.refresh()
+        assert (refresh_result.added, refresh_result.changed, refresh_result.removed) == (0, 0, 0)
+        assert len(listing_index) == len(other_index) == len(keys)
+
+        keys[:] = keys[1:] + ['new.txt']
+        refresh_result = other_index.refresh()
+        assert (refresh_result.added, refresh_result.changed, refresh_result.removed) == (1, 4, 1)
+        assert sorted(row[0] for row in listing_index._iter_rows('')) == sorted(keys)
+    finally:
+        listing_index.close()
+        other_index.close()
+
+
+def test_listing_index_refreshes_do_not_lock_while_listing(tmp_path):
+    import sqlite3
+    from anypathlib.listing_index import ListingIndex
+    from anypathlib.path_handlers.path_types import PathStat, PathKind
+
+    root_url = 's3://bucket/data'
+    db_path = tmp_path / 'index.sqlite'
+    keys = ['a/1.txt', 'a/2.txt', 'b.txt']
+    n_writes = []
+
+    def write_from_another_connection():
+        # timeout=0 fails at once if the index file is locked
+        connection = sqlite3.connect(str(db_path), timeout=0, isolation_level=None)
+        try:
+            connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('other', str(len(n_writes))))
+            n_writes.append(1)
+        finally:
+            connection.close()
+
+    class FakeHandler:
+        SUPPORTS_START_AFTER = True
+
+        @classmethod
+        def iter_file_stats(cls, url, start_after=None):
+            relative_dir = url[len(root_url) + 1:]
+            for key in keys:
+                if key.startswith(relative_dir) and (start_after is None or key > start_after):
+                    write_from_another_connection()
+                    yield f'{root_url}/{key}', PathStat(kind=PathKind.file, size=len(key), etag=key)
+
+        @classmethod
+        def stat(cls, url):
+            relative_path = url[len(root_url) + 1:]
+            if relative_path in keys:
+                return PathStat(kind=PathKind.file, size=len(relative_path), etag=relative_path)
+            if any(key.startswith(relative_path + '/') for key in keys):
+                return PathStat(kind=PathKind.directory)
+            return None
+
+    listing_index = ListingIndex(root_url, FakeHandler, db_path, max_age_seconds=None, refresh_mode='incremental')
+    try:
+        listing_index.refresh()
+        keys[:] = ['a/2.txt', 'a/3.txt', 'b.txt', 'c.txt']
+        listing_index.invalidate(f'{root_url}/a')
+        listing_index.invalidate(f'{root_url}/b.txt')
+        refresh_result = listing_index.refresh(full=False)
+        assert refresh_result.added == 1
+        assert [row[0] for row in listing_index._iter_rows('')] == keys
+        assert n_writes and not listing_index._connection.execute('SELECT * FROM pending').fetchall()
+    finally:
+        listing_index.close()
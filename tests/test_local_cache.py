@@ -0,0 +1,98 @@
+import multiprocessing
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from anypathlib import PathType, AnyPath
+from anypathlib.local_cache import LocalCache
+from anypathlib.path_handlers.path_types import PathStat, PathKind
+from fixtures_anypath import temp_dir_with_files, clean_remote_dir
+
+
+def _fetch_once(cache_root: str, counter_dir: str, key: str) -> str:
+    def fetch(temp_path: Path):
+        # every download leaves a marker, so the test can count them
+        tempfile.NamedTemporaryFile(dir=counter_dir, delete=False).close()
+        temp_path.write_text('content')
+
+    path_stat = PathStat(kind=PathKind.file, size=7, etag='etag')
+    return str(LocalCache(root=Path(cache_root)).get_file(key, path_stat, fetch=fetch))
+
+
+def test_local_cache_downloads_once_across_processes():
+    with tempfile.TemporaryDirectory() as cache_root, tempfile.TemporaryDirectory() as counter_dir:
+        with multiprocessing.get_context('spawn').Pool(4) as pool:
+            paths = pool.starmap(_fetch_once, [(cache_root, counter_dir, 'bucket/file.txt')] * 8)
+        assert len(set(paths)) == 1
+        assert Path(paths[0]).read_text() == 'content'
+        assert len(list(Path(counter_dir).iterdir())) == 1
+
+
+def test_local_cache_revalidation_and_eviction():
+    with tempfile.TemporaryDirectory() as cache_root:
+        local_cache = LocalCache(root=Path(cache_root), max_bytes=10)
+        fetched = []
+
+        def fetch(content: str):
+            def write(temp_path: Path):
+                fetched.append(content)
+                temp_path.write_text(content)
+
+            return write
+
+        v1 = PathStat(kind=PathKind.file, size=6, etag='v1')
+        v2 = PathStat(kind=PathKind.file, size=6, etag='v2')
+        assert local_cache.get_file('a', v1, fetch('first.')).read_text() == 'first.'
+        assert local_cache.get_file('a', v1, fetch('other.')).read_text() == 'first.'
+        # a changed remote file is downloaded again, unless revalidation is off
+        assert local_cache.get_file('a', v2, fetch('other.'), revalidate=False).read_text() == 'first.'
+        assert local_cache.get_file('a', v2, fetch('second')).read_text() == 'second'
+        assert fetched == ['first.', 'second']
+        # going over max_bytes evicts the least recently used entry
+        local_cache.get_file('b', v1, fetch('bbbbbb'))
+        assert not local_cache.is_valid('a')
+        assert local_cache.is_valid('b')
+        assert local_cache.size() == 6
+
+        # while the running size is within max_bytes, a download does not scan the entries
+        def no_scan():
+            raise AssertionError('the cache entries should not be scanned')
+
+        local_cache._iter_meta_paths = no_scan
+        local_cache.get_file('c', v1, fetch('cc'))
+        assert local_cache._size == 8
+
+
+def test_local_cache_directory_larger_than_max_bytes_is_complete():
+    with tempfile.TemporaryDirectory() as cache_root:
+        local_cache = LocalCache(root=Path(cache_root), max_bytes=10)
+        local_cache.get_file('other', PathStat(kind=PathKind.file, size=6, etag='v1'),
+                             lambda temp_path: temp_path.write_text('other.'))
+        files = {name: PathStat(kind=PathKind.file, size=6, etag='v1') for name in ['f0', 'f1', 'f2']}
+        directory_path = local_cache.get_directory('dir', files, fetch=lambda name, temp_path: temp_path.write_text(
+            name * 3))
+        # older entries are evicted, never the files of the directory itself
+        assert sorted(path.name for path in directory_path.iterdir()) == sorted(files)
+        assert all(local_cache.is_valid(f'dir/{name}') for name in files)
+        assert not local_cache.is_valid('other')
+
+
+@pytest.mark.usefixtures("temp_dir_with_files", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_copy_to_local_cache_revalidates(path_type: PathType, temp_dir_with_files, clean_remote_dir):
+    local_dir_path, local_dir_files = temp_dir_with_files
+    remote_dir = AnyPath(clean_remote_dir) / 'cached'
+    AnyPath(local_dir_path).copy(target=remote_dir)
+    remote_file = remote_dir / local_dir_files[0].name
+    cached_dir = remote_dir.copy()
+    assert sorted(p.name for p in cached_dir.iterdir()) == sorted(p.name for p in local_dir_files)
+    cached_file = remote_file.copy()
+    assert Path(cached_file.base_path).read_text() == local_dir_files[0].read_text()
+
+    local_dir_files[0].write_text('changed content')
+    AnyPath(local_dir_files[0]).copy(target=remote_file)
+    assert Path(remote_file.copy().base_path).read_text() == 'changed content'
+    assert Path((remote_dir.copy() / local_dir_files[0].name).base_path).read_text() == 'changed content'
+    cached_dir.remove()
+    cached_file.remove()
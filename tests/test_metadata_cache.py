@@ -0,0 +1,71 @@
+import pytest
+
+from anypathlib import PathType, AnyPath, PathKind, PathStat
+from anypathlib.metadata_cache import MetadataCache
+from tests.tests_urls import PATH_TYPE_TO_HANDLER
+from fixtures_anypath import temp_dir_with_files, clean_remote_dir
+
+FILE_STAT = PathStat(kind=PathKind.file, size=1)
+
+
+def test_metadata_cache_lru_ttl_and_invalidation():
+    cache = MetadataCache(max_size=2, ttl_seconds=60)
+    cache.put('s3://bucket/a', FILE_STAT)
+    cache.put('s3://bucket/missing', None)
+    assert cache.get('s3://bucket/a') == (True, FILE_STAT)
+    assert cache.get('s3://bucket/missing') == (True, None)
+    assert cache.get('s3://bucket/other') == (False, None)
+
+    # 's3://bucket/a' was used after 's3://bucket/missing', so the latter is evicted
+    cache.get('s3://bucket/a')
+    cache.put('s3://bucket/dir/', PathStat(kind=PathKind.directory))
+    assert len(cache) == 2
+    assert cache.get('s3://bucket/missing') == (False, None)
+    assert cache.get('s3://bucket/dir')[0]
+
+    cache.put('s3://bucket/dir/file', FILE_STAT)
+    cache.invalidate('s3://bucket/dir/file')
+    assert cache.get('s3://bucket/dir/file') == (False, None)
+    assert cache.get('s3://bucket/dir') == (False, None)
+
+    cache.put('s3://bucket/dir2', FILE_STAT)
+    cache.put('s3://bucket/dir/nested/file', FILE_STAT)
+    cache.invalidate('s3://bucket/dir/')
+    assert cache.get('s3://bucket/dir/nested/file') == (False, None)
+    assert cache.get('s3://bucket/dir2') == (True, FILE_STAT)
+    cache.clear()
+    assert not cache._children
+
+    expired_cache = MetadataCache(ttl_seconds=0)
+    expired_cache.put('s3://bucket/a', FILE_STAT)
+    assert expired_cache.get('s3://bucket/a') == (False, None)
+
+
+@pytest.mark.usefixtures("temp_dir_with_files", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3])
+def test_metadata_cache_filled_by_listing(path_type: PathType, temp_dir_with_files, clean_remote_dir, monkeypatch):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    local_dir_path, local_dir_files = temp_dir_with_files
+    remote_dir = AnyPath(clean_remote_dir)
+    cloud_handler.upload_directory(local_dir=local_dir_path, target_url=remote_dir.base_path, verbose=False)
+    AnyPath.enable_metadata_cache()
+    try:
+        remote_files = remote_dir.rglob('*')
+        with monkeypatch.context() as patch:
+            def no_requests(url: str):
+                raise AssertionError(f'{url} should have been served from the metadata cache')
+
+            patch.setattr(cloud_handler, 'stat', no_requests)
+            assert all(remote_file.is_file() for remote_file in remote_files)
+            assert remote_dir.is_dir()
+
+        missing_file = remote_dir / 'missing.txt'
+        assert not missing_file.exists()
+        AnyPath(local_dir_files[0]).copy(target=missing_file)
+        assert missing_file.is_file()
+
+        remote_dir.remove()
+        assert not remote_files[0].exists()
+        assert not remote_dir.exists()
+    finally:
+        AnyPath.disable_metadata_cache()
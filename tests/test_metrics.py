@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+
+from anypathlib import PathType, AnyPath
+from anypathlib.metrics import InMemoryMetrics, CallbackMetrics, add_metrics_sink, remove_metrics_sink
+from fixtures_anypath import temp_local_dir, clean_remote_dir, moto_server_url, moto_s3_dir
+
+
+@pytest.mark.usefixtures("temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_metrics(path_type: PathType, temp_local_dir, clean_remote_dir):
+    local_file = temp_local_dir / 'data.bin'
+    local_file.write_bytes(b'x' * 1000)
+    remote_file = AnyPath(clean_remote_dir) / 'dir' / 'data.bin'
+    metrics = add_metrics_sink(InMemoryMetrics())
+    events = []
+    callback_metrics = add_metrics_sink(CallbackMetrics(events.append))
+    try:
+        AnyPath(local_file).copy(target=remote_file)
+        remote_file.read_ranges([(0, 100), (900, 100)], max_gap=0)
+        assert len(AnyPath(clean_remote_dir).rglob('*')) > 0
+        with pytest.raises(Exception):
+            (AnyPath(clean_remote_dir) / 'missing.bin').read_ranges([(0, 10)])
+    finally:
+        remove_metrics_sink(metrics)
+        remove_metrics_sink(callback_metrics)
+    stats = metrics.snapshot()
+    # a missing file fails before any range is read, when read_ranges opens it (local) or stats it (cloud)
+    assert stats[(path_type, 'read_range_into')].count == 2
+    assert stats[(path_type, 'read_range_into')].errors == 0
+    assert stats[(path_type, 'read_range_into')].bytes_transferred == 200
+    assert stats[(path_type, 'rglob_stats')].count == 1
+    assert stats[(path_type, 'stat')].errors == 0
+    if path_type != PathType.local:
+        assert stats[(path_type, 'upload_file')].bytes_transferred == 1000
+    assert len(events) == sum(s.count for s in stats.values())
+    assert all(event.path_type in (path_type, PathType.local) for event in events)
+    # nothing is reported once the sinks are removed
+    remote_file.read_ranges([(0, 100)])
+    assert len(events) == sum(s.count for s in stats.values())
+
+
+@pytest.mark.parametrize("path_type", [PathType.s3, PathType.local])
+def test_read_stream_metrics_cover_the_reads(path_type: PathType, temp_local_dir, request):
+    base_dir = AnyPath(request.getfixturevalue('moto_s3_dir')) if path_type == PathType.s3 else AnyPath(temp_local_dir)
+    data_file = base_dir / 'data.bin'
+    data_file.write_bytes(b'x' * 1000)
+    metrics = add_metrics_sink(InMemoryMetrics())
+    try:
+        assert data_file.read_bytes() == b'x' * 1000
+        with data_file.path_handler.open_read_stream(data_file.base_path) as stream:
+            stream.read(10)
+            # reported once the stream is closed, not when it is opened
+            assert metrics.snapshot()[(path_type, 'open_read_stream')].count == 1
+    finally:
+        remove_metrics_sink(metrics)
+    stream_stats = metrics.snapshot()[(path_type, 'open_read_stream')]
+    assert (stream_stats.count, stream_stats.errors, stream_stats.bytes_transferred) == (2, 0, 1010)
+
+
+def test_request_metrics_count_backend_requests_and_retries(moto_s3_dir):
+    from botocore.awsrequest import AWSResponse
+    from anypathlib.path_handlers.s3_handler import S3Handler
+
+    remote_file = AnyPath(moto_s3_dir) / 'data.bin'
+    remote_file.write_bytes(b'x' * 1000)
+    failed_attempts = []
+
+    def fail_first_attempt(request, **kwargs):
+        # a throttled first attempt of every GetObject, retried by botocore
+        if request.context['retries']['attempt'] == 1:
+            failed_attempts.append(request.url)
+            return AWSResponse(request.url, 503, {}, SimpleNamespace(stream=lambda *args, **kwargs: iter([b''])))
+
+    S3Handler.get_transfer_client().meta.events.register('before-send.s3.GetObject', fail_first_attempt)
+    metrics = add_metrics_sink(InMemoryMetrics())
+    try:
+        remote_file.read_ranges([(0, 100), (900, 100)], max_gap=0)
+    finally:
+        remove_metrics_sink(metrics)
+    request_stats = metrics.request_snapshot()[(PathType.s3, 'GetObject')]
+    assert len(failed_attempts) == 2
+    assert request_stats.count == 4
+    assert request_stats.retries == 2
+    # the handler calls are counted once each, whatever the number of requests they sent
+    assert metrics.snapshot()[(PathType.s3, 'read_range_into')].count == 2
+
+
+def test_s3_resource_is_shared_and_instrumented_once(moto_s3_dir):
+    from anypathlib.path_handlers.s3_handler import S3Handler
+
+    assert S3Handler.get_resource() is S3Handler.get_resource()
+    metrics = add_metrics_sink(InMemoryMetrics())
+    try:
+        for _ in range(2):
+            S3Handler.remove(moto_s3_dir + 'missing/')
+    finally:
+        remove_metrics_sink(metrics)
+    assert metrics.request_snapshot()[(PathType.s3, 'ListObjects')].count == 2
+
+
+def test_azure_request_metrics_count_attempts():
+    from anypathlib.metrics import report_azure_request
+
+    events = []
+    callback_metrics = add_metrics_sink(CallbackMetrics(lambda event: None, request_callback=events.append))
+    try:
+        pipeline_request = SimpleNamespace(context={}, http_request=SimpleNamespace(method='PUT',
+                                                                                    query={'comp': 'block'}))
+        report_azure_request(pipeline_request)
+        report_azure_request(pipeline_request)
+    finally:
+        remove_metrics_sink(callback_metrics)
+    assert [(event.path_type, event.request, event.attempt, event.is_retry) for event in events] == [
+        (PathType.azure, 'PUT block', 1, False), (PathType.azure, 'PUT block', 2, True)]
@@ -0,0 +1,57 @@
+import io
+import os
+
+import pytest
+
+from anypathlib import PathType, AnyPath
+from fixtures_anypath import clean_remote_dir
+
+
+@pytest.mark.usefixtures("clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_open_random_access(path_type: PathType, clean_remote_dir):
+    content = os.urandom(300_000)
+    remote_file = AnyPath(clean_remote_dir) / 'data.bin'
+    remote_file.write_bytes(content)
+    with remote_file.open('rb', block_size=64 * 1024, max_blocks=4, read_ahead=2) as f:
+        assert f.read(16) == content[:16]
+        f.seek(-100, io.SEEK_END)
+        assert f.read() == content[-100:]
+        f.seek(100_000)
+        assert f.read(70_000) == content[100_000:170_000]
+        assert f.tell() == 170_000
+        f.seek(0)
+        # sequential reads across blocks, served by the read-ahead
+        assert b''.join(iter(lambda: f.read(50_000), b'')) == content
+        assert f.read() == b''
+
+
+@pytest.mark.usefixtures("clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3])
+def test_open_only_reads(path_type: PathType, clean_remote_dir):
+    remote_file = AnyPath(clean_remote_dir) / 'data.bin'
+    remote_file.write_bytes(b'data')
+    with pytest.raises(ValueError):
+        remote_file.open('wb')
+    with pytest.raises(IsADirectoryError):
+        AnyPath(clean_remote_dir).open()
+
+
+def test_ranged_reader_drops_read_ahead_after_seeks():
+    from anypathlib.ranged_reader import RangedReader
+
+    content = os.urandom(100 * 1024)
+
+    class FakeHandler:
+        @classmethod
+        def read_range(cls, url, offset, length, transfer_options=None):
+            return content[offset:offset + length]
+
+    with RangedReader('fake://data.bin', size=len(content), path_handler=FakeHandler, block_size=1024, max_blocks=4,
+                      read_ahead=2) as f:
+        # sequential bursts after seeks, each starting read-ahead that the next seek makes useless
+        for offset in range(0, len(content), 10 * 1024):
+            f.seek(offset)
+            assert f.read(2048) == content[offset:offset + 2048]
+            assert len(f._pending_blocks) <= f.read_ahead + 1
+            assert len(f._blocks) <= f.max_blocks
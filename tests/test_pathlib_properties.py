@@ -33,3 +33,17 @@ def test_pathlib_properties():
     assert local_test_file.stem == 'a'
     assert local_test_file.name == 'a.txt'
     assert local_test_file.parent.base_path == AnyPath(r'/tmp/AnyPath/tests').base_path
+
+
+def test_bucket_key_hash_and_eq():
+    s3_test_file = AnyPath(r's3://bucket/AnyPath//tests/a.txt')
+    assert (s3_test_file.bucket, s3_test_file.key) == ('bucket', 'AnyPath/tests/a.txt')
+    azure_test_file = AnyPath(r'https://storage_account.blob.core.windows.net/container/AnyPath/tests/a.txt')
+    assert (azure_test_file.bucket, azure_test_file.key) == ('container', 'AnyPath/tests/a.txt')
+    assert AnyPath(r'/tmp/AnyPath/tests/').bucket is None
+
+    assert s3_test_file == AnyPath(r's3://bucket/AnyPath/tests/a.txt') == AnyPath(s3_test_file)
+    assert s3_test_file != AnyPath(r's3://bucket/AnyPath/tests/b.txt')
+    assert len({s3_test_file, AnyPath(r's3://bucket/AnyPath/tests/a.txt/'), azure_test_file}) == 2
+    assert AnyPath.from_urls(['s3://bucket/AnyPath/tests/a.txt'], s3_test_file.path_type) == [s3_test_file]
+    assert not hasattr(s3_test_file, '__dict__')
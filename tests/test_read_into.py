@@ -0,0 +1,33 @@
+import array
+import os
+
+import pytest
+
+from anypathlib import PathType, AnyPath, TransferOptions
+from fixtures_anypath import clean_remote_dir
+
+
+@pytest.mark.usefixtures("clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_read_into(path_type: PathType, clean_remote_dir):
+    content = os.urandom(300_000)
+    remote_file = AnyPath(clean_remote_dir) / 'data.bin'
+    remote_file.write_bytes(content)
+    transfer_options = TransferOptions(part_size=64 * 1024, max_concurrency=4)
+
+    buffer = bytearray(len(content))
+    assert remote_file.read_into(buffer, transfer_options=transfer_options) == len(content)
+    assert buffer == content
+
+    # reads stop at the end of the file
+    buffer = bytearray(200_000)
+    assert remote_file.read_into(buffer, offset=150_000, transfer_options=transfer_options) == 150_000
+    assert buffer[:150_000] == content[150_000:]
+
+    # any writable buffer, such as a typed array
+    floats = array.array('f', [0.0] * 1000)
+    assert remote_file.read_into(floats, offset=4000, transfer_options=transfer_options) == 4000
+    assert floats.tobytes() == content[4000:8000]
+
+    with pytest.raises(TypeError):
+        remote_file.read_into(b'read only')
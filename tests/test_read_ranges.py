@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from anypathlib import PathType, AnyPath
+from anypathlib.ranged_reader import coalesce_ranges
+from fixtures_anypath import clean_remote_dir, temp_local_dir, moto_server_url, moto_s3_dir
+
+
+def test_coalesce_ranges():
+    ranges = [(100, 10), (0, 10), (15, 5), (50, 0), (105, 20), (1000, 10)]
+    assert coalesce_ranges(ranges, max_gap=10) == [(0, 20), (100, 125), (1000, 1010)]
+    assert coalesce_ranges(ranges, max_gap=0) == [(0, 10), (15, 20), (100, 125), (1000, 1010)]
+    assert coalesce_ranges(ranges, max_gap=1000, max_request_size=100) == [(0, 20), (100, 125), (1000, 1010)]
+
+
+@pytest.mark.usefixtures("clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_read_ranges(path_type: PathType, clean_remote_dir):
+    content = os.urandom(200_000)
+    remote_file = AnyPath(clean_remote_dir) / 'data.bin'
+    remote_file.write_bytes(content)
+    ranges = [(150_000, 1000), (10, 20), (0, 4), (100, 0), (12, 100), (199_990, 100), (250_000, 10)]
+    buffers = remote_file.read_ranges(ranges, max_gap=1024, max_request_size=64 * 1024)
+    assert [bytes(buffer) for buffer in buffers] == [content[offset:offset + length] for offset, length in ranges]
+    # the ranges share a single allocation
+    assert len({id(buffer.obj) for buffer in buffers}) == 1
+
+
+def test_local_read_ranges_share_one_descriptor(temp_local_dir, monkeypatch):
+    content = os.urandom(100_000)
+    local_file = temp_local_dir / 'data.bin'
+    local_file.write_bytes(content)
+    opened_paths = []
+    original_os_open = os.open
+    monkeypatch.setattr(os, 'open', lambda path, *args, **kwargs: opened_paths.append(path) or original_os_open(
+        path, *args, **kwargs))
+    ranges = [(0, 10), (50_000, 100), (99_990, 100)]
+    buffers = AnyPath(local_file).read_ranges(ranges, max_gap=0)
+    assert [bytes(buffer) for buffer in buffers] == [content[offset:offset + length] for offset, length in ranges]
+    if hasattr(os, 'pread'):
+        assert opened_paths == [AnyPath(local_file).base_path]
+
+
+@pytest.mark.parametrize("path_type", [PathType.s3, PathType.local])
+def test_read_ranges_past_the_end(path_type: PathType, temp_local_dir, request):
+    base_dir = AnyPath(request.getfixturevalue('moto_s3_dir')) if path_type == PathType.s3 else AnyPath(temp_local_dir)
+    content = os.urandom(10)
+    data_file = base_dir / 'f.bin'
+    data_file.write_bytes(content)
+    ranges = [(20, 4), (8, 4), (10, 1), (0, 2)]
+    buffers = data_file.read_ranges(ranges, max_gap=0)
+    assert [bytes(buffer) for buffer in buffers] == [b'', content[8:], b'', content[:2]]
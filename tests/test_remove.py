@@ -0,0 +1,129 @@
+from types import SimpleNamespace
+
+import pytest
+from azure.core.exceptions import ResourceNotFoundError
+
+from anypathlib import PathType, AnyPath, TransferOptions
+from anypathlib.path_handlers.azure_handler import AzureHandler, AzureStoragePath
+from anypathlib.path_handlers.parallel import TransferError
+from fixtures_anypath import temp_local_dir, clean_remote_dir
+
+
+@pytest.mark.usefixtures("temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_remove_directory_without_trailing_slash(path_type: PathType, temp_local_dir, clean_remote_dir):
+    source_dir = temp_local_dir / 'source'
+    for i in range(300):
+        (source_dir / f'sub_{i % 3}').mkdir(exist_ok=True, parents=True)
+        (source_dir / f'sub_{i % 3}' / f'file_{i}.txt').write_text(str(i))
+    (temp_local_dir / 'sibling.txt').write_text('sibling')
+    remote_dir = AnyPath(clean_remote_dir) / 'to_remove'
+    AnyPath(source_dir).copy(target=remote_dir)
+    # shares the prefix of the directory, and must survive its removal
+    sibling = AnyPath(clean_remote_dir) / 'to_remove.txt'
+    AnyPath(temp_local_dir / 'sibling.txt').copy(target=sibling)
+    AnyPath(remote_dir.base_path.rstrip('/')).remove()
+    assert not remote_dir.exists()
+    assert sibling.exists()
+
+
+class FakeContainerClient:
+    def __init__(self, blob_names, failing_blob_names=()):
+        self.blob_names = blob_names
+        self.failing_blob_names = failing_blob_names
+        self.batch_sizes = []
+        self.listed_blobs = 0
+        # the number of blobs listed when each batch was deleted
+        self.listed_at_deletion = []
+        self.deleted_blobs = []
+
+    def list_blob_names(self, name_starts_with):
+        for blob_name in self.blob_names:
+            if blob_name.startswith(name_starts_with):
+                self.listed_blobs += 1
+                yield blob_name
+
+    def delete_blobs(self, *blob_names, raise_on_any_failure):
+        self.batch_sizes.append(len(blob_names))
+        self.listed_at_deletion.append(self.listed_blobs)
+        return [SimpleNamespace(status_code=403 if blob_name in self.failing_blob_names else 202)
+                for blob_name in blob_names]
+
+    def delete_blob(self, blob_name):
+        if blob_name not in self.blob_names:
+            raise ResourceNotFoundError('not a blob')
+        self.deleted_blobs.append(blob_name)
+
+
+def test_azure_remove_directory_batches_and_reports_failures(monkeypatch):
+    blob_names = [f'dir/file_{i}.txt' for i in range(600)] + ['dir_sibling.txt']
+    container_client = FakeContainerClient(blob_names, failing_blob_names={'dir/file_7.txt', 'dir/file_512.txt'})
+    monkeypatch.setattr(AzureStoragePath, 'container_client', property(lambda self: container_client))
+    with pytest.raises(TransferError) as transfer_error:
+        AzureHandler.remove('https://account.blob.core.windows.net/container/dir')
+    assert sorted(container_client.batch_sizes) == [88, 256, 256]
+    assert sorted(blob_name for blob_name, _ in transfer_error.value.failures) == ['dir/file_512.txt',
+                                                                                  'dir/file_7.txt']
+
+
+def test_azure_remove_streams_the_listing_and_deletes_single_blobs_directly(monkeypatch):
+    blob_names = [f'dir/file_{i}.txt' for i in range(1000)] + ['file.txt']
+    container_client = FakeContainerClient(blob_names)
+    monkeypatch.setattr(AzureStoragePath, 'container_client', property(lambda self: container_client))
+    removed_blobs = AzureHandler.remove_directory('https://account.blob.core.windows.net/container/dir',
+                                                  transfer_options=TransferOptions(max_workers=1))
+    assert removed_blobs == 1000
+    assert container_client.batch_sizes == [256, 256, 256, 232]
+    # each batch is deleted before the rest of the listing is consumed
+    assert container_client.listed_at_deletion == [256, 512, 768, 1000]
+
+    AzureHandler.remove('https://account.blob.core.windows.net/container/file.txt')
+    assert container_client.deleted_blobs == ['file.txt']
+    assert container_client.listed_blobs == 1000
+    with pytest.raises(ResourceNotFoundError):
+        AzureHandler.remove('https://account.blob.core.windows.net/container/missing.txt')
+    AzureHandler.remove('https://account.blob.core.windows.net/container/missing.txt', allow_missing=True)
+
+
+class FakeAsyncContainerClient:
+    def __init__(self, blob_names, failing_blob_names=()):
+        self.blob_names = sorted(blob_names)
+        self.failing_blob_names = set(failing_blob_names)
+        self.batch_sizes = []
+
+    async def list_blob_names(self, name_starts_with=''):
+        for blob_name in self.blob_names:
+            if blob_name.startswith(name_starts_with):
+                yield blob_name
+
+    async def delete_blobs(self, *blob_names, raise_on_any_failure=True):
+        self.batch_sizes.append(len(blob_names))
+
+        async def responses():
+            for blob_name in blob_names:
+                status_code = 500 if blob_name in self.failing_blob_names else \
+                    202 if blob_name in self.blob_names else 404
+                yield SimpleNamespace(status_code=status_code, request=SimpleNamespace(url=blob_name))
+
+        return responses()
+
+
+def test_async_azure_remove_batches_and_reports_failures():
+    import asyncio
+    pytest.importorskip('aiohttp')
+    from anypathlib.path_handlers.async_azure_handler import AsyncAzureHandler
+
+    blob_names = [f'dir/file_{i}.txt' for i in range(300)] + ['dir_sibling.txt']
+    container_client = FakeAsyncContainerClient(blob_names)
+    asyncio.run(AsyncAzureHandler.remove(container_client, 'https://account.blob.core.windows.net/container/dir',
+                                         max_concurrency=4))
+    # the url itself, missing as a blob, is deleted in the first batch as well
+    assert sorted(container_client.batch_sizes) == [45, 256]
+    with pytest.raises(ResourceNotFoundError):
+        asyncio.run(AsyncAzureHandler.remove(FakeAsyncContainerClient([]),
+                                             'https://account.blob.core.windows.net/container/missing',
+                                             max_concurrency=4))
+    container_client = FakeAsyncContainerClient(blob_names, failing_blob_names={'dir/file_7.txt'})
+    with pytest.raises(TransferError):
+        asyncio.run(AsyncAzureHandler.remove(container_client, 'https://account.blob.core.windows.net/container/dir',
+                                             max_concurrency=4))
@@ -0,0 +1,79 @@
+import threading
+
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+from botocore.exceptions import ClientError
+
+from anypathlib.path_handlers.parallel import run_in_parallel
+from anypathlib.path_handlers.retry import classify_error, THROTTLED, TRANSIENT, RetryPolicy, \
+    AdaptiveConcurrencyLimiter
+
+FAST_RETRY_POLICY = RetryPolicy(base_delay=0.001, max_delay=0.01)
+
+
+def s3_error(code: str, status_code: int) -> ClientError:
+    return ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, 'GetObject')
+
+
+def azure_error(status_code: int) -> HttpResponseError:
+    error = HttpResponseError(message='busy')
+    error.status_code = status_code
+    return error
+
+
+def test_classify_error():
+    assert classify_error(s3_error('SlowDown', 503)) == THROTTLED
+    assert classify_error(s3_error('InternalError', 500)) == TRANSIENT
+    assert classify_error(s3_error('NoSuchKey', 404)) is None
+    assert classify_error(azure_error(503)) == THROTTLED
+    assert classify_error(ResourceNotFoundError('missing')) is None
+    assert classify_error(ConnectionResetError()) == TRANSIENT
+    assert classify_error(ValueError()) is None
+
+
+def test_run_in_parallel_retries_throttled_items():
+    attempts = {}
+    lock = threading.Lock()
+
+    def flaky(item: int) -> int:
+        with lock:
+            attempts[item] = attempts.get(item, 0) + 1
+            n_attempts = attempts[item]
+        if item == 3:
+            raise s3_error('NoSuchKey', 404)
+        if n_attempts <= 2:
+            raise s3_error('SlowDown', 503)
+        return item
+
+    results, failures = run_in_parallel(flaky, list(range(20)), max_workers=8, retry_policy=FAST_RETRY_POLICY)
+    assert results == [item for item in range(20) if item != 3]
+    # errors that are not worth retrying fail at once
+    assert [item for item, _ in failures] == [3]
+    assert attempts[3] == 1
+    assert all(attempts[item] == 3 for item in range(20) if item != 3)
+
+
+def test_run_in_parallel_gives_up_after_max_attempts():
+    def always_throttled(item: int):
+        raise azure_error(503)
+
+    results, failures = run_in_parallel(always_throttled, [1, 2], retry_policy=RetryPolicy(max_attempts=2,
+                                                                                           base_delay=0.001))
+    assert results == [] and [item for item, _ in failures] == [1, 2]
+
+
+def test_adaptive_concurrency_limiter():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=16)
+    limiter.on_throttled()
+    assert limiter.limit == 8
+    # throttled calls that were in flight before the decrease do not decrease it again
+    limiter.on_throttled()
+    assert limiter.limit == 8
+    for _ in range(8):
+        with limiter.slot():
+            pass
+    limiter.on_throttled()
+    assert limiter.limit == 4
+    for _ in range(4 + 5):
+        with limiter.slot():
+            limiter.on_success()
+    assert limiter.limit == 6
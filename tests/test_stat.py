@@ -0,0 +1,53 @@
+import pytest
+
+from anypathlib import PathType, AnyPath, PathKind
+from tests.tests_urls import PATH_TYPE_TO_HANDLER
+from fixtures_anypath import temp_dir_with_files, clean_remote_dir
+
+
+@pytest.mark.usefixtures("temp_dir_with_files", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_stat(path_type: PathType, temp_dir_with_files, clean_remote_dir):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    local_dir_path, local_dir_files = temp_dir_with_files
+    local_file = local_dir_files[0]
+    remote_dir = AnyPath(clean_remote_dir)
+    cloud_handler.upload_directory(local_dir=local_dir_path, target_url=(remote_dir / 'data').base_path,
+                                   verbose=False)
+    # a file that shares the prefix of the directory name, and sorts before it
+    cloud_handler.upload_file(local_path=str(local_file), target_url=(remote_dir / 'data.txt').base_path)
+
+    file_stat = (remote_dir / 'data' / local_file.name).stat()
+    assert file_stat.kind == PathKind.file
+    assert file_stat.is_file and not file_stat.is_dir
+    assert file_stat.size == local_file.stat().st_size
+    assert file_stat.last_modified is not None
+
+    dir_stat = (remote_dir / 'data').stat()
+    assert dir_stat.kind == PathKind.directory
+    assert (remote_dir / 'data.txt').stat().kind == PathKind.file
+
+    missing_path = remote_dir / 'dat'
+    assert not missing_path.exists()
+    with pytest.raises(FileNotFoundError):
+        missing_path.stat()
+
+
+@pytest.mark.parametrize("hdi_isfolder, kind", [('true', PathKind.directory), ('True', PathKind.directory),
+                                                ('false', PathKind.file), (None, PathKind.file)])
+def test_azure_stat_hdi_isfolder(hdi_isfolder, kind, monkeypatch):
+    from azure.storage.blob import BlobProperties
+    from anypathlib.path_handlers.azure_handler import AzureHandler
+
+    storage_account = 'anypathlibfakeaccount'
+    AzureHandler.client_cache.set_connection_string(
+        storage_account, f'DefaultEndpointsProtocol=https;AccountName={storage_account};AccountKey=ZmFrZWtleQ==;'
+                         f'EndpointSuffix=core.windows.net')
+    metadata = {'hdi_isfolder': hdi_isfolder} if hdi_isfolder is not None else {}
+    blob = BlobProperties(name='dir/placeholder', metadata=metadata, ETag='"etag"', **{'Content-Length': 0})
+    monkeypatch.setattr(AzureHandler, '_list_first_blob', lambda container_client, prefix: blob)
+    try:
+        url = f'https://{storage_account}.blob.core.windows.net/container/dir/placeholder'
+        assert AzureHandler.stat(url).kind == kind
+    finally:
+        AzureHandler.client_cache.invalidate(storage_account)
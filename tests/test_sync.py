@@ -0,0 +1,42 @@
+import pytest
+
+from anypathlib import PathType, AnyPath
+from fixtures_anypath import temp_nested_dir, clean_remote_dir
+
+
+@pytest.mark.usefixtures("temp_nested_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+@pytest.mark.parametrize("compare", ['size', 'mtime', 'checksum'])
+def test_sync_transfers_only_changed_files(path_type: PathType, compare: str, temp_nested_dir, clean_remote_dir):
+    local_dir_path, top_level_files, nested_files = temp_nested_dir
+    local_files = sorted(p.relative_to(local_dir_path).as_posix() for p in local_dir_path.rglob('*') if p.is_file())
+    remote_dir = AnyPath(clean_remote_dir) / 'synced'
+
+    sync_result = AnyPath(local_dir_path).sync(remote_dir, compare=compare)
+    assert sync_result.copied == local_files
+    assert sync_result.skipped == []
+
+    changed_file = nested_files[0]
+    changed_file.write_text(changed_file.read_text() + 'changed')
+    new_file = local_dir_path / 'new.txt'
+    new_file.write_text('new')
+    removed_file = top_level_files[0]
+    if removed_file.is_dir():
+        removed_file = top_level_files[1]
+    removed_file.unlink()
+    expected_copied = sorted(p.relative_to(local_dir_path).as_posix() for p in [changed_file, new_file])
+
+    sync_result = AnyPath(local_dir_path).sync(remote_dir, compare=compare, delete=True)
+    assert sync_result.copied == expected_copied
+    assert sync_result.deleted == [removed_file.relative_to(local_dir_path).as_posix()]
+    assert sorted(sync_result.copied + sync_result.skipped) == sorted(
+        p.relative_to(local_dir_path).as_posix() for p in local_dir_path.rglob('*') if p.is_file())
+
+    # and back, from the remote directory to a fresh local copy
+    local_copy = AnyPath(local_dir_path.parent / f'{local_dir_path.name}_copy')
+    try:
+        remote_dir.sync(local_copy, compare=compare)
+        assert remote_dir.sync(local_copy, compare=compare).copied == []
+        assert (local_copy / changed_file.relative_to(local_dir_path).as_posix()).exists()
+    finally:
+        local_copy.remove()
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from anypathlib import PathType, AnyPath, TransferOptions
+from anypathlib.path_handlers.parallel import TransferError
+from tests.tests_urls import PATH_TYPE_TO_HANDLER
+from fixtures_anypath import temp_dir_with_files, clean_remote_dir
+
+
+@pytest.mark.usefixtures("temp_dir_with_files", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_copy_directory_max_workers(path_type: PathType, max_workers: int, temp_dir_with_files, clean_remote_dir):
+    local_dir_path, local_dir_files = temp_dir_with_files
+    remote_dir = AnyPath(clean_remote_dir) / 'uploaded'
+    AnyPath(local_dir_path).copy(target=remote_dir, max_workers=max_workers, verbose=True)
+    assert sorted([fn.name for fn in remote_dir.rglob('*')]) == sorted([fn.name for fn in local_dir_files])
+
+
+@pytest.mark.usefixtures("temp_dir_with_files", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.s3])
+def test_upload_directory_reports_failures(path_type: PathType, temp_dir_with_files, clean_remote_dir):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    local_dir_path, local_dir_files = temp_dir_with_files
+    broken_link = local_dir_path / 'broken_link.txt'
+    os.symlink(local_dir_path / 'does_not_exist.txt', broken_link)
+    with pytest.raises(TransferError) as transfer_error:
+        cloud_handler.upload_directory(local_dir=local_dir_path, target_url=clean_remote_dir, verbose=False,
+                                       transfer_options=TransferOptions(max_workers=2))
+    assert [local_path for (local_path, _), _ in transfer_error.value.failures] == [broken_link]
+    # the failure does not stop the rest of the batch
+    assert sorted([fn.name for fn in AnyPath(clean_remote_dir).rglob('*')]) == sorted(
+        [fn.name for fn in local_dir_files])
@@ -1,6 +1,10 @@
+import os
+from pathlib import Path
+
 import pytest
 
-from anypathlib import PathType, AnyPath
+from anypathlib import PathType, AnyPath, TransferOptions
+from anypathlib.path_handlers.transfer_options import MB
 from tests.tests_urls import PATH_TYPE_TO_HANDLER
 from fixtures_anypath import temp_local_dir, temp_dir_with_files, clean_remote_dir
 
@@ -17,3 +21,40 @@ def test_copy_from_local_to_cloud(path_type: PathType, temp_dir_with_files, temp
     cloud_handler.remove(remote_dir)
     assert sorted([remote_file.split('/')[-1] for remote_file in remote_dir_files]) == sorted(
         [local_dir_file.name for local_dir_file in local_dir_files])
+
+
+@pytest.mark.usefixtures("temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3])
+def test_copy_large_file_with_transfer_options(path_type: PathType, temp_local_dir, clean_remote_dir):
+    transfer_options = TransferOptions(multipart_threshold=5 * MB, part_size=5 * MB, max_concurrency=2,
+                                       max_pool_connections=4)
+    local_file = temp_local_dir / 'large_file.bin'
+    local_file.write_bytes(os.urandom(11 * MB))
+    remote_file = AnyPath(clean_remote_dir) / local_file.name
+    AnyPath(local_file).copy(target=remote_file, transfer_options=transfer_options)
+    remote_stat = remote_file.stat()
+    assert remote_stat.size == local_file.stat().st_size
+    if path_type == PathType.s3:
+        # multipart uploads have an etag of the form <md5 of the parts' md5s>-<number of parts>
+        assert remote_stat.etag.endswith('-3')
+    downloaded_file = remote_file.copy(target=temp_local_dir / 'downloaded.bin', transfer_options=transfer_options)
+    assert Path(downloaded_file.base_path).read_bytes() == local_file.read_bytes()
+
+
+@pytest.mark.usefixtures("temp_local_dir", "clean_remote_dir")
+@pytest.mark.parametrize("path_type", [PathType.azure, PathType.s3, PathType.local])
+def test_upload_and_read_stream(path_type: PathType, temp_local_dir, clean_remote_dir):
+    cloud_handler = PATH_TYPE_TO_HANDLER[path_type]
+    transfer_options = TransferOptions(multipart_threshold=5 * MB, part_size=5 * MB, max_concurrency=2)
+    content = os.urandom(11 * MB)
+    local_file = temp_local_dir / 'large_file.bin'
+    local_file.write_bytes(content)
+    remote_file = AnyPath(clean_remote_dir) / local_file.name
+    with open(local_file, 'rb') as stream:
+        cloud_handler.upload_stream(stream, target_url=remote_file.base_path, size=len(content),
+                                    transfer_options=transfer_options)
+    streamed = remote_file.parent / 'streamed.bin'
+    with cloud_handler.open_read_stream(remote_file.base_path, transfer_options=transfer_options) as stream:
+        cloud_handler.upload_stream(stream, target_url=streamed.base_path, transfer_options=transfer_options)
+    with cloud_handler.open_read_stream(streamed.base_path) as stream:
+        assert stream.read() == content